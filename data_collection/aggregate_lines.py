@@ -4,11 +4,11 @@ from pathlib import Path
 from collections import defaultdict
 from typing import Any, Dict, List, Optional
 from datetime import datetime
-from zoneinfo import ZoneInfo
+
+from .odds_store import LOCAL_TZ, latest_as_of
 
 
 ALT_MARKET_KEY = "player_shots_on_goal_alternate"
-LOCAL_TZ = ZoneInfo("America/Los_Angeles")
 
 
 TEAM_ABBR = {
@@ -236,12 +236,30 @@ def write_csv(path: str, rows: List[Dict[str, Any]]) -> None:
         w.writerows(rows)
 
 
-# -------------------------
-# Main: load cache, filter today, aggregate, write
-# -------------------------
-CACHE_DIR = Path("betting_lines_cache")
+def snapshot_to_alt_rows(snap) -> List[Dict[str, Any]]:
+    """
+    Per-book alt rows from the odds snapshot store -- same shape as
+    parse_events_to_alt_rows_today, minus the JSON decoding.
+    """
+    snap = snap[(snap["market"] == ALT_MARKET_KEY) & (snap["player_name"] != "") & snap["point"].notna()]
+    alt_rows: List[Dict[str, Any]] = []
+    for r in snap.itertuples(index=False):
+        price = None if r.price != r.price else r.price  # NaN -> None
+        alt_rows.append({
+            "event_id": r.event_id,
+            "home_team": team_to_abbr(r.home_team),
+            "away_team": team_to_abbr(r.away_team),
+            "book_key": r.book_key,
+            "player_name": r.player_name,
+            "point": float(r.point),
+            "price": price,
+            "imp_prob": american_to_implied_prob(price),
+        })
+    return alt_rows
 
-def main() -> None:
+
+def load_cached_events() -> List[Dict[str, Any]]:
+    """Legacy path: decode every cached odds_*.json file."""
     all_events: List[Dict[str, Any]] = []
     for file in CACHE_DIR.glob("odds_*.json"):
         try:
@@ -254,10 +272,25 @@ def main() -> None:
             all_events.extend(data)
         elif isinstance(data, dict):
             all_events.append(data)
+    return all_events
 
-    print(f"Total events loaded (raw): {len(all_events)}")
 
-    alt_rows = parse_events_to_alt_rows_today(all_events)
+# -------------------------
+# Main: latest snapshot for today's partition, aggregate, write
+# -------------------------
+CACHE_DIR = Path("betting_lines_cache")
+
+def main() -> None:
+    # Only today's partition is read; each book contributes its most recent snapshot
+    snap = latest_as_of()
+    if not snap.empty:
+        print(f"Snapshot rows loaded (today's partition): {len(snap)}")
+        alt_rows = snapshot_to_alt_rows(snap)
+    else:
+        print("No snapshot partition for today, falling back to cached odds JSON.")
+        all_events = load_cached_events()
+        print(f"Total events loaded (raw): {len(all_events)}")
+        alt_rows = parse_events_to_alt_rows_today(all_events)
     print(f"Alt rows (today only, per-book): {len(alt_rows)}")
 
     alt_wide = aggregate_alt_wide_mincols(alt_rows)
@@ -0,0 +1,285 @@
+# Compressed, indexed store for cached NHL API payloads.
+#
+# Layout under update_game_cache/:
+#   manifest.sqlite                          -- one row per (game_id, endpoint)
+#   {season}/{game_id}_{endpoint}.json.zst   -- zstd payload (.json.gz when zstandard is not installed)
+#
+# The manifest holds size, sha256, fetch time, game state and HTTP validators, so
+# lookups and listings are index reads instead of filesystem probes.
+#
+# Migrate an existing flat cache (one '{game_id}_{endpoint}' JSON file per entry):
+#   python -m data_collection.cache_store migrate [--src DIR] [--delete]
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional
+
+from .json_codec import DECODE_ERRORS, dumps, loads
+
+try:
+    import zstandard
+except ImportError:  # gzip fallback keeps the store usable without the extra dependency
+    zstandard = None
+
+BASE_DIR = Path(__file__).resolve().parent
+STORE_DIR = BASE_DIR / "update_game_cache"
+MANIFEST_NAME = "manifest.sqlite"
+ENDPOINTS = ("boxscore", "play-by-play")
+
+DEFAULT_CODEC = "zstd" if zstandard is not None else "gzip"
+CODEC_SUFFIX = {"zstd": ".json.zst", "gzip": ".json.gz"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    game_id       TEXT NOT NULL,
+    endpoint      TEXT NOT NULL,
+    season        INTEGER NOT NULL,
+    path          TEXT NOT NULL,
+    codec         TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    raw_size      INTEGER NOT NULL,
+    sha256        TEXT NOT NULL,
+    fetched_at    REAL,
+    game_state    TEXT,
+    etag          TEXT,
+    last_modified TEXT,
+    url           TEXT,
+    PRIMARY KEY (game_id, endpoint)
+);
+CREATE INDEX IF NOT EXISTS entries_endpoint_season ON entries (endpoint, season);
+"""
+
+META_FIELDS = ("fetched_at", "game_state", "etag", "last_modified", "url")
+
+
+def season_of(game_id) -> int:
+    """Season shard for a game id -- 2025020123 -> 2025."""
+    return int(str(game_id)[:4])
+
+
+def compress(raw: bytes, codec: str = DEFAULT_CODEC) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return gzip.compress(raw, compresslevel=6)
+
+
+def decompress(blob: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd cache entries")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class GameCacheStore:
+    """Season-sharded compressed payloads plus a SQLite manifest index."""
+
+    def __init__(self, root: Path = STORE_DIR, codec: str = DEFAULT_CODEC):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.codec = codec
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.root / MANIFEST_NAME, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    # --- reads ---
+    def entry(self, game_id, endpoint: str) -> Optional[Dict[str, Any]]:
+        """Manifest row for one payload, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM entries WHERE game_id = ? AND endpoint = ?", (str(game_id), endpoint)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def has(self, game_id, endpoint: str) -> bool:
+        return self.entry(game_id, endpoint) is not None
+
+    def get_meta(self, game_id, endpoint: str) -> Optional[Dict[str, Any]]:
+        """Freshness/validator metadata in the shape http_client expects."""
+        row = self.entry(game_id, endpoint)
+        if row is None:
+            return None
+        return {k: row[k] for k in META_FIELDS if row[k] is not None}
+
+    def get_bytes(self, game_id, endpoint: str) -> Optional[bytes]:
+        """Raw (decompressed) JSON bytes for one payload, or None if missing/corrupt."""
+        row = self.entry(game_id, endpoint)
+        if row is None:
+            return None
+        try:
+            return decompress((self.root / row["path"]).read_bytes(), row["codec"])
+        except (OSError, EOFError, ValueError, RuntimeError):
+            return None
+
+    def open_payload(self, game_id, endpoint: str) -> Optional[BinaryIO]:
+        """Decompressing binary file object over one payload (for streaming readers), or None."""
+        row = self.entry(game_id, endpoint)
+        if row is None:
+            return None
+        path = self.root / row["path"]
+        if row["codec"] == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd cache entries")
+            return zstandard.ZstdDecompressor().stream_reader(path.open("rb"), closefd=True)
+        return gzip.open(path, "rb")
+
+    def get(self, game_id, endpoint: str, schema: Optional[type] = None) -> Optional[dict]:
+        """Decoded payload (only `schema`'s fields when given, see json_codec), or None."""
+        raw = self.get_bytes(game_id, endpoint)
+        if raw is None:
+            return None
+        try:
+            return loads(raw, schema)
+        except DECODE_ERRORS:
+            return None  # Invalid cache → re-fetch
+
+    def list_game_ids(self, endpoint: str, seasons: Optional[Iterable[int]] = None) -> List[str]:
+        """Sorted game ids cached for an endpoint, optionally restricted to seasons."""
+        sql = "SELECT game_id FROM entries WHERE endpoint = ?"
+        params: list = [endpoint]
+        if seasons is not None:
+            seasons = list(seasons)
+            sql += f" AND season IN ({','.join('?' * len(seasons))})"
+            params += seasons
+        with self.lock:
+            rows = self.conn.execute(sql + " ORDER BY game_id", params).fetchall()
+        return [r["game_id"] for r in rows]
+
+    # --- writes ---
+    def put_bytes(self, game_id, endpoint: str, raw: bytes, meta: Optional[Dict[str, Any]] = None) -> None:
+        """Compress and store a JSON payload, then upsert its manifest row."""
+        game_id = str(game_id)
+        season = season_of(game_id)
+        rel = Path(str(season)) / f"{game_id}_{endpoint}{CODEC_SUFFIX[self.codec]}"
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        blob = compress(raw, self.codec)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+
+        meta = dict(meta or {})
+        meta.setdefault("fetched_at", time.time())
+        row = {
+            "game_id": game_id,
+            "endpoint": endpoint,
+            "season": season,
+            "path": rel.as_posix(),
+            "codec": self.codec,
+            "size": len(blob),
+            "raw_size": len(raw),
+            "sha256": hashlib.sha256(raw).hexdigest(),
+            **{k: meta.get(k) for k in META_FIELDS},
+        }
+        cols = ", ".join(row)
+        with self.lock, self.conn:
+            old = self.conn.execute(
+                "SELECT path FROM entries WHERE game_id = ? AND endpoint = ?", (game_id, endpoint)
+            ).fetchone()
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO entries ({cols}) VALUES ({', '.join('?' * len(row))})",
+                tuple(row.values()),
+            )
+        # A codec switch leaves the previous file behind under another suffix
+        if old and old["path"] != row["path"]:
+            (self.root / old["path"]).unlink(missing_ok=True)
+
+    def put(self, game_id, endpoint: str, data: dict, meta: Optional[Dict[str, Any]] = None) -> None:
+        self.put_bytes(game_id, endpoint, dumps(data), meta)
+
+    def touch(self, game_id, endpoint: str, meta: Dict[str, Any]) -> None:
+        """Update metadata only -- used when a conditional request comes back 304."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"UPDATE entries SET {', '.join(f'{k} = ?' for k in META_FIELDS)} "
+                "WHERE game_id = ? AND endpoint = ?",
+                tuple(meta.get(k) for k in META_FIELDS) + (str(game_id), endpoint),
+            )
+
+
+_store: Optional[GameCacheStore] = None
+_store_pid: Optional[int] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> GameCacheStore:
+    """Process-wide store (reopened after fork -- SQLite handles must not cross processes)."""
+    global _store, _store_pid
+    if _store is None or _store_pid != os.getpid():
+        with _store_lock:
+            if _store is None or _store_pid != os.getpid():
+                _store = GameCacheStore()
+                _store_pid = os.getpid()
+    return _store
+
+
+# --- Migration from the flat one-file-per-endpoint layout ---
+def parse_flat_name(name: str):
+    """'2025020123_play-by-play[.json]' -> ('2025020123', 'play-by-play'), else None."""
+    stem = name[:-5] if name.endswith(".json") else name
+    game_id, _, endpoint = stem.partition("_")
+    if not game_id.isdigit() or endpoint not in ENDPOINTS:
+        return None
+    return game_id, endpoint
+
+
+def migrate_flat_cache(src: Path = STORE_DIR, delete: bool = False, store: Optional[GameCacheStore] = None) -> int:
+    """Import flat JSON cache files (and any .meta.json sidecars) into the store."""
+    store = store or get_store()
+    migrated = 0
+    for path in sorted(Path(src).iterdir()):
+        if not path.is_file():
+            continue
+        key = parse_flat_name(path.name)
+        if key is None:
+            continue
+        game_id, endpoint = key
+        raw = path.read_bytes()
+        try:
+            payload = loads(raw)
+        except DECODE_ERRORS:
+            print(f"Skipping invalid JSON: {path.name}")
+            continue
+
+        sidecar = path.with_name(path.name + ".meta.json")
+        meta = {}
+        if sidecar.exists():
+            try:
+                meta = json.loads(sidecar.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                meta = {}
+        meta.setdefault("fetched_at", path.stat().st_mtime)
+        if isinstance(payload, dict) and payload.get("gameState"):
+            meta.setdefault("game_state", payload["gameState"])
+
+        store.put_bytes(game_id, endpoint, raw, meta)
+        migrated += 1
+        if delete:
+            path.unlink()
+            sidecar.unlink(missing_ok=True)
+    print(f"Migrated {migrated} cache entries from {src}")
+    return migrated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Game cache store maintenance")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    mig = sub.add_parser("migrate", help="import a flat JSON cache directory")
+    mig.add_argument("--src", type=Path, default=STORE_DIR)
+    mig.add_argument("--delete", action="store_true", help="remove flat files after import")
+    args = parser.parse_args()
+
+    if args.cmd == "migrate":
+        migrate_flat_cache(args.src, delete=args.delete)
+
+
+if __name__ == "__main__":
+    main()
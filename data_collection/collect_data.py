@@ -1,31 +1,59 @@
+import argparse
+
 from .the_big_loop import process_all_games as fetch_game_data
 from .parse_box_score import main as parse_box_scores
 from .parse_play_by_play import main as parse_play_by_plays
 from .get_todays_games import get_games as get_todays_games
 from .get_lines import main as fetch_betting_lines
 from .aggregate_lines import main as aggregate_betting_lines
+from pipeline_dag import Step, run_dag
+from instrumentation import start_run, timer
+
+CACHE_MANIFEST = "data_collection/update_game_cache/manifest.sqlite"
+GAME_IDS = "data_collection/new_game_ids.json"
+
+# Every step always runs (their real inputs are the NHL and odds APIs); the
+# artifacts only order them, so game fetch/parse and betting lines run side by side.
+# The betting-lines branch is optional: an odds API outage or quota error is
+# logged and the rest of collection (and the daily pipeline after it) carries on.
+STEPS = [
+    Step("Processing yesterdays game data", fetch_game_data,
+         [GAME_IDS], [CACHE_MANIFEST], always=True),
+    Step("Parsing boxscore data", parse_box_scores,
+         [CACHE_MANIFEST], ["data_collection/update_box/*.parquet"], always=True),
+    Step("Parsing play-by-play data", parse_play_by_plays,
+         [CACHE_MANIFEST], ["data_collection/update_pbp/*.parquet"], always=True),
+    Step("Getting today's games", get_todays_games,
+         [], [GAME_IDS, "data_collection/todays_games.csv"], always=True),
+    Step("Fetching betting lines", fetch_betting_lines,
+         [], ["betting_lines_store/*", "betting_lines_cache/*"], always=True, optional=True),
+    Step("Aggregating betting lines", aggregate_betting_lines,
+         ["betting_lines_store/*", "betting_lines_cache/*"], ["betting_lines/betting_lines_{today}.csv"],
+         always=True, optional=True),
+]
+DEFAULT_WORKERS = 3
+
 
 def run_step(name, func):
     print(f"\n--- {name} ---")
     try:
-        func()
+        # Failures are recorded in the run ledger and re-raised, so the DAG runner
+        # cancels the steps downstream of them (parsing never runs on a failed fetch)
+        with timer(name) as span:
+            func()
+        print(f"--- {name} done ({span.wall_s:.2f}s, peak RSS {span.peak_rss_mb} MB) ---")
     except Exception as e:
         print(f"Error during {name}: {e}")
+        raise
 
-def main():
-    run_step("Processing yesterdays game data", fetch_game_data)
-
-    run_step("Parsing boxscore data", parse_box_scores)
-
-    run_step("Parsing play-by-play data", parse_play_by_plays)
-
-    run_step("Getting today's games", get_todays_games)
-
-    run_step("Fetching betting lines", fetch_betting_lines)
-
-    run_step("Aggregating betting lines", aggregate_betting_lines)
+def main(workers: int = DEFAULT_WORKERS):
+    start_run("collect_data")
+    run_dag(STEPS, run_step, workers=workers)
 
     print("\nData collection and processing complete.")
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Daily data collection")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="steps run at the same time (1 = one after another)")
+    main(workers=parser.parse_args().workers)
@@ -0,0 +1,274 @@
+# Columnar play-level event archive.
+#
+# One-time extraction of every cached play-by-play payload into typed,
+# season-partitioned Parquet tables:
+#   event_archive/events/season=YYYY/part-*.parquet   -- one row per play
+#   event_archive/rosters/season=YYYY/part-*.parquet  -- one row per roster spot
+#
+# Later runs only extract games not yet archived. New per-player stats can then
+# be prototyped as vectorized group-bys over the events table
+# (see player_event_aggregates) instead of re-decoding the JSON cache.
+#
+#   python -m data_collection.event_archive build [--seasons 2024 2025]
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .cache_store import get_store
+from .parse_play_by_play import COUNTER_FIELDS, EVENT_TABLE, SITUATION_PP, NO_PP, HOME_PP, AWAY_PP
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+ARCHIVE_DIR = PROJECT_ROOT / "event_archive"
+EVENTS_DIR = ARCHIVE_DIR / "events"
+ROSTERS_DIR = ARCHIVE_DIR / "rosters"
+
+# Games per part file -- keeps files in the tens-of-MB range
+CHUNK_GAMES = 250
+
+EVENT_DTYPES = {
+    "game_id": "int64",
+    "season": "int32",
+    "sort_order": "int32",
+    "event_id": "int32",
+    "period": "int8",
+    "period_type": "category",
+    "time_in_period": "string",
+    "period_seconds": "int16",
+    "type_code": "int16",
+    "type_desc_key": "category",
+    "situation_code": "string",
+    "home_team_id": "int16",
+    "away_team_id": "int16",
+    "event_owner_team_id": "Int16",
+    "shooting_player_id": "Int64",
+    "scoring_player_id": "Int64",
+    "blocking_player_id": "Int64",
+    "hitting_player_id": "Int64",
+    "hittee_player_id": "Int64",
+    "x_coord": "Float32",
+    "y_coord": "Float32",
+    "zone_code": "category",
+    "shot_type": "category",
+}
+
+ROSTER_DTYPES = {
+    "game_id": "int64",
+    "season": "int32",
+    "team_id": "int16",
+    "player_id": "int64",
+    "position_code": "category",
+    "first_name": "string",
+    "last_name": "string",
+    "sweater_number": "Int16",
+    "headshot_url": "string",
+}
+
+DETAIL_FIELDS = {
+    "event_owner_team_id": "eventOwnerTeamId",
+    "shooting_player_id": "shootingPlayerId",
+    "scoring_player_id": "scoringPlayerId",
+    "blocking_player_id": "blockingPlayerId",
+    "hitting_player_id": "hittingPlayerId",
+    "hittee_player_id": "hitteePlayerId",
+    "x_coord": "xCoord",
+    "y_coord": "yCoord",
+    "zone_code": "zoneCode",
+    "shot_type": "shotType",
+}
+
+
+def clock_to_seconds(clock: Optional[str]) -> int:
+    try:
+        mins, secs = clock.split(":")
+        return int(mins) * 60 + int(secs)
+    except (AttributeError, ValueError):
+        return 0
+
+
+def extract_game(pbp: dict) -> tuple[List[Dict], List[Dict]]:
+    """Flatten one play-by-play payload into event rows and roster rows."""
+    game_id = pbp.get("id")
+    season = int(str(pbp.get("season"))[:4])
+    home_team = pbp.get("homeTeam", {}).get("id")
+    away_team = pbp.get("awayTeam", {}).get("id")
+
+    events = []
+    for play in pbp.get("plays", []):
+        period = play.get("periodDescriptor", {})
+        details = play.get("details") or {}
+        events.append({
+            "game_id": game_id,
+            "season": season,
+            "sort_order": play.get("sortOrder"),
+            "event_id": play.get("eventId"),
+            "period": period.get("number"),
+            "period_type": period.get("periodType"),
+            "time_in_period": play.get("timeInPeriod"),
+            "period_seconds": clock_to_seconds(play.get("timeInPeriod")),
+            "type_code": play.get("typeCode"),
+            "type_desc_key": play.get("typeDescKey"),
+            "situation_code": play.get("situationCode"),
+            "home_team_id": home_team,
+            "away_team_id": away_team,
+            **{col: details.get(key) for col, key in DETAIL_FIELDS.items()},
+        })
+
+    rosters = [{
+        "game_id": game_id,
+        "season": season,
+        "team_id": spot.get("teamId"),
+        "player_id": spot.get("playerId"),
+        "position_code": spot.get("positionCode"),
+        "first_name": (spot.get("firstName") or {}).get("default"),
+        "last_name": (spot.get("lastName") or {}).get("default"),
+        "sweater_number": spot.get("sweaterNumber"),
+        "headshot_url": spot.get("headshot"),
+    } for spot in pbp.get("rosterSpots", [])]
+
+    return events, rosters
+
+
+def archived_game_ids(table_dir: Path, season: int) -> set:
+    part_dir = table_dir / f"season={season}"
+    if not part_dir.exists():
+        return set()
+    return set(pd.read_parquet(part_dir, columns=["game_id"])["game_id"].unique().tolist())
+
+
+def write_part(rows: List[Dict], dtypes: Dict[str, str], table_dir: Path, season: int, tag: str) -> None:
+    df = pd.DataFrame(rows, columns=list(dtypes)).astype(dtypes)
+    out_dir = table_dir / f"season={season}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df.drop(columns="season").to_parquet(out_dir / f"part-{tag}.parquet", index=False)
+
+
+def build_event_archive(seasons: Optional[Iterable[int]] = None) -> int:
+    """Extract every cached play-by-play game not yet in the archive. Returns games added."""
+    store = get_store()
+    added = 0
+    by_season: Dict[int, List[str]] = {}
+    for gid in store.list_game_ids("play-by-play", seasons=seasons):
+        by_season.setdefault(int(gid[:4]), []).append(gid)
+
+    for season, game_ids in sorted(by_season.items()):
+        done = archived_game_ids(EVENTS_DIR, season)
+        todo = [gid for gid in game_ids if int(gid) not in done]
+        print(f"Season {season}: {len(done)} games archived, {len(todo)} to extract")
+
+        for start in range(0, len(todo), CHUNK_GAMES):
+            chunk = todo[start:start + CHUNK_GAMES]
+            events, rosters = [], []
+            extracted = 0
+            for gid in chunk:
+                pbp = store.get(gid, "play-by-play")
+                if not pbp:
+                    print(f"No play-by-play for {gid}, skipping.")
+                    continue
+                ev, ro = extract_game(pbp)
+                events.extend(ev)
+                rosters.extend(ro)
+                extracted += 1
+            if not events:
+                continue
+            tag = f"{chunk[0]}-{chunk[-1]}"
+            write_part(events, EVENT_DTYPES, EVENTS_DIR, season, tag)
+            write_part(rosters, ROSTER_DTYPES, ROSTERS_DIR, season, tag)
+            added += extracted
+            print(f"  archived {extracted} games {tag} ({len(events)} plays)")
+
+    return added
+
+
+def load_events(seasons: Optional[Iterable[int]] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read the events table (optionally pruned to seasons/columns)."""
+    return _load(EVENTS_DIR, seasons, columns)
+
+
+def load_rosters(seasons: Optional[Iterable[int]] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    return _load(ROSTERS_DIR, seasons, columns)
+
+
+def _load(table_dir: Path, seasons, columns) -> pd.DataFrame:
+    filters = [("season", "in", list(seasons))] if seasons is not None else None
+    df = pd.read_parquet(table_dir, columns=columns, filters=filters)
+    if "season" in df.columns:
+        df["season"] = df["season"].astype("int32")
+    return df
+
+
+def player_event_aggregates(events: pd.DataFrame, rosters: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized equivalent of parse_play_by_play's counters: one row per skater per
+    game with COUNTER_FIELDS, driven by the same EVENT_TABLE / SITUATION_PP tables.
+    """
+    skaters = rosters.loc[rosters["position_code"] != "G", ["game_id", "team_id", "player_id"]]
+
+    ev = events[(events["period_type"] != "SO") & events["type_desc_key"].isin(list(EVENT_TABLE))]
+    etype = ev["type_desc_key"].astype(str)
+
+    # Player credited for each play, from the event type's player field
+    field_cols = {"shootingPlayerId": "shooting_player_id", "scoringPlayerId": "scoring_player_id",
+                  "hitteePlayerId": "hittee_player_id"}
+    pid = pd.Series(pd.NA, index=ev.index, dtype="Int64")
+    for t, (field, _, _, _) in EVENT_TABLE.items():
+        mask = etype == t
+        pid[mask] = ev.loc[mask, field_cols[field]]
+
+    plays = pd.DataFrame({
+        "game_id": ev["game_id"].to_numpy(),
+        "player_id": pid.to_numpy(),
+        "etype": etype.to_numpy(),
+        "pp_side": ev["situation_code"].map(SITUATION_PP).fillna(NO_PP).astype("int8").to_numpy(),
+        "home_team_id": ev["home_team_id"].to_numpy(),
+        "away_team_id": ev["away_team_id"].to_numpy(),
+    }).dropna(subset=["player_id"])
+    plays["player_id"] = plays["player_id"].astype("int64")
+    plays = plays.merge(skaters, on=["game_id", "player_id"], how="inner")
+
+    side = np.select(
+        [plays["team_id"] == plays["home_team_id"], plays["team_id"] == plays["away_team_id"]],
+        [HOME_PP, AWAY_PP], default=NO_PP,
+    )
+    special = (plays["pp_side"] != NO_PP) & (side != NO_PP)
+    on_pp = special & (side == plays["pp_side"])
+    on_pk = special & (side != plays["pp_side"])
+
+    counters = {}
+    for name in COUNTER_FIELDS:
+        base_types = [t for t, (_, base, _, _) in EVENT_TABLE.items() if name in base]
+        pp_types = [t for t, (_, _, pp, _) in EVENT_TABLE.items() if name in pp]
+        pk_types = [t for t, (_, _, _, pk) in EVENT_TABLE.items() if name in pk]
+        counters[name] = (
+            plays["etype"].isin(base_types)
+            | (on_pp & plays["etype"].isin(pp_types))
+            | (on_pk & plays["etype"].isin(pk_types))
+        ).astype("int32")
+
+    agg = (
+        pd.concat([plays[["game_id", "player_id"]], pd.DataFrame(counters)], axis=1)
+        .groupby(["game_id", "player_id"], sort=False).sum()
+    )
+    agg[["on_pp", "on_pk"]] = agg[["on_pp", "on_pk"]].clip(upper=1)
+
+    out = skaters.merge(agg.reset_index(), on=["game_id", "player_id"], how="left")
+    out[COUNTER_FIELDS] = out[COUNTER_FIELDS].fillna(0).astype("int64")
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play-level event archive")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    build = sub.add_parser("build", help="extract cached play-by-play games not yet archived")
+    build.add_argument("--seasons", type=int, nargs="*")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        added = build_event_archive(args.seasons)
+        print(f"Done! Archived {added} new games under {ARCHIVE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
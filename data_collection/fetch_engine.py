@@ -0,0 +1,148 @@
+import asyncio
+import random
+import time
+from typing import Dict, Iterable, Optional
+
+import requests
+
+from .generate_cache import GAME_URL
+from .cache_store import get_store
+from .json_codec import DECODE_ERRORS, loads
+from .http_client import get_session, is_fresh, conditional_headers, response_meta
+
+ENDPOINTS = ("boxscore", "play-by-play")
+
+# Defaults tuned for api-web.nhle.com -- roughly what the old 0.2s sleep allowed,
+# but spread across several requests in flight instead of one at a time.
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 5.0          # requests per second, shared by all workers
+DEFAULT_BURST = 5
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.5       # seconds, doubled each attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Shared async rate limiter: refills `rate` tokens/sec up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt: int, base: float = DEFAULT_BACKOFF, retry_after: Optional[str] = None) -> float:
+    """Exponential backoff with full jitter; honours a numeric Retry-After header."""
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, base * (2 ** attempt))
+
+
+async def request_with_retry(url: str, bucket: TokenBucket, headers: Optional[dict] = None,
+                             retries: int = DEFAULT_RETRIES) -> Optional[requests.Response]:
+    """
+    GET a URL on the shared pooled session through the rate limiter, retrying
+    429/5xx and network errors. Returns the 200/304 response, or None on failure.
+    """
+    session = get_session()
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            r = await asyncio.to_thread(session.get, url, headers=headers, timeout=10)
+        except requests.RequestException as e:
+            if attempt == retries:
+                print(f"Request error for {url}: {e}")
+                return None
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+
+        if r.status_code in (200, 304):
+            return r
+
+        if r.status_code in RETRY_STATUSES and attempt < retries:
+            await asyncio.sleep(backoff_delay(attempt, retry_after=r.headers.get("Retry-After")))
+            continue
+
+        print(f"Request failed ({r.status_code}) for {url}")
+        return None
+    return None
+
+
+async def fetch_to_cache(game_id, endpoint: str, bucket: TokenBucket, sem: asyncio.Semaphore,
+                         retries: int = DEFAULT_RETRIES) -> bool:
+    """
+    Fetch one gamecenter endpoint into the game cache store. Fresh entries are skipped,
+    stale ones are revalidated conditionally; a failed refresh keeps the stale copy.
+    """
+    url = GAME_URL.format(game_id=game_id, endpoint=endpoint)
+    store = get_store()
+    cached = await asyncio.to_thread(store.get, game_id, endpoint)
+    meta = await asyncio.to_thread(store.get_meta, game_id, endpoint)
+    if cached is not None and is_fresh(meta, cached):
+        return True
+
+    headers = conditional_headers(meta) if cached is not None else {}
+    async with sem:
+        r = await request_with_retry(url, bucket, headers=headers, retries=retries)
+    if r is None:
+        return cached is not None
+    if r.status_code == 304 and cached is not None:
+        await asyncio.to_thread(store.touch, game_id, endpoint, response_meta(r, cached, meta))
+        return True
+
+    try:
+        data = loads(r.content)
+    except DECODE_ERRORS:
+        print(f"Invalid JSON for {url}")
+        return False
+    if not data:
+        return False
+    await asyncio.to_thread(store.put_bytes, game_id, endpoint, r.content, response_meta(r, data))
+    return True
+
+
+async def fetch_games(game_ids: Iterable, endpoints=ENDPOINTS,
+                      concurrency: int = DEFAULT_CONCURRENCY,
+                      rate: float = DEFAULT_RATE,
+                      burst: int = DEFAULT_BURST,
+                      retries: int = DEFAULT_RETRIES) -> Dict[object, bool]:
+    """
+    Fetch every (game, endpoint) pair concurrently into the game cache.
+    At most `concurrency` requests are in flight and all of them share one
+    token bucket of `rate` requests/sec. Returns {game_id: True if all endpoints cached}.
+    """
+    bucket = TokenBucket(rate, burst)
+    sem = asyncio.Semaphore(concurrency)
+
+    async def fetch_game(gid):
+        results = await asyncio.gather(
+            *(fetch_to_cache(gid, ep, bucket, sem, retries=retries) for ep in endpoints)
+        )
+        return gid, all(results)
+
+    status = {}
+    for coro in asyncio.as_completed([fetch_game(gid) for gid in game_ids]):
+        gid, ok = await coro
+        status[gid] = ok
+    return status
+
+
+def fetch_games_sync(game_ids: Iterable, **kwargs) -> Dict[object, bool]:
+    """Blocking wrapper around fetch_games for the script entry points."""
+    return asyncio.run(fetch_games(list(game_ids), **kwargs))
@@ -1,32 +1,51 @@
-import os, time, json, requests
-import pathlib
+import time
 
+from .http_client import get_session, is_fresh, conditional_headers, response_meta
+from .cache_store import get_store
+from .json_codec import DECODE_ERRORS, loads
+
+
+GAME_URL = "https://api-web.nhle.com/v1/gamecenter/{game_id}/{endpoint}"
+
+
+def cache_key(url):
+    """(game_id, endpoint) for a gamecenter URL."""
+    parts = url.rstrip("/").split("/")
+    return parts[-2], parts[-1]
 
-BASE_DIR = pathlib.Path(__file__).resolve().parent
-CACHE_DIR = BASE_DIR / "update_game_cache"
-os.makedirs(CACHE_DIR, exist_ok=True)
 
 def cached_request(url):
-    """Fetch JSON data with caching to local disk."""
-    fname = os.path.join(CACHE_DIR, url.split("/")[-2] + "_" + url.split("/")[-1].replace("/", "_"))
-    if os.path.exists(fname):
-        with open(fname, "r") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                pass  # Invalid cache → re-fetch
-
-    r = requests.get(url, timeout=10)
+    """
+    Fetch JSON data with caching to the local game cache store.
+    Final games are served from cache forever; live/preview games expire and are
+    revalidated with a conditional request, so an unchanged game costs a 304.
+    """
+    store = get_store()
+    game_id, endpoint = cache_key(url)
+    data = store.get(game_id, endpoint)
+    meta = store.get_meta(game_id, endpoint)
+    if data is not None and is_fresh(meta, data):
+        return data
+
+    headers = conditional_headers(meta) if data is not None else {}
+    try:
+        r = get_session().get(url, headers=headers, timeout=10)
+    except Exception as e:
+        print(f"Request error for {url}: {e}")
+        return data if data is not None else {}
+
+    if r.status_code == 304 and data is not None:
+        store.touch(game_id, endpoint, response_meta(r, data, meta))
+        return data
     if r.status_code != 200:
         print(f"Request failed ({r.status_code}) for {url}")
-        return {}
+        return data if data is not None else {}
     try:
-        data = r.json()
-    except Exception:
+        data = loads(r.content)
+    except DECODE_ERRORS:
         print(f"Invalid JSON for {url}")
         return {}
-    with open(fname, "w") as f:
-        json.dump(data, f)
+    store.put_bytes(game_id, endpoint, r.content, response_meta(r, data))
     time.sleep(0.2)
     return data
 
@@ -34,13 +53,13 @@ def cached_request(url):
 # Boxscore
 def get_boxscore_data(game_id):
     """Fetch boxscore data and extract skater info (forwards + defense)."""
-    url = f"https://api-web.nhle.com/v1/gamecenter/{game_id}/boxscore"
+    url = GAME_URL.format(game_id=game_id, endpoint="boxscore")
     return cached_request(url)
 
     
 # Play-by-play
 def get_play_by_play_from_game_id(game_id):
     """Fetch raw play-by-play data for the game."""
-    url = f"https://api-web.nhle.com/v1/gamecenter/{game_id}/play-by-play"
+    url = GAME_URL.format(game_id=game_id, endpoint="play-by-play")
     return cached_request(url)
-   
\ No newline at end of file
+   
@@ -1,57 +1,39 @@
-import requests
 from pathlib import Path
-from datetime import date, timedelta
+from datetime import date
 import json
-import time
+
+from .schedule import crawl_schedule, save_schedule
 
 PROJECT_ROOT = Path(__file__).resolve().parent
 
 def get_game_ids_for_season(start_date, end_date):
     """
-    Loops through each date in the given range and collects all NHL game IDs.
-    Returns a list of unique game IDs (regular season only).
+    Crawls the schedule one gameWeek per request (weeks fetched in parallel),
+    stores every game in the local schedule table, and returns a sorted list
+    of unique game IDs (regular season only).
     """
-    game_ids = set()
-    current_date = start_date
-
-    while current_date <= end_date:
-        date_str = current_date.strftime("%Y-%m-%d")
-        url = f"https://api-web.nhle.com/v1/schedule/{date_str}"
-        try:
-            resp = requests.get(url, timeout=10)
-            if resp.status_code == 200:
-                data = resp.json()
-
-                # Iterate over all gameWeeks, not just the first one
-                for week in data.get("gameWeek", []):
-                    for game in week.get("games", []):
-                        if game.get("gameType") == 2:  # 2 = regular season
-                            game_ids.add(game["id"])
-
-                print(f"{date_str}: {len(game_ids)} total games so far")
-
-            else:
-                print(f"HTTP {resp.status_code} for {date_str}")
-
-        except Exception as e:
-            print(f"Failed for {date_str}: {e}")
+    games = crawl_schedule(start_date, end_date)
+    saved = save_schedule(games)
+    print(f"Saved {saved} scheduled games to the schedule table")
 
-        current_date += timedelta(days=1)
-        time.sleep(0.25)  # Prevent rate limiting
+    game_ids = {game["game_id"] for game in games if game["game_type"] == 2}  # 2 = regular season
+    return sorted(game_ids)
 
-    return sorted(list(game_ids))
 
+def main() -> None:
+    season_start = date(2026, 2, 5)
+    season_end = date(2026, 2, 26)
 
+    print("Fetching game IDs...")
+    game_ids = get_game_ids_for_season(season_start, season_end)
+    print(f"Found {len(game_ids)} regular-season games")
 
-season_start = date(2026, 2, 5)
-season_end = date(2026, 2, 26)
+    # Save to file
+    with open(PROJECT_ROOT / "nhl_game_ids_feb.json", "w") as f:
+        json.dump({"2026": game_ids}, f, indent=2)
 
-print("Fetching game IDs...")
-game_ids = get_game_ids_for_season(season_start, season_end)
-print(f"Found {len(game_ids)} regular-season games")
+    print("Saved game IDs to nhl_game_ids_feb.json")
 
-# Save to file
-with open(PROJECT_ROOT / "nhl_game_ids_feb.json", "w") as f:
-    json.dump({"2026": game_ids}, f, indent=2)
 
-print("Saved game IDs to nhl_game_ids_feb.json")
+if __name__ == "__main__":
+    main()
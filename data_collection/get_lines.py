@@ -1,7 +1,15 @@
 import json
-import requests
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from dotenv import load_dotenv
+
+from .http_client import get_session
+from .aggregate_lines import is_today_local
+from .odds_store import append_snapshot
+
 load_dotenv()
 
 API_KEY = os.environ.get("ODDS_API_KEY")
@@ -18,38 +26,143 @@ URL_BASE = "https://api.the-odds-api.com/v4/sports"
 CACHE_DIR = "betting_lines_cache"
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+# Odds fetching runs a few requests in flight on the shared session.
+# Each odds call costs len(MARKETS) x len(REGIONS) credits (1 here); stop
+# spending once the remaining quota would drop below QUOTA_RESERVE.
+MAX_WORKERS = 4
+QUOTA_RESERVE = 25
+
 #Event ids can be found in the id field in the response of the /events endpoint (see /v4/sports/{sports}/events).
 #If the event has expired (not receiving updates due to completion or cancellation), a HTTP 404 status code will be returned.
 EVENT_URL = URL_BASE + "/{SPORT}/events/?apiKey={API_KEY}"
 # Get odds for event id
 ODDS_URL = URL_BASE + "/{SPORT}/events/{eventId}/odds/?apiKey={API_KEY}&regions={REGIONS}&markets={MARKETS}&dateFormat={DATE_FORMAT}&oddsFormat={ODDS_FORMAT}"
 
-def get_event_ids():
+class QuotaTracker:
+    """Tracks Odds API credits from x-requests-* headers and per-request latency."""
+
+    def __init__(self, reserve: int = QUOTA_RESERVE):
+        self.reserve = reserve
+        self.remaining = None
+        self.used = None
+        self.in_flight = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, url_id: str, r, latency: float) -> None:
+        with self.lock:
+            remaining = r.headers.get("x-requests-remaining")
+            used = r.headers.get("x-requests-used")
+            if remaining is not None:
+                self.remaining = int(float(remaining))
+            if used is not None:
+                self.used = int(float(used))
+            self.requests.append({
+                "kind": kind,
+                "id": url_id,
+                "status": r.status_code,
+                "latency_ms": round(latency * 1000, 1),
+                "cost": r.headers.get("x-requests-last"),
+                "remaining": self.remaining,
+                "used": self.used,
+            })
+
+    def reserve_call(self, cost: int = 1) -> bool:
+        """Claim budget for one odds request; False once the reserve would be breached."""
+        with self.lock:
+            if self.remaining is not None and self.remaining - self.in_flight - cost < self.reserve:
+                return False
+            self.in_flight += cost
+            return True
+
+    def release_call(self, cost: int = 1) -> None:
+        with self.lock:
+            self.in_flight -= cost
+
+
+def timed_get(url: str, kind: str, url_id: str, quota: QuotaTracker):
+    start = time.perf_counter()
+    r = get_session().get(url, timeout=10)
+    quota.record(kind, url_id, r, time.perf_counter() - start)
+    return r
+
+
+def get_event_ids(quota: QuotaTracker = None):
+    quota = quota or QuotaTracker()
     url = EVENT_URL.format(SPORT=SPORT, API_KEY=API_KEY)
-    r = requests.get(url)
+    r = timed_get(url, "events", "", quota)
     data = r.json()
     event_ids = [event['id'] for event in data]
     return event_ids, data
 
-def get_odds_for_event(event_id: str):
+def get_odds_for_event(event_id: str, quota: QuotaTracker = None):
+    quota = quota or QuotaTracker()
     url = ODDS_URL.format(SPORT=SPORT, API_KEY=API_KEY, REGIONS=REGIONS, MARKETS=MARKETS, DATE_FORMAT=DATE_FORMAT, ODDS_FORMAT=ODDS_FORMAT, eventId=event_id)
-    r = requests.get(url)
+    r = timed_get(url, "odds", event_id, quota)
     data = r.json()
     return data
 
+def fetch_and_cache_odds(event_id: str, quota: QuotaTracker):
+    """Fetch odds for one event if the quota allows it and cache them to disk. Returns the payload or None."""
+    if not quota.reserve_call():
+        print(f"Skipping event {event_id}: quota reserve reached ({quota.remaining} remaining).")
+        return None
+    try:
+        print(f"Fetching odds for event {event_id}...")
+        odds_data = get_odds_for_event(event_id, quota)
+    except Exception as e:
+        print(f"Failed to fetch odds for event {event_id}: {e}")
+        return None
+    finally:
+        quota.release_call()
+    with open(os.path.join(CACHE_DIR, f"odds_{event_id}.json"), "w") as f:
+        json.dump(odds_data, f, indent=2)
+    return odds_data
+
+def write_quota_report(quota: QuotaTracker, n_events: int, n_today: int, n_fetched: int, wall: float) -> str:
+    latencies = sorted(r["latency_ms"] for r in quota.requests if r["kind"] == "odds")
+    report = {
+        "run_ts": datetime.now().isoformat(timespec="seconds"),
+        "events_listed": n_events,
+        "events_today": n_today,
+        "odds_fetched": n_fetched,
+        "odds_skipped": n_today - n_fetched,
+        "requests_remaining": quota.remaining,
+        "requests_used": quota.used,
+        "wall_s": round(wall, 2),
+        "latency_ms_p50": latencies[len(latencies) // 2] if latencies else None,
+        "latency_ms_max": latencies[-1] if latencies else None,
+        "requests": quota.requests,
+    }
+    path = os.path.join(CACHE_DIR, f"quota_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
 def main() -> None:
-    event_ids, data = get_event_ids()
+    start = time.perf_counter()
+    quota = QuotaTracker()
+    event_ids, data = get_event_ids(quota)
     with open(os.path.join(CACHE_DIR, "event_ids.json"), "w") as f:
         json.dump(event_ids, f, indent=2)
     with open(os.path.join(CACHE_DIR, "events_data.json"), "w") as f:
         json.dump(data, f, indent=2)
     print(f"Found {len(event_ids)} events.")
-    for event_id in event_ids:
-        print(f"Fetching odds for event {event_id}...")
-        odds_data = get_odds_for_event(event_id)
-        with open(os.path.join(CACHE_DIR, f"odds_{event_id}.json"), "w") as f:
-            json.dump(odds_data, f, indent=2)
-            
+
+    # aggregate_lines only keeps today's games -- don't spend credits on the rest
+    today_ids = [event["id"] for event in data if is_today_local(event.get("commence_time"))]
+    print(f"{len(today_ids)} events start today; quota remaining: {quota.remaining}")
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        odds = [o for o in pool.map(lambda eid: fetch_and_cache_odds(eid, quota), today_ids) if o is not None]
+    fetched = len(odds)
+
+    # Append this run to the line-movement history (odds_{event_id}.json only keeps the latest)
+    n_rows = append_snapshot(odds)
+    print(f"Appended {n_rows} outcome rows to the odds snapshot store.")
+
+    report = write_quota_report(quota, len(event_ids), len(today_ids), fetched, time.perf_counter() - start)
+    print(f"Fetched odds for {fetched}/{len(today_ids)} events; {quota.remaining} requests remaining. Report: {report}")
     print("Done.")
 
 if __name__ == "__main__":
@@ -1,15 +1,16 @@
-import requests
 from datetime import datetime
 from pathlib import Path
 import csv, json
 
+from .http_client import get_session
+
 PROJECT_ROOT = Path(__file__).resolve().parent
 OUTPUT_FILE = PROJECT_ROOT / "todays_games.csv"
 
 def get_games():
     today = datetime.now().date().isoformat()
     url = f"https://api-web.nhle.com/v1/score/{today}"
-    r = requests.get(url)
+    r = get_session().get(url, timeout=10)
     data = r.json()
     
     game_info = []
@@ -0,0 +1,83 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# One keep-alive session per process, shared by every fetcher (NHL API + Odds API).
+# pool_maxsize must cover the async engine's concurrency or urllib3 discards sockets.
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+USER_AGENT = "nhl-sog-prediction/1.0"
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the shared pooled keep-alive session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                s.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+                _session = s
+    return _session
+
+
+# --- Freshness policy ---
+# gameState values from api-web.nhle.com: FUT/PRE (scheduled), LIVE/CRIT (in progress),
+# FINAL/OFF (done). Final games never change again; everything else expires.
+FINAL_STATES = {"FINAL", "OFF"}
+TTL_BY_STATE = {
+    "LIVE": 60,
+    "CRIT": 30,
+    "PRE": 15 * 60,
+    "FUT": 60 * 60,
+}
+DEFAULT_TTL = 15 * 60
+
+
+def is_fresh(meta: Optional[Dict[str, Any]], payload: Optional[dict] = None, now: Optional[float] = None) -> bool:
+    """
+    True if a cached entry can be served without touching the network.
+    Falls back to the payload's own gameState for entries cached before metadata existed.
+    """
+    state = (meta or {}).get("game_state") or (payload or {}).get("gameState")
+    if state in FINAL_STATES:
+        return True
+    if not meta or "fetched_at" not in meta:
+        return False
+    now = time.time() if now is None else now
+    return now - meta["fetched_at"] < TTL_BY_STATE.get(state, DEFAULT_TTL)
+
+
+def conditional_headers(meta: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since from stored validators, so unchanged data comes back as a 304."""
+    headers = {}
+    if not meta:
+        return headers
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def response_meta(resp: requests.Response, payload: Optional[dict], previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Cache metadata for a 200 (new validators) or 304 (keep old validators, bump fetched_at)."""
+    meta = dict(previous or {})
+    meta["url"] = resp.url
+    meta["fetched_at"] = time.time()
+    if resp.headers.get("ETag"):
+        meta["etag"] = resp.headers["ETag"]
+    if resp.headers.get("Last-Modified"):
+        meta["last_modified"] = resp.headers["Last-Modified"]
+    if isinstance(payload, dict) and payload.get("gameState"):
+        meta["game_state"] = payload["gameState"]
+    return meta
@@ -0,0 +1,71 @@
+# Pluggable JSON codec for NHL API payloads.
+#
+# Decoding works on bytes end to end (disk or HTTP body -> objects, no str round
+# trip) and uses the fastest installed backend:
+#   orjson  -- plain decode/encode
+#   msgspec -- schema decode: only the fields named in a TypedDict schema are
+#              materialized, everything else in the payload is skipped
+#   json    -- stdlib fallback when neither is installed
+# Schema-decoded payloads are still plain dicts/lists, so callers keep using .get().
+import json
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BACKENDS = tuple(name for name, mod in (("orjson", orjson), ("msgspec", msgspec)) if mod is not None) + ("json",)
+BACKEND = BACKENDS[0]
+
+# Everything a backend raises for bad input
+DECODE_ERRORS: tuple = (ValueError,) + ((msgspec.DecodeError,) if msgspec is not None else ())
+
+_decoders: dict = {}
+
+
+def set_backend(name: str) -> None:
+    """Force a backend (e.g. 'json' to compare against stdlib)."""
+    global BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"JSON backend {name!r} is not available (have {', '.join(BACKENDS)})")
+    BACKEND = name
+
+
+def _schema_decoder(schema):
+    dec = _decoders.get(schema)
+    if dec is None:
+        dec = _decoders[schema] = msgspec.json.Decoder(schema)
+    return dec
+
+
+def loads(raw: bytes, schema: Optional[type] = None) -> Any:
+    """
+    Decode JSON bytes. With a schema (TypedDict) and msgspec installed, only the
+    schema's fields are decoded; a payload that doesn't fit the schema falls back
+    to a full decode rather than failing.
+    """
+    if schema is not None and msgspec is not None and BACKEND != "json":
+        try:
+            return _schema_decoder(schema).decode(raw)
+        except msgspec.ValidationError:
+            pass
+    if BACKEND == "orjson":
+        return orjson.loads(raw)
+    if BACKEND == "msgspec":
+        return msgspec.json.decode(raw)
+    return json.loads(raw)
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes."""
+    if BACKEND == "orjson":
+        return orjson.dumps(obj)
+    if BACKEND == "msgspec":
+        return msgspec.json.encode(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
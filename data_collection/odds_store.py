@@ -0,0 +1,123 @@
+# Append-only Parquet store of betting line snapshots.
+#
+# Every get_lines run appends one file per game date:
+#   betting_lines_store/game_date=YYYY-MM-DD/snapshot_{fetched_at}.parquet
+# with one row per (event, book, market, player, side, point) outcome, stamped
+# with the fetch time. Nothing is overwritten, so intraday line movement is kept
+# and backtests can replay the board as it stood at bet time via latest_as_of().
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+LOCAL_TZ = ZoneInfo("America/Los_Angeles")
+STORE_DIR = Path("betting_lines_store")
+
+SNAPSHOT_COLUMNS = [
+    "fetched_at", "event_id", "commence_time", "home_team", "away_team",
+    "book_key", "book_last_update", "market", "player_name", "side", "point", "price",
+]
+# A book's board at time T is its most recent snapshot at or before T
+BOOK_KEY = ["event_id", "book_key"]
+
+
+def game_date_of(commence_time: pd.Series) -> pd.Series:
+    """Local (America/Los_Angeles) calendar date a game starts on -- the partition key."""
+    return pd.to_datetime(commence_time, utc=True).dt.tz_convert(LOCAL_TZ).dt.date.astype(str)
+
+
+def events_to_rows(events: Iterable[Dict[str, Any]], fetched_at: datetime) -> List[Dict[str, Any]]:
+    """Flatten Odds API event payloads into one row per outcome."""
+    rows = []
+    for ev in events:
+        if not isinstance(ev, dict):
+            continue
+        for book in ev.get("bookmakers", []) or []:
+            for market in book.get("markets", []) or []:
+                for out in market.get("outcomes", []) or []:
+                    rows.append({
+                        "fetched_at": fetched_at,
+                        "event_id": ev.get("id", ""),
+                        "commence_time": ev.get("commence_time"),
+                        "home_team": ev.get("home_team", ""),
+                        "away_team": ev.get("away_team", ""),
+                        "book_key": book.get("key", ""),
+                        "book_last_update": market.get("last_update") or book.get("last_update"),
+                        "market": market.get("key", ""),
+                        "player_name": out.get("description") or out.get("player") or "",
+                        "side": out.get("name"),
+                        "point": out.get("point"),
+                        "price": out.get("price"),
+                    })
+    return rows
+
+
+def append_snapshot(events: Iterable[Dict[str, Any]], fetched_at: Optional[datetime] = None,
+                    store_dir: Path = STORE_DIR) -> int:
+    """Write one snapshot file per game-date partition. Returns rows written."""
+    fetched_at = fetched_at or datetime.now(timezone.utc)
+    df = pd.DataFrame(events_to_rows(events, fetched_at), columns=SNAPSHOT_COLUMNS)
+    if df.empty:
+        return 0
+
+    df["fetched_at"] = pd.to_datetime(df["fetched_at"], utc=True)
+    df["commence_time"] = pd.to_datetime(df["commence_time"], utc=True, errors="coerce")
+    df["book_last_update"] = pd.to_datetime(df["book_last_update"], utc=True, errors="coerce")
+    df["point"] = pd.to_numeric(df["point"], errors="coerce")
+    df["price"] = pd.to_numeric(df["price"], errors="coerce")
+
+    # No usable commence_time means no game-date partition -- skip those rows
+    undated = df["commence_time"].isna()
+    if undated.any():
+        events = sorted(df.loc[undated, "event_id"].astype(str).unique())
+        print(f"Skipping {int(undated.sum())} line rows with no commence_time (events: {', '.join(events)})")
+        df = df[~undated]
+        if df.empty:
+            return 0
+
+    stamp = fetched_at.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    for game_date, part in df.groupby(game_date_of(df["commence_time"]), sort=True):
+        out_dir = Path(store_dir) / f"game_date={game_date}"
+        out_dir.mkdir(parents=True, exist_ok=True)
+        part.to_parquet(out_dir / f"snapshot_{stamp}.parquet", index=False)
+    return len(df)
+
+
+def load_partition(game_date: str, store_dir: Path = STORE_DIR) -> pd.DataFrame:
+    """Every snapshot row for one game date (empty frame if none)."""
+    part_dir = Path(store_dir) / f"game_date={game_date}"
+    files = sorted(part_dir.glob("snapshot_*.parquet"))
+    if not files:
+        return pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+    return pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+
+
+def latest_as_of(as_of: Optional[datetime] = None, game_date: Optional[str] = None,
+                 store_dir: Path = STORE_DIR) -> pd.DataFrame:
+    """
+    Lines as they stood at `as_of` (default now): for each (event, book), all outcomes
+    from its latest snapshot fetched at or before `as_of`. Reads a single partition --
+    `game_date` defaults to the local date of `as_of`.
+    """
+    as_of = pd.Timestamp(as_of or datetime.now(timezone.utc))
+    as_of = as_of.tz_localize("UTC") if as_of.tzinfo is None else as_of.tz_convert("UTC")
+    game_date = game_date or as_of.tz_convert(LOCAL_TZ).date().isoformat()
+
+    df = load_partition(game_date, store_dir)
+    if df.empty:
+        return df
+    df = df[df["fetched_at"] <= as_of]
+    last = df.groupby(BOOK_KEY)["fetched_at"].transform("max")
+    return df[df["fetched_at"] == last].reset_index(drop=True)
+
+
+def line_history(event_id: str, game_date: str, player_name: Optional[str] = None,
+                 store_dir: Path = STORE_DIR) -> pd.DataFrame:
+    """Line movement for one event (optionally one player), oldest snapshot first."""
+    df = load_partition(game_date, store_dir)
+    df = df[df["event_id"] == event_id]
+    if player_name is not None:
+        df = df[df["player_name"] == player_name]
+    return df.sort_values(["player_name", "book_key", "point", "fetched_at"]).reset_index(drop=True)
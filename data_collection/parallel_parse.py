@@ -0,0 +1,127 @@
+# Process-pool parse of box scores and play-by-play.
+#
+# Each worker task reads one game's boxscore and play-by-play from the cache
+# store and returns the rows for every output (box, pbp, goalie events). Tasks
+# are submitted to a process pool in chunks and results come back in game order,
+# so rows are streamed to the outputs as they arrive -- same files, same row order
+# as the serial parsers, and the same parsed-game manifest is updated.
+#
+#   python -m data_collection.parallel_parse [--workers N] [--chunksize K] [--full] [--stream]
+#
+# --stream reads play-by-play with the incremental pbp_stream reader so each
+# worker's memory stays flat and more workers fit on the same box.
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, Iterable, List, Optional
+
+from instrumentation import count_in, count_out
+
+from . import parse_box_score as box
+from . import parse_play_by_play as pbp
+from .parse_manifest import needs_full_parse, pending_games, mark_parsed, reset, upsert_csv
+from .parsed_output import BOX_SCHEMA, schema_for, upsert_parquet
+
+DEFAULT_CHUNKSIZE = 16
+
+
+def parse_game(task: tuple) -> Dict:
+    """Worker: rows for one game's requested outputs. Errors are returned, not raised."""
+    gid, do_box, do_pbp, stream = task
+    result = {"game_id": gid, "box": None, "pbp": None, "goalie": [], "errors": []}
+    if do_box:
+        try:
+            result["box"] = box.get_boxscore_data(gid)
+        except Exception as e:
+            result["errors"].append(f"boxscore: {e}")
+    if do_pbp:
+        try:
+            data = pbp.get_pbp_data(gid, stream=stream)
+            goalie_games: List[dict] = []
+            players = pbp.scrape_plays(data, pbp.player_info(data), goalie_games)
+            result["pbp"] = list(players.values())
+            result["goalie"] = goalie_games
+        except Exception as e:
+            result["errors"].append(f"play-by-play: {e}")
+    return result
+
+
+def plan(full: bool) -> Dict[str, tuple]:
+    """Per output: (games to parse, game_ids to replace, source hashes, full rewrite)."""
+    work = {}
+    for name, endpoint, game_ids, output in (
+        ("box", "boxscore", box.gather_game_ids(), box.OUTPUT_DIR),
+        ("pbp", "play-by-play", pbp.gather_pbp_game_ids(), pbp.OUTPUT_DIR),
+    ):
+        todo, replace_ids, hashes = pending_games(name, endpoint, game_ids)
+        rewrite = full or needs_full_parse(name, output)
+        if rewrite:
+            reset(name)
+            todo, replace_ids = game_ids, set()
+        print(f"{name}: {len(todo)} of {len(game_ids)} cached games to parse ({len(replace_ids)} changed)")
+        work[name] = (todo, replace_ids, hashes, rewrite)
+    return work
+
+
+def parse_parallel(full: bool = False, workers: Optional[int] = None,
+                   chunksize: int = DEFAULT_CHUNKSIZE, stream: bool = False) -> Dict[str, int]:
+    """Parse pending games for both outputs across a process pool. Returns games parsed per output."""
+    workers = workers or os.cpu_count() or 1
+    work = plan(full)
+    box_todo, pbp_todo = set(work["box"][0]), set(work["pbp"][0])
+    tasks = [(gid, gid in box_todo, gid in pbp_todo, stream) for gid in sorted(box_todo | pbp_todo)]
+    print(f"Parsing {len(tasks)} games on {workers} workers (chunksize {chunksize})")
+
+    parsed: Dict[str, List[str]] = {"box": [], "pbp": []}
+    rows: Dict[str, int] = {"box": 0, "pbp": 0}
+    goalie_rows = 0
+    with ExitStack() as stack:
+        write_box = stack.enter_context(
+            upsert_parquet(box.OUTPUT_DIR, BOX_SCHEMA, work["box"][1], full=work["box"][3]))
+        write_pbp = stack.enter_context(
+            upsert_parquet(pbp.OUTPUT_DIR, schema_for("pbp"), work["pbp"][1], full=work["pbp"][3]))
+        write_goalie = stack.enter_context(upsert_csv(pbp.GOALIE_FILE, work["pbp"][1], full=work["pbp"][3]))
+        pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+
+        for i, result in enumerate(pool.map(parse_game, tasks, chunksize=chunksize), start=1):
+            gid = result["game_id"]
+            for err in result["errors"]:
+                print(f"Error processing {gid} {err}")
+            if result["box"] is not None:
+                write_box(result["box"])
+                rows["box"] += len(result["box"])
+                parsed["box"].append(gid)
+            if result["pbp"] is not None:
+                write_pbp(result["pbp"])
+                rows["pbp"] += len(result["pbp"])
+                write_goalie(result["goalie"])
+                goalie_rows += len(result["goalie"])
+                parsed["pbp"].append(gid)
+            if i % 500 == 0 or i == len(tasks):
+                print(f"[{i}/{len(tasks)}] parsed")
+
+    for name, gids in parsed.items():
+        hashes = work[name][2]
+        mark_parsed(name, {gid: hashes[gid] for gid in gids if gid in hashes})
+
+    # One span for both outputs: rows out is box + play-by-play rows (their widths differ)
+    count_in(len(tasks))
+    count_out(rows["box"] + rows["pbp"])
+    print(f"\nDone! {len(parsed['box'])} box ({rows['box']} rows), {len(parsed['pbp'])} play-by-play games "
+          f"({rows['pbp']} rows, {goalie_rows} goalie events) → {box.OUTPUT_DIR}, {pbp.OUTPUT_DIR}")
+    return {name: len(gids) for name, gids in parsed.items()}
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Parse cached games across a process pool")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="games per worker task batch")
+    parser.add_argument("--full", action="store_true", help="re-parse every cached game")
+    parser.add_argument("--stream", action="store_true", help="stream play-by-play (low memory per worker)")
+    args = parser.parse_args(argv)
+    parse_parallel(full=args.full, workers=args.workers, chunksize=args.chunksize, stream=args.stream)
+
+
+if __name__ == "__main__":
+    main()
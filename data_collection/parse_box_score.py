@@ -1,15 +1,20 @@
-import json, csv
 from pathlib import Path
 from typing import Iterable
 
+from instrumentation import count_in, count_out
+
+from .cache_store import get_store
+from .parse_manifest import needs_full_parse, pending_games, mark_parsed, reset
+from .parsed_output import BOX_SCHEMA, upsert_parquet
+
 PROJECT_ROOT = Path(__file__).resolve().parent
-GAME_CACHE = PROJECT_ROOT / "update_game_cache"
-OUTPUT_FILE = PROJECT_ROOT / "update_box.csv"
+OUTPUT_DIR = PROJECT_ROOT / "update_box"  # dataset directory, one part per run
 
 
 def get_boxscore_data(game_id):
-    box_path = GAME_CACHE / f"{game_id}_boxscore"
-    box = json.loads(box_path.read_text(encoding="utf-8"))
+    box = get_store().get(game_id, "boxscore")
+    if box is None:
+        raise FileNotFoundError(f"No cached boxscore for {game_id}")
 
     # --- Detect if shootout ---
     is_shootout = box.get("periodDescriptor", {}).get("periodType") == "SO"
@@ -167,60 +172,57 @@ GAME_TYPE = "02"
 START_NUM = 1
 END_NUM = 1312
 
-BOX_SUFFIXES = ["_boxscore", "_boxscore.json"]
-
-
-def exists_any(cache_dir: Path, game_id: str, suffixes: list[str]) -> bool:
-    return any((cache_dir / f"{game_id}{suf}").exists() for suf in suffixes)
-
-
 def gather_game_ids() -> list[str]:
-    if not GAME_CACHE.exists():
-        raise FileNotFoundError(f"Cache directory not found: {GAME_CACHE.resolve()}")
-
+    """Regular-season game ids (numbers START_NUM..END_NUM) with a cached boxscore, from the manifest."""
     game_ids: list[str] = []
-    for season in SEASONS:
-        for n in range(START_NUM, END_NUM + 1):
-            gid = f"{season}{GAME_TYPE}{n:04d}"
-            if exists_any(GAME_CACHE, gid, BOX_SUFFIXES):
-                game_ids.append(gid)
+    for gid in get_store().list_game_ids("boxscore", seasons=SEASONS):
+        if gid[4:6] == GAME_TYPE and START_NUM <= int(gid[6:]) <= END_NUM:
+            game_ids.append(gid)
 
     return game_ids
 
 
-def write_boxscore_csv(game_ids: Iterable[str]) -> None:
+def write_boxscore_parquet(game_ids: Iterable[str], replace_ids=frozenset(), full: bool = True) -> list[str]:
+    """Parse games and upsert their rows into OUTPUT_DIR. Returns the game_ids parsed OK."""
     game_ids = list(game_ids)
     print(f"Found {len(game_ids)} valid games with boxscore")
     print(f"Processing {len(game_ids)} games")
 
-    header_written = False
-    with OUTPUT_FILE.open("w", newline="", encoding="utf-8") as out_fh:
-        writer = None
-
+    parsed: list[str] = []
+    rows = 0
+    with upsert_parquet(OUTPUT_DIR, BOX_SCHEMA, set(replace_ids), full=full) as write:
         for i, gid in enumerate(game_ids, start=1):
             print(f"[{i}/{len(game_ids)}] Parsing {gid}...")
             try:
                 player_info = get_boxscore_data(gid)
+                parsed.append(gid)
                 if not player_info:
                     continue
 
-                if not header_written:
-                    header = list(player_info[0].keys())
-                    writer = csv.DictWriter(out_fh, fieldnames=header)
-                    writer.writeheader()
-                    header_written = True
-
-                writer.writerows(player_info)
+                write(player_info)
+                rows += len(player_info)
 
             except Exception as e:
                 print(f"Error processing {gid}: {e}")
 
-    print(f"\nDone! Wrote combined CSV: {OUTPUT_FILE}")
+    count_in(len(game_ids))
+    count_out(rows, len(BOX_SCHEMA))
+    print(f"\nDone! Wrote {rows} rows from {len(parsed)} games to a Parquet part under {OUTPUT_DIR}")
+    return parsed
 
 
-def main() -> None:
+def main(full: bool = False) -> None:
+    """Parse only games that are new or whose cached boxscore changed since the last run."""
     game_ids = gather_game_ids()
-    write_boxscore_csv(game_ids)
+    todo, replace_ids, hashes = pending_games("box", "boxscore", game_ids)
+    if full or needs_full_parse("box", OUTPUT_DIR):
+        reset("box")
+        todo, replace_ids, full = game_ids, set(), True
+    else:
+        print(f"{len(todo)} of {len(game_ids)} cached games are new or changed ({len(replace_ids)} changed)")
+
+    parsed = write_boxscore_parquet(todo, replace_ids=replace_ids, full=full)
+    mark_parsed("box", {gid: hashes[gid] for gid in parsed if gid in hashes})
 
 
 if __name__ == "__main__":
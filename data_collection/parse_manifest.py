@@ -0,0 +1,144 @@
+# Parsed-game manifest for incremental parsing.
+#
+# Records, per parser output, which game_ids have been parsed and the sha256 of
+# the cache payload they were parsed from (taken from the cache store manifest,
+# so nothing is re-hashed). Each run parses only games that are new or whose
+# payload changed (e.g. a game cached while live and refreshed once final), and
+# upserts their rows into the existing output instead of rewriting it.
+import csv
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .cache_store import get_store
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+MANIFEST_DB = PROJECT_ROOT / "parsed_manifest.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed (
+    output        TEXT NOT NULL,
+    game_id       TEXT NOT NULL,
+    source_sha256 TEXT NOT NULL,
+    parsed_at     REAL NOT NULL,
+    PRIMARY KEY (output, game_id)
+);
+"""
+
+
+def connect(db_path: Path = MANIFEST_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parsed_hashes(output: str) -> Dict[str, str]:
+    with closing(connect()) as conn, conn:
+        return dict(conn.execute("SELECT game_id, source_sha256 FROM parsed WHERE output = ?", (output,)))
+
+
+def source_hashes(game_ids: Iterable[str], endpoint: str) -> Dict[str, str]:
+    store = get_store()
+    hashes = {}
+    for gid in game_ids:
+        entry = store.entry(gid, endpoint)
+        if entry is not None:
+            hashes[gid] = entry["sha256"]
+    return hashes
+
+
+def pending_games(output: str, endpoint: str, game_ids: Iterable[str]) -> Tuple[List[str], Set[str], Dict[str, str]]:
+    """
+    Split cached games into work for this run.
+    Returns (games to parse, the subset already in the output that must be replaced,
+    {game_id: source sha256} to record once parsed).
+    """
+    done = parsed_hashes(output)
+    current = source_hashes(game_ids, endpoint)
+    todo = [gid for gid, sha in current.items() if done.get(gid) != sha]
+    changed = {gid for gid in todo if gid in done}
+    return sorted(todo), changed, current
+
+
+def needs_full_parse(output: str, path: Path) -> bool:
+    """
+    True if `path` can't be upserted into: it doesn't exist (or is a dataset
+    directory with no parts), or the manifest has no games recorded for it
+    (parsed_manifest.sqlite deleted, or the output was written before the
+    manifest existed). Appending would then duplicate every game already in it.
+    """
+    path = Path(path)
+    present = any(path.glob("part-*.parquet")) if path.is_dir() else path.exists()
+    return not present or not parsed_hashes(output)
+
+
+def mark_parsed(output: str, hashes: Dict[str, str]) -> None:
+    now = time.time()
+    with closing(connect()) as conn, conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO parsed (output, game_id, source_sha256, parsed_at) VALUES (?, ?, ?, ?)",
+            [(output, gid, sha, now) for gid, sha in hashes.items()],
+        )
+
+
+def reset(output: str) -> None:
+    """Forget everything parsed for an output -- the next run re-parses from scratch."""
+    with closing(connect()) as conn, conn:
+        conn.execute("DELETE FROM parsed WHERE output = ?", (output,))
+
+
+@contextmanager
+def upsert_csv(path: Path, replace_ids: Set[str], full: bool = False):
+    """
+    Yields write(rows) for appending parsed rows to a CSV output.
+    - full: the file is rewritten from scratch (removed if no rows are written).
+    - replace_ids: existing rows for these game_ids are dropped first (one streaming
+      copy of the file); otherwise new rows are simply appended.
+    The header is taken from the existing file, or from the first rows written.
+    """
+    path = Path(path)
+    exists = path.exists() and path.stat().st_size > 0 and not full
+    header = None
+    if exists:
+        with path.open("r", newline="", encoding="utf-8") as fh:
+            header = next(csv.reader(fh), None)
+
+    rewrite = full or not exists or bool(replace_ids)
+    target = path.with_name(path.name + ".tmp") if rewrite else path
+    with target.open("w" if rewrite else "a", newline="", encoding="utf-8") as out_fh:
+        state = {"writer": None}
+
+        def get_writer(fieldnames):
+            if state["writer"] is None:
+                state["writer"] = csv.DictWriter(out_fh, fieldnames=fieldnames)
+                if rewrite:
+                    state["writer"].writeheader()
+            return state["writer"]
+
+        if exists and rewrite:
+            # Carry over rows for games that are not being replaced
+            with path.open("r", newline="", encoding="utf-8") as in_fh:
+                reader = csv.DictReader(in_fh)
+                w = get_writer(header)
+                for row in reader:
+                    if row.get("game_id") not in replace_ids:
+                        w.writerow(row)
+        elif exists:
+            get_writer(header)
+
+        def write(rows):
+            rows = list(rows)
+            if rows:
+                get_writer(header or list(rows[0].keys())).writerows(rows)
+
+        yield write
+
+    if rewrite and state["writer"] is None:
+        target.unlink()
+        if full:
+            path.unlink(missing_ok=True)  # a full rebuild with no rows leaves no output
+    elif rewrite:
+        os.replace(target, path)
@@ -1,17 +1,118 @@
-import json, csv
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Dict, Iterable, List, Optional, TypedDict
+
+import numpy as np
+
+from instrumentation import count_in, count_out
+
+from .cache_store import get_store
+from .pbp_stream import stream_pbp
+from .parse_manifest import needs_full_parse, pending_games, mark_parsed, reset, upsert_csv
+from .parsed_output import schema_for, upsert_parquet
 
 PROJECT_ROOT = Path(__file__).resolve().parent
-GAME_CACHE = PROJECT_ROOT / "update_game_cache"
-OUTPUT_FILE = PROJECT_ROOT / "update_pbp.csv"
+OUTPUT_DIR = PROJECT_ROOT / "update_pbp"  # dataset directory, one part per run
+
+# --- Decode schema: the only parts of a play-by-play payload the parser reads ---
+class _Team(TypedDict, total=False):
+    id: Any
+
+
+class _Period(TypedDict, total=False):
+    periodType: Any
+
+
+class _Play(TypedDict, total=False):
+    typeDescKey: Any
+    situationCode: Any
+    periodDescriptor: _Period
+    details: Optional[Dict[str, Any]]
+
+
+class PlayByPlaySchema(TypedDict, total=False):
+    id: Any
+    season: Any
+    homeTeam: _Team
+    awayTeam: _Team
+    rosterSpots: List[Dict[str, Any]]
+    plays: List[_Play]
 
-def get_pbp_data(game_id):
-    pbp_path = GAME_CACHE / f"{game_id}_play-by-play"
-    pbp = json.loads(pbp_path.read_text(encoding="utf-8"))
+
+def get_pbp_data(game_id, stream: bool = False):
+    if stream:
+        return stream_pbp(game_id)  # plays come back as a lazy iterator
+    pbp = get_store().get(game_id, "play-by-play", schema=PlayByPlaySchema)
+    if pbp is None:
+        raise FileNotFoundError(f"No cached play-by-play for {game_id}")
     
     return pbp
 
+# --- Event dispatch tables ---
+
+# Per-player counters, in output column order. Accumulated per game in one
+# (roster slot x counter) NumPy array instead of per-play dict updates.
+COUNTER_FIELDS = [
+    "shot_attempts_total",
+    "shot_attempts_blocked",
+    "shot_attempts_missed",
+    "hits_taken",
+    "on_pp",
+    "on_pk",
+    "pp_shots",
+    "pp_shots_blocked",
+    "pp_shots_missed",
+    "pp_attempts_total",
+    "pk_shots",
+    "pk_shots_blocked",
+    "pk_shots_missed",
+    "pk_attempts_total",
+]
+COL = {name: i for i, name in enumerate(COUNTER_FIELDS)}
+FLAG_COLS = [COL["on_pp"], COL["on_pk"]]
+
+# Power-play side from situationCode -- 1451 = home pp, 1541 = away pp.
+# Decided per play. Parsers before the table-driven rewrite kept home_pp/away_pp
+# from earlier plays: after a home PP play, an away PP play with no even-strength
+# play in between was still credited as a home PP, and a game whose first PP play
+# was an away PP raised UnboundLocalError and was dropped. pp_*/pk_*/on_pp/on_pk
+# in play-by-play outputs written by that parser (update_pbp, 2022-2026_pbp) can
+# differ; re-parse them (parallel_parse --full) and rebuild the player store.
+NO_PP, HOME_PP, AWAY_PP = 0, 1, 2
+SITUATION_PP = {
+    "1451": HOME_PP, "1351": HOME_PP, "1560": HOME_PP,
+    "1541": AWAY_PP, "1531": AWAY_PP, "0651": AWAY_PP,
+}
+
+# event type -> (player field, counters always incremented, counters on PP, counters on PK)
+EVENT_TABLE = {
+    "blocked-shot": ("shootingPlayerId",
+                     ["shot_attempts_blocked", "shot_attempts_total"],
+                     ["pp_shots_blocked", "pp_attempts_total", "on_pp"],
+                     ["pk_shots_blocked", "pk_attempts_total", "on_pk"]),
+    "shot-on-goal": ("shootingPlayerId",
+                     ["shot_attempts_total"],
+                     ["pp_shots", "pp_attempts_total", "on_pp"],
+                     ["pk_shots", "pk_attempts_total", "on_pk"]),
+    "goal":         ("scoringPlayerId",
+                     ["shot_attempts_total"],
+                     ["pp_shots", "pp_attempts_total", "on_pp"],
+                     ["pk_shots", "pk_attempts_total", "on_pk"]),
+    "missed-shot":  ("shootingPlayerId",
+                     ["shot_attempts_missed", "shot_attempts_total"],
+                     ["pp_shots_missed", "pp_attempts_total", "on_pp"],
+                     ["pk_shots_missed", "pk_attempts_total", "on_pk"]),
+    "hit":          ("hitteePlayerId",
+                     ["hits_taken"],
+                     [],
+                     []),
+}
+# Resolved once to column indices: (field, base cols, pp cols, pk cols)
+EVENT_DISPATCH = {
+    etype: (field, [COL[c] for c in base], [COL[c] for c in pp], [COL[c] for c in pk])
+    for etype, (field, base, pp, pk) in EVENT_TABLE.items()
+}
+
+
 def player_info(pbp):
     
     # Get player info -- ignore goalies
@@ -33,198 +134,68 @@ def player_info(pbp):
         "player_name": player.get("firstName").get("default") + " " + player.get("lastName").get("default"),
         "sweater_number": player.get("sweaterNumber"),
         "headshot_url": player.get("headshot"),
-        "shot_attempts_total": 0,
-        "shot_attempts_blocked": 0,
-        "shot_attempts_missed": 0,
-        "hits_taken": 0,
-        "on_pp": 0,
-        "on_pk": 0,
-        "pp_shots": 0,
-        "pp_shots_blocked": 0,
-        "pp_shots_missed": 0,
-        "pp_attempts_total": 0,
-        "pk_shots": 0,
-        "pk_shots_blocked": 0,
-        "pk_shots_missed": 0,
-        "pk_attempts_total": 0,
+        **{name: 0 for name in COUNTER_FIELDS},
         }
         
     return players
 
 def scrape_plays(pbp, players, goalie_games):
-    
+    """
+    Single pass over the plays, dispatched through EVENT_TABLE.
+    Each play appends (slot, counter) pairs; the per-game counter array is
+    built with one bincount at the end and written back into `players`.
+    """
     events = pbp.get("plays", [])
     home_team = pbp.get("homeTeam").get("id")
     away_team = pbp.get("awayTeam").get("id")
-    
+    game_id = pbp.get("id")
+
+    # Roster slot per player, and which side (home/away pp code) each slot plays for
+    slot_of = {pid: i for i, pid in enumerate(players)}
+    side_of = [
+        HOME_PP if row["team_id"] == home_team else AWAY_PP if row["team_id"] == away_team else NO_PP
+        for row in players.values()
+    ]
+    n_cols = len(COUNTER_FIELDS)
+    hits = []  # flat slot * n_cols + col indices
+
     for event in events:
         ## ignore shootout stats
         if event.get("periodDescriptor").get("periodType") == "SO":
             continue
-        
-        ## get the event type
+
         event_type = event.get("typeDescKey")
-        
-        ## get the situation code -- 1451 = home pp, 1541 = away pp 
-        situation = event.get("situationCode")
-       
-        ## determine if situation is power play
-        if situation in ["1451", "1351", "1560"]:
-            home_pp = True
-        elif situation in ["1541", "1531", "0651"]:
-            away_pp = True
-        else:
-            home_pp = False
-            away_pp = False
-        
-       
-        if event_type == "blocked-shot":
-            shooter = str(event.get("details").get("shootingPlayerId"))
-            if not shooter or shooter not in players:
-                goalie_games.append({
-                    "game_id": pbp.get("id"),
-                    "goalie_id": shooter,
-                    "event_type": event_type
-                })
-                continue
-            ## determine which team is on pp and pk if any
-            pp_team = ''
-            pk_team = ''
-            if home_pp:
-                pp_team = home_team
-                pk_team = away_team
-            elif away_pp:
-                pp_team = away_team
-                pk_team = home_team
-                
-
-            ## increment shots attempts and blocked attempts
-            players[shooter]["shot_attempts_blocked"] += 1
-            players[shooter]["shot_attempts_total"] += 1
-            
-            ## increment pp shot attempts, flag on pp
-            if players[shooter]["team_id"] == pp_team:
-                players[shooter]["pp_shots_blocked"] += 1
-                players[shooter]["pp_attempts_total"] += 1
-                players[shooter]["on_pp"] = 1
-            ## increment pk shot attempts, flag on pk
-            elif players[shooter]["team_id"] == pk_team:  
-                players[shooter]["pk_shots_blocked"] += 1
-                players[shooter]["pk_attempts_total"] += 1
-                players[shooter]["on_pk"] = 1
-                
-            
-        elif event_type == "shot-on-goal":
-            shooter = str(event.get("details").get("shootingPlayerId"))
-            if not shooter or shooter not in players:
-                goalie_games.append({
-                    "game_id": pbp.get("id"),
-                    "goalie_id": shooter,
-                    "event_type": event_type
-                })
-                continue
-            ## determine which team is on pp and pk if any
-            pp_team = ''
-            pk_team = ''
-            if home_pp:
-                pp_team = home_team
-                pk_team = away_team
-            elif away_pp:
-                pp_team = away_team
-                pk_team = home_team
-                
-            ## increment shots attempts
-            players[shooter]["shot_attempts_total"] += 1
-            
-            ## increment pp shot attempts, flag on pp
-            if players[shooter]["team_id"] == pp_team:
-                players[shooter]["pp_shots"] += 1
-                players[shooter]["pp_attempts_total"] += 1
-                players[shooter]["on_pp"] = 1
-            ## increment pk shot attempts, flag on pk
-            elif players[shooter]["team_id"] == pk_team:  
-                players[shooter]["pk_shots"] += 1
-                players[shooter]["pk_attempts_total"] += 1
-                players[shooter]["on_pk"] = 1
-            
-        elif event_type == "goal":
-            shooter = str(event.get("details").get("scoringPlayerId"))
-            if not shooter or shooter not in players:
-                goalie_games.append({
-                    "game_id": pbp.get("id"),
-                    "goalie_id": shooter,
-                    "event_type": event_type
-                })
-                continue
-            ## determine which team is on pp and pk if any
-            pp_team = ''
-            pk_team = ''
-            if home_pp:
-                pp_team = home_team
-                pk_team = away_team
-            elif away_pp:
-                pp_team = away_team
-                pk_team = home_team
-
-            ## increment shots attempts
-            players[shooter]["shot_attempts_total"] += 1
-            
-            ## increment pp shot attempts, flag on pp
-            if players[shooter]["team_id"] == pp_team:
-                players[shooter]["pp_shots"] += 1
-                players[shooter]["pp_attempts_total"] += 1
-                players[shooter]["on_pp"] = 1
-            ## increment pk shot attempts, flag on pk
-            elif players[shooter]["team_id"] == pk_team:  
-                players[shooter]["pk_shots"] += 1
-                players[shooter]["pk_attempts_total"] += 1
-                players[shooter]["on_pk"] = 1
-        
-        elif event_type == "missed-shot":
-            shooter = str(event.get("details").get("shootingPlayerId"))
-            if not shooter or shooter not in players:
-                goalie_games.append({
-                    "game_id": pbp.get("id"),
-                    "goalie_id": shooter,
-                    "event_type": event_type
-                })
-                continue
-            ## determine which team is on pp and pk if any
-            pp_team = ''
-            pk_team = ''
-            if home_pp:
-                pp_team = home_team
-                pk_team = away_team
-            elif away_pp:
-                pp_team = away_team
-                pk_team = home_team
-
-            ## increment shots attempts and missed shots
-            players[shooter]["shot_attempts_missed"] += 1
-            players[shooter]["shot_attempts_total"] += 1
-            
-            ## increment pp shot attempts, flag on pp
-            if players[shooter]["team_id"] == pp_team:
-                players[shooter]["pp_shots_missed"] += 1
-                players[shooter]["pp_attempts_total"] += 1
-                players[shooter]["on_pp"] = 1
-            ## increment pk shot attempts, flag on pk
-            elif players[shooter]["team_id"] == pk_team:  
-                players[shooter]["pk_shots_missed"] += 1
-                players[shooter]["pk_attempts_total"] += 1
-                players[shooter]["on_pk"] = 1
-                
-        elif event_type == "hit":
-            hittee = str(event.get("details").get("hitteePlayerId"))
-            if not hittee or hittee not in players:
-                goalie_games.append({
-                    "game_id": pbp.get("id"),
-                    "goalie_id": hittee,
-                    "event_type": event_type
-                })
-                continue
-            players[hittee]["hits_taken"] += 1
-            
+        spec = EVENT_DISPATCH.get(event_type)
+        if spec is None:
+            continue
+        field, base_cols, pp_cols, pk_cols = spec
+
+        pid = str((event.get("details") or {}).get(field))
+        slot = slot_of.get(pid)
+        if slot is None:
+            goalie_games.append({
+                "game_id": game_id,
+                "goalie_id": pid,
+                "event_type": event_type
+            })
+            continue
+
+        offset = slot * n_cols
+        hits.extend(offset + c for c in base_cols)
+
+        ## pp/pk credit if a power play is on and this player's team is on it / killing it
+        pp_side = SITUATION_PP.get(event.get("situationCode"), NO_PP)
+        if pp_side != NO_PP and side_of[slot] != NO_PP:
+            cols = pp_cols if side_of[slot] == pp_side else pk_cols
+            hits.extend(offset + c for c in cols)
+
+    counts = np.bincount(np.asarray(hits, dtype=np.int64), minlength=len(players) * n_cols)
+    counts = counts.reshape(len(players), n_cols)
+    counts[:, FLAG_COLS] = np.minimum(counts[:, FLAG_COLS], 1)
+
+    for row, values in zip(players.values(), counts.tolist()):
+        row.update(zip(COUNTER_FIELDS, values))
+
     return players         
 
 # --- Main run ---
@@ -233,66 +204,68 @@ GOALIE_FILE = Path("update_goalie_event_games.csv")
 
 
 def gather_pbp_game_ids() -> list[str]:
-    """Return sorted game_ids for which a cached play-by-play file exists."""
-    if not GAME_CACHE.exists():
-        raise FileNotFoundError(f"Cache directory not found: {GAME_CACHE.resolve()}")
+    """Return sorted game_ids for which a cached play-by-play payload exists."""
+    return get_store().list_game_ids("play-by-play")
 
-    # glob returns Path objects that already exist
-    game_ids = sorted({p.name.split("_")[0] for p in GAME_CACHE.glob("*_play-by-play")})
-    return game_ids
 
-
-def write_pbp_csv(game_ids: Iterable[str]) -> None:
+def write_pbp_parquet(game_ids: Iterable[str], replace_ids=frozenset(), full: bool = True,
+                      stream: bool = False) -> list[str]:
+    """Parse games and upsert their rows into OUTPUT_DIR. Returns the game_ids parsed OK."""
     game_ids = list(game_ids)
     print(f"Found {len(game_ids)} valid games to process.")
     print(f"Processing {len(game_ids)} games")
 
-    header_written = False
     goalie_games: list[dict] = []
+    parsed: list[str] = []
+    rows = 0
+    schema = schema_for("pbp")
 
-    with OUTPUT_FILE.open("w", newline="", encoding="utf-8") as out_fh:
-        writer = None
-
+    with upsert_parquet(OUTPUT_DIR, schema, set(replace_ids), full=full) as write:
         for i, gid in enumerate(game_ids, start=1):
             print(f"[{i}/{len(game_ids)}] Parsing {gid}...")
             try:
-                pbp = get_pbp_data(gid)
+                pbp = get_pbp_data(gid, stream=stream)
                 roster = player_info(pbp)
                 players = scrape_plays(pbp, roster, goalie_games)
+                parsed.append(gid)
 
                 if not players:
                     continue
 
-                if not header_written:
-                    # players is a dict; grab one row dict to define header
-                    header = list(next(iter(players.values())).keys())
-                    writer = csv.DictWriter(out_fh, fieldnames=header)
-                    writer.writeheader()
-                    header_written = True
-
-                writer.writerows(players.values())
+                write(players.values())
+                rows += len(players)
 
             except Exception as e:
                 print(f"Error processing {gid}: {e}")
 
-    # Write goalie event log (optional)
+    # Write goalie event log (optional). Always upserted, so a full rebuild or the
+    # replaced games drop stale goalie rows even when no new ones were found.
+    with upsert_csv(GOALIE_FILE, set(replace_ids), full=full) as write:
+        write(goalie_games)
     if goalie_games:
-        with GOALIE_FILE.open("w", newline="", encoding="utf-8") as out_fh:
-            w = csv.DictWriter(out_fh, fieldnames=goalie_games[0].keys())
-            w.writeheader()
-            w.writerows(goalie_games)
         print(f"Logged {len(goalie_games)} goalie-related shooting events → {GOALIE_FILE}")
     else:
         print("No goalie shooting events detected.")
 
-    print(f"\nDone! Wrote combined CSV: {OUTPUT_FILE}")
+    count_in(len(game_ids))
+    count_out(rows, len(schema))
+    print(f"\nDone! Wrote {rows} rows from {len(parsed)} games to a Parquet part under {OUTPUT_DIR}")
+    return parsed
 
 
-def main() -> None:
+def main(full: bool = False, stream: bool = False) -> None:
+    """Parse only games that are new or whose cached play-by-play changed since the last run."""
     game_ids = gather_pbp_game_ids()
-    write_pbp_csv(game_ids)
+    todo, replace_ids, hashes = pending_games("pbp", "play-by-play", game_ids)
+    if full or needs_full_parse("pbp", OUTPUT_DIR):
+        reset("pbp")
+        todo, replace_ids, full = game_ids, set(), True
+    else:
+        print(f"{len(todo)} of {len(game_ids)} cached games are new or changed ({len(replace_ids)} changed)")
 
+    parsed = write_pbp_parquet(todo, replace_ids=replace_ids, full=full, stream=stream)
+    mark_parsed("pbp", {gid: hashes[gid] for gid in parsed if gid in hashes})
 
-if __name__ == "__main__":
-    main()
 
+if __name__ == "__main__":
+    main()
\ No newline at end of file
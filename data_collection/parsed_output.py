@@ -0,0 +1,311 @@
+# Typed Parquet outputs for the box score and play-by-play parsers.
+#
+# Both parsers write a fixed Arrow schema instead of CSV: int64 ids, dictionary
+# (categorical) team codes, parsed game date / start time, and toi as seconds
+# next to the raw mm:ss string. Rows are buffered and written as record batches.
+#
+# The incremental parser outputs (update_box/, update_pbp/) are dataset
+# directories: each run writes its games as one new part-{ts}.parquet and never
+# touches earlier parts, so a daily parse costs the games it parsed, not the
+# season. A re-parsed game's rows in the newest part supersede its rows in older
+# parts; read_dataset() applies that, and compact_dataset() folds the parts into
+# one (automatically once there are MAX_PARTS of them):
+#   python -m data_collection.parsed_output compact update_box [update_pbp]
+#
+# read_parsed() is the one loader downstream scripts use. It reads the
+# data_collection/{name}/ dataset, data_collection/{name}.parquet, or falls back
+# to {name}.csv cast to the same schema, so older CSV extracts (2022-2026_box.csv,
+# ...) load with identical types. Convert one once with:
+#   python -m data_collection.parsed_output convert 2022-2026_box [2022-2026_pbp ...]
+import argparse
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+BATCH_ROWS = 50_000
+MAX_PARTS = 32  # parts in a dataset before an upsert compacts it
+REPLACES_KEY = b"replaces"  # part metadata: game_ids the part supersedes
+
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+BOX_SCHEMA = pa.schema([
+    ("season", pa.int32()),
+    ("game_id", pa.int64()),
+    ("game_date", pa.timestamp("s")),
+    ("player_id", pa.int64()),
+    ("name", pa.string()),
+    ("position", CATEGORY),
+    ("team_id", pa.int32()),
+    ("team", CATEGORY),
+    ("team_logo", pa.string()),
+    ("opponent_id", pa.int32()),
+    ("opponent", CATEGORY),
+    ("opponent_logo", pa.string()),
+    ("is_home", pa.int8()),
+    ("shots_on_goal", pa.int32()),
+    ("blocked_shots", pa.int32()),
+    ("goals", pa.int32()),
+    ("assists", pa.int32()),
+    ("points", pa.int32()),
+    ("plus_minus", pa.int32()),
+    ("power_play_goals", pa.int32()),
+    ("hits", pa.int32()),
+    ("pim", pa.int32()),
+    ("toi", pa.string()),
+    ("toi_seconds", pa.int32()),
+    ("shifts", pa.int32()),
+    ("giveaways", pa.int32()),
+    ("takeaways", pa.int32()),
+    ("team_shots", pa.int32()),
+    ("team_goals", pa.int32()),
+    ("team_shots_against", pa.int32()),
+    ("team_goals_against", pa.int32()),
+    ("team_win", pa.int8()),
+    ("team_otl", pa.int8()),
+    ("team_loss", pa.int8()),
+    ("opponent_win", pa.int8()),
+    ("opponent_otl", pa.int8()),
+    ("opponent_loss", pa.int8()),
+    ("venue_location", pa.string()),
+    ("venue", pa.string()),
+    ("start_time_UTC", pa.timestamp("s", tz="UTC")),
+])
+
+
+def _pbp_schema() -> pa.Schema:
+    from .parse_play_by_play import COUNTER_FIELDS  # late import: parse_play_by_play writes through this module
+    return pa.schema([
+        ("season", pa.int32()),
+        ("game_id", pa.int64()),
+        ("team_id", pa.int32()),
+        ("player_id", pa.int64()),
+        ("first_name", pa.string()),
+        ("last_name", pa.string()),
+        ("player_name", pa.string()),
+        ("sweater_number", pa.int16()),
+        ("headshot_url", pa.string()),
+        *[(name, pa.int32()) for name in COUNTER_FIELDS],
+    ])
+
+
+def schema_for(kind: str) -> pa.Schema:
+    """'box' or 'pbp'."""
+    return BOX_SCHEMA if kind == "box" else _pbp_schema()
+
+
+def toi_to_seconds(toi) -> float:
+    try:
+        mins, secs = str(toi).split(":")
+        return int(mins) * 60 + int(secs)
+    except ValueError:
+        return float("nan")
+
+
+def to_typed_frame(df: pd.DataFrame, schema: pa.Schema) -> pd.DataFrame:
+    """Coerce parser rows or a CSV extract to the column order and types of `schema`."""
+    df = df.copy()
+    if "toi_seconds" in schema.names and "toi_seconds" not in df.columns and "toi" in df.columns:
+        df["toi_seconds"] = df["toi"].map(toi_to_seconds)
+    out = {}
+    for field in schema:
+        s = df[field.name] if field.name in df.columns else pd.Series(None, index=df.index, dtype="object")
+        if pa.types.is_integer(field.type):
+            s = pd.to_numeric(s, errors="coerce").astype("Int64")
+        elif pa.types.is_timestamp(field.type):
+            s = pd.to_datetime(s, errors="coerce", utc=field.type.tz is not None)
+        else:
+            s = s.astype("string")
+        out[field.name] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def typed_table(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    return pa.Table.from_pandas(to_typed_frame(df, schema), preserve_index=False).cast(schema, safe=False)
+
+
+def to_batch(rows: List[Dict], schema: pa.Schema) -> pa.RecordBatch:
+    return typed_table(pd.DataFrame(rows), schema).combine_chunks().to_batches()[0]
+
+
+def dataset_parts(path: Path) -> List[Path]:
+    """Part files of a dataset directory, oldest first."""
+    return sorted(Path(path).glob("part-*.parquet"))
+
+
+def _part_name() -> str:
+    return f"part-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.parquet"
+
+
+@contextmanager
+def upsert_parquet(path: Path, schema: pa.Schema, replace_ids: Set[str], full: bool = False):
+    """
+    Yields write(rows) for a typed Parquet dataset directory, in record batches
+    of BATCH_ROWS. The rows go to one new part, which supersedes older parts'
+    rows for every game it has and every game in replace_ids (recorded in the
+    part's metadata, so a game re-parsed to no rows is dropped too). Existing
+    parts are not read or rewritten, except under `full` (they are removed once
+    the new part is in place) or when the dataset reaches MAX_PARTS (compacted).
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    old_parts = dataset_parts(path)
+    part = path / _part_name()
+    tmp = path / f".{part.name}.tmp"
+    buffer: List[Dict] = []
+    state = {"rows": 0}
+    replaces = json.dumps(sorted(int(g) for g in replace_ids))
+    with pq.ParquetWriter(tmp, schema.with_metadata({REPLACES_KEY: replaces}), compression="zstd") as writer:
+        def flush():
+            if buffer:
+                writer.write_batch(to_batch(buffer, schema))
+                state["rows"] += len(buffer)
+                buffer.clear()
+
+        def write(rows):
+            buffer.extend(rows)
+            if len(buffer) >= BATCH_ROWS:
+                flush()
+
+        yield write
+        flush()
+
+    if state["rows"] or (replace_ids and not full):
+        os.replace(tmp, part)
+    else:
+        tmp.unlink()
+    if full:
+        for p in old_parts:
+            p.unlink()
+    elif len(dataset_parts(path)) >= MAX_PARTS:
+        compact_dataset(path, schema)
+
+
+def _replaced_ids(part: Path) -> List[int]:
+    metadata = pq.read_schema(part).metadata or {}
+    return json.loads(metadata.get(REPLACES_KEY, b"[]"))
+
+
+def _newest_rows(parts: List[Path], columns: Optional[List[str]], game_ids: Optional[Set[int]]) -> List[pa.Table]:
+    """Per part (oldest first), its rows for games that no newer part has or replaces."""
+    seen: Set[int] = set()
+    tables = []
+    read_cols = None if columns is None else list(dict.fromkeys([*columns, "game_id"]))
+    filters = [("game_id", "in", sorted(game_ids))] if game_ids is not None else None
+    for part in reversed(parts):
+        table = pq.read_table(part, columns=read_cols, filters=filters)
+        ids = pc.unique(table["game_id"])
+        if seen:
+            table = table.filter(pc.invert(pc.is_in(table["game_id"], value_set=pa.array(sorted(seen), pa.int64()))))
+        seen.update(ids.to_pylist())
+        seen.update(_replaced_ids(part))
+        tables.append(table if columns is None else table.select(columns))
+    return tables[::-1]
+
+
+def read_dataset(path: Path, schema: pa.Schema, columns: Iterable[str] = None,
+                 game_ids: Iterable = None) -> pa.Table:
+    """
+    Current rows of a dataset directory: for each game, the rows from the newest
+    part that has it. `game_ids` limits the read to those games.
+    """
+    columns = list(columns) if columns else None
+    ids = {int(g) for g in game_ids} if game_ids is not None else None
+    tables = [t.cast(schema if columns is None else pa.schema([schema.field(c) for c in columns]), safe=False)
+              for t in _newest_rows(dataset_parts(path), columns, ids)]
+    if not tables:
+        return (schema if columns is None else pa.schema([schema.field(c) for c in columns])).empty_table()
+    return pa.concat_tables(tables)
+
+
+def dataset_game_ids(path: Path, parts: Iterable[Path] = None) -> Set[int]:
+    """game_ids present in the given parts (default: all parts) of a dataset directory."""
+    ids: Set[int] = set()
+    for part in (dataset_parts(path) if parts is None else parts):
+        ids.update(pc.unique(pq.read_table(part, columns=["game_id"])["game_id"]).to_pylist())
+    return ids
+
+
+def compact_dataset(path: Path, schema: pa.Schema) -> int:
+    """
+    Fold a dataset's parts into one, keeping each game's newest rows. The compacted
+    part takes the newest part's name. Returns rows kept.
+    """
+    path = Path(path)
+    parts = dataset_parts(path)
+    if len(parts) <= 1:
+        return 0
+    table = read_dataset(path, schema)
+    tmp = path / f".{parts[-1].name}.tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, parts[-1])
+    for p in parts[:-1]:
+        p.unlink()
+    print(f"Compacted {len(parts)} parts of {path.name} into one ({table.num_rows} rows)")
+    return table.num_rows
+
+
+def read_parsed(name: str, kind: str = None, columns: Iterable[str] = None,
+                categories: bool = True, game_ids: Iterable = None) -> pd.DataFrame:
+    """
+    Typed frame for a parser output: the data_collection/{name}/ dataset,
+    {name}.parquet, or {name}.csv coerced to the same schema. `kind` ('box'/'pbp')
+    defaults from the name suffix. `game_ids` limits the read to those games.
+    categories=False returns code columns (team, opponent, position) as plain objects.
+    """
+    kind = kind or ("pbp" if name.endswith("pbp") else "box")
+    columns = list(columns) if columns else None
+    dataset = PROJECT_ROOT / name
+    parquet = PROJECT_ROOT / f"{name}.parquet"
+    ids = sorted({int(g) for g in game_ids}) if game_ids is not None else None
+    if dataset.is_dir():
+        df = read_dataset(dataset, schema_for(kind), columns=columns, game_ids=ids).to_pandas()
+    elif parquet.exists():
+        df = pd.read_parquet(parquet, columns=columns, filters=[("game_id", "in", ids)] if ids is not None else None)
+    else:
+        df = typed_table(pd.read_csv(PROJECT_ROOT / f"{name}.csv", low_memory=False), schema_for(kind)).to_pandas()
+        df = df[df["game_id"].isin(ids)].reset_index(drop=True) if ids is not None else df
+        df = df[columns] if columns else df
+    if not categories:
+        for col in df.select_dtypes("category").columns:
+            df[col] = df[col].astype(object)
+    return df
+
+
+def convert_csv(name: str, kind: str = None) -> Path:
+    """Write {name}.parquet from {name}.csv with the parser schema."""
+    kind = kind or ("pbp" if name.endswith("pbp") else "box")
+    df = pd.read_csv(PROJECT_ROOT / f"{name}.csv", low_memory=False)
+    out = PROJECT_ROOT / f"{name}.parquet"
+    pq.write_table(typed_table(df, schema_for(kind)), out, compression="zstd")
+    print(f"Wrote {len(df)} rows → {out}")
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Typed parser outputs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert", help="convert CSV extracts in data_collection/ to typed Parquet")
+    conv.add_argument("names", nargs="+", help="file stems, e.g. 2022-2026_box")
+    comp = sub.add_parser("compact", help="fold a parser output dataset's parts into one")
+    comp.add_argument("names", nargs="+", help="dataset directories, e.g. update_box")
+    args = parser.parse_args()
+
+    if args.cmd == "convert":
+        for name in args.names:
+            convert_csv(name)
+    elif args.cmd == "compact":
+        for name in args.names:
+            compact_dataset(PROJECT_ROOT / name, schema_for("pbp" if name.endswith("pbp") else "box"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Streaming play-by-play reader for low-memory backfills.
+#
+# Instead of decoding the whole document, the payload is parsed incrementally
+# (ijson) straight off the compressed cache file in two passes:
+#   1. game id, season, team ids and the rosterSpots entries (small)
+#   2. plays, yielded one at a time
+# stream_pbp() returns a dict shaped like the decoded payload whose "plays" is a
+# lazy iterator, so player_info/scrape_plays consume it unchanged and peak memory
+# per game stays flat whatever the document size. rosterSpots follows plays in
+# the API payload, hence two passes -- extra CPU, traded for memory.
+from typing import Any, Dict, Iterator
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:  # only needed for the streaming mode
+    ijson = None
+
+from .cache_store import get_store
+
+ENDPOINT = "play-by-play"
+HEADER_FIELDS = {"id": ("id",), "season": ("season",),
+                 "homeTeam.id": ("homeTeam", "id"), "awayTeam.id": ("awayTeam", "id")}
+
+
+def _open(game_id):
+    if ijson is None:
+        raise RuntimeError("ijson is required for the streaming play-by-play reader (pip install ijson)")
+    fh = get_store().open_payload(game_id, ENDPOINT)
+    if fh is None:
+        raise FileNotFoundError(f"No cached play-by-play for {game_id}")
+    return fh
+
+
+def read_header(game_id) -> Dict[str, Any]:
+    """Pass 1: top-level ids and rosterSpots; plays are tokenized but never built."""
+    header: Dict[str, Any] = {"homeTeam": {}, "awayTeam": {}, "rosterSpots": []}
+    builder = None
+    with _open(game_id) as fh:
+        for prefix, event, value in ijson.parse(fh, use_float=True):
+            if prefix.startswith("rosterSpots.item"):
+                if prefix == "rosterSpots.item" and event == "start_map":
+                    builder = ObjectBuilder()
+                builder.event(event, value)
+                if prefix == "rosterSpots.item" and event == "end_map":
+                    header["rosterSpots"].append(builder.value)
+                    builder = None
+            elif prefix in HEADER_FIELDS and event not in ("start_map", "map_key", "end_map"):
+                *parents, key = HEADER_FIELDS[prefix]
+                target = header
+                for p in parents:
+                    target = target[p]
+                target[key] = value
+    return header
+
+
+def iter_plays(game_id) -> Iterator[dict]:
+    """Pass 2: one play dict at a time."""
+    with _open(game_id) as fh:
+        yield from ijson.items(fh, "plays.item", use_float=True)
+
+
+def stream_pbp(game_id) -> Dict[str, Any]:
+    """Play-by-play payload with rosterSpots materialized and plays streamed lazily."""
+    pbp = read_header(game_id)
+    pbp["plays"] = iter_plays(game_id)
+    return pbp
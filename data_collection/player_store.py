@@ -0,0 +1,307 @@
+# Log-structured store for the merged box + play-by-play player-game table.
+#
+# Layout under parquets/player_store/:
+#   base.parquet                -- compacted historical seasons, one row per key
+#   deltas/delta_{ts}.parquet   -- rows added or changed by each daily ingest
+#   ingested.json               -- update_* parser parts already ingested
+# Key: (season, game_id, team_id, player_id). A key's current row is the one in
+# the newest file that has it, so reads never see duplicate player-games.
+#
+# The base is built once from the historical extracts. Daily ingest reads only
+# the update_* parser parts written since the last ingest, and only the stored
+# rows of the games in them, and writes the rows that differ as one delta.
+# Compaction folds the deltas back into the base:
+#   python -m data_collection.player_store build-base
+#   python -m data_collection.player_store ingest
+#   python -m data_collection.player_store compact
+#
+# player_games() is the shared, read-only path for every consumer: column-pruned,
+# season-filtered reads of the base and deltas, newest row per key. Only the
+# New Data step writes: refresh() rebuilds the base when the historical extracts
+# change and ingests any new parser parts. Writers hold an exclusive lock on
+# the store (readers a shared one), write through per-process tmp files and
+# swap them in, so steps in parallel processes never see a half-written file.
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from instrumentation import count_out, frame_in
+
+from .parsed_output import PROJECT_ROOT as PARSED_DIR, dataset_game_ids, dataset_parts, read_parsed
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+STORE_DIR = REPO_ROOT / "parquets" / "player_store"
+BASE_FILE = STORE_DIR / "base.parquet"
+DELTA_DIR = STORE_DIR / "deltas"
+STATE_FILE = STORE_DIR / "state.json"
+LOCK_FILE = STORE_DIR / ".lock"
+INGESTED_FILE = STORE_DIR / "ingested.json"
+
+KEY = ["season", "game_id", "team_id", "player_id"]
+HISTORICAL = ("2022-2026_box", "2022-2026_pbp")
+UPDATE = ("update_box", "update_pbp")
+
+# Arizona Coyotes (53, and 59 in some feeds) -> Utah Mammoth
+RELOCATED_TEAMS = {53: (68, "UTA"), 59: (68, "UTA")}
+
+
+def remap_relocated_teams(df: pd.DataFrame) -> pd.DataFrame:
+    for old_id, (new_id, abbrev) in RELOCATED_TEAMS.items():
+        df.loc[df["team_id"] == old_id, ["team_id", "team"]] = [new_id, abbrev]
+        df.loc[df["opponent_id"] == old_id, ["opponent_id", "opponent"]] = [new_id, abbrev]
+    return df
+
+
+def merge_parsed(box_name: str, pbp_name: str, game_ids: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """Box + play-by-play for one pair of parser outputs (optionally only `game_ids`), one row per key."""
+    df = pd.merge(
+        read_parsed(box_name, categories=False, game_ids=game_ids),
+        read_parsed(pbp_name, categories=False, game_ids=game_ids),
+        on=KEY,
+        how="inner",
+    )
+    df = remap_relocated_teams(df)
+    return df.drop_duplicates(KEY, keep="last").reset_index(drop=True)
+
+
+_lock_depth = 0
+
+
+@contextmanager
+def store_lock(exclusive: bool = True):
+    """flock on the store: exclusive for writers, shared for readers. Re-entrant within a process."""
+    global _lock_depth
+    if _lock_depth:
+        _lock_depth += 1
+        try:
+            yield
+        finally:
+            _lock_depth -= 1
+        return
+    LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with LOCK_FILE.open("a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        _lock_depth = 1
+        try:
+            yield
+        finally:
+            _lock_depth = 0
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+def _write(df: pd.DataFrame, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_path(path)
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _write_json(obj: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_path(path)
+    tmp.write_text(json.dumps(obj, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def delta_files() -> List[Path]:
+    return sorted(DELTA_DIR.glob("delta_*.parquet"))
+
+
+def build_base(box_name: str = HISTORICAL[0], pbp_name: str = HISTORICAL[1]) -> int:
+    """Build the compacted base from the historical extracts. Returns rows written."""
+    df = merge_parsed(box_name, pbp_name).sort_values(KEY, ignore_index=True)
+    with store_lock():
+        _write(df, BASE_FILE)
+        # Update rows compacted into the old base are gone -- ingest every parser part again
+        INGESTED_FILE.unlink(missing_ok=True)
+    print(f"Built base with {len(df)} player-games → {BASE_FILE}")
+    return len(df)
+
+
+def load_player_data(columns: Optional[Iterable[str]] = None, filters: Optional[list] = None) -> pd.DataFrame:
+    """
+    Current table: base overlaid with every delta, newest row per key. `columns`
+    and `filters` (pyarrow filter tuples) are pushed down to each file's read.
+    """
+    read_cols = None if columns is None else list(dict.fromkeys([*KEY, *columns]))
+    with store_lock(exclusive=False):
+        files = [p for p in [BASE_FILE, *delta_files()] if p.exists()]
+        if not files:
+            raise FileNotFoundError(f"No player store under {STORE_DIR} -- run new_data.py (or build-base) first")
+        df = pd.concat([pd.read_parquet(p, columns=read_cols, filters=filters) for p in files], ignore_index=True)
+    df = df.drop_duplicates(KEY, keep="last").reset_index(drop=True)
+    return df if columns is None else df[list(columns)]
+
+
+def _row_hashes(df: pd.DataFrame, columns: List[str]) -> pd.Series:
+    return pd.util.hash_pandas_object(df[columns].astype(object), index=False).astype("UInt64")
+
+
+def upsert_delta(df: pd.DataFrame) -> int:
+    """
+    Write the rows of `df` that are new or differ from the stored row for their key
+    as one delta file. Only the stored rows of df's games are read. Returns rows
+    written (0 writes nothing).
+    """
+    df = df.drop_duplicates(KEY, keep="last").reset_index(drop=True)
+    if df.empty:
+        print("Player store is up to date -- no delta written")
+        return 0
+    game_ids = sorted(int(g) for g in df["game_id"].unique())
+    current = load_player_data(filters=[("game_id", "in", game_ids)])
+    columns = [c for c in df.columns if c in current.columns]
+
+    incoming = df[KEY].assign(_hash=_row_hashes(df, columns))
+    stored = current[KEY].assign(_stored=_row_hashes(current, columns))
+    both = incoming.merge(stored, on=KEY, how="left")
+    is_new = both["_stored"].isna().to_numpy()
+    changed = (both["_hash"] != both["_stored"]).fillna(True).to_numpy()
+
+    delta = df[changed]
+    if delta.empty:
+        print("Player store is up to date -- no delta written")
+        return 0
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    _write(delta, DELTA_DIR / f"delta_{ts}.parquet")
+    print(f"Wrote delta with {len(delta)} player-games ({int(is_new.sum())} new)")
+    return len(delta)
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _new_parts() -> Dict[str, List[Path]]:
+    """Per update_* output, its dataset parts not yet ingested."""
+    ingested = _read_json(INGESTED_FILE)
+    return {name: [p for p in dataset_parts(PARSED_DIR / name) if p.name not in ingested.get(name, [])]
+            for name in UPDATE}
+
+
+def ingest_updates() -> int:
+    """
+    Daily ingest: merge the games in the update_* parts written since the last
+    ingest and upsert them as a delta. Returns rows written.
+    """
+    with store_lock():
+        if not BASE_FILE.exists():
+            build_base()
+        new_parts = _new_parts()
+        game_ids = set()
+        for name, parts in new_parts.items():
+            game_ids |= dataset_game_ids(PARSED_DIR / name, parts)
+        print(f"Ingesting {len(game_ids)} games from {sum(map(len, new_parts.values()))} new parser parts")
+
+        incoming = merge_parsed(*UPDATE, game_ids=game_ids) if game_ids else pd.DataFrame()
+        frame_in(incoming)
+        written = upsert_delta(incoming) if game_ids else 0
+        count_out(written, incoming.shape[1])
+        _write_json({name: [p.name for p in dataset_parts(PARSED_DIR / name)] for name in UPDATE}, INGESTED_FILE)
+    return written
+
+
+def compact() -> int:
+    """Fold all deltas into the base. Returns rows in the new base."""
+    with store_lock():
+        deltas = delta_files()
+        df = load_player_data().sort_values(KEY, ignore_index=True)
+        _write(df, BASE_FILE)
+        for p in deltas:
+            p.unlink()
+    print(f"Compacted {len(deltas)} deltas into base ({len(df)} player-games)")
+    return len(df)
+
+
+# --- Shared read path ---
+_hash_memo: Dict[tuple, str] = {}
+
+
+def file_sha256(path: Path) -> str:
+    """sha256 of a file, memoized per (path, size, mtime) within the process."""
+    st = path.stat()
+    memo_key = (str(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _hash_memo:
+        h = hashlib.sha256()
+        with path.open("rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                h.update(chunk)
+        _hash_memo[memo_key] = h.hexdigest()
+    return _hash_memo[memo_key]
+
+
+def source_hashes() -> Dict[str, str]:
+    """sha256 of each historical extract the base is built from (Parquet, else CSV)."""
+    hashes = {}
+    for name in HISTORICAL:
+        for suffix in (".parquet", ".csv"):
+            path = PARSED_DIR / f"{name}{suffix}"
+            if path.exists():
+                hashes[name] = file_sha256(path)
+                break
+    return hashes
+
+
+def refresh() -> bool:
+    """
+    Rebuild the base if the historical extracts changed, then ingest new parser
+    parts. The store's only writer in the daily pipeline (New Data step). Returns
+    True if the base was rebuilt.
+    """
+    with store_lock():
+        sources = source_hashes()
+        rebuilt = not BASE_FILE.exists() or _read_json(STATE_FILE).get("sources") != sources
+        if rebuilt:
+            build_base()
+            _write_json({"sources": sources, "built_at": datetime.now().isoformat()}, STATE_FILE)
+        ingest_updates()
+    return rebuilt
+
+
+def player_games(columns: Optional[Iterable[str]] = None, seasons: Optional[Iterable[int]] = None,
+                 after_season: Optional[int] = None, filters: Optional[list] = None) -> pd.DataFrame:
+    """
+    Merged box + play-by-play player games, one row per key. Only the requested
+    columns and seasons (plus any pyarrow `filters`) are read from the store.
+    Read-only: the store is brought up to date by refresh() (new_data.py).
+    """
+    filters = list(filters or [])
+    if seasons is not None:
+        filters.append(("season", "in", list(seasons)))
+    if after_season is not None:
+        filters.append(("season", ">", after_season))
+    return load_player_data(columns=columns, filters=filters or None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Player-game fact table store")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build-base", help="build the base from the historical box/pbp extracts")
+    sub.add_parser("ingest", help="upsert the games in new update_* parser parts as a delta")
+    sub.add_parser("compact", help="fold deltas into the base")
+    args = parser.parse_args()
+
+    if args.cmd == "build-base":
+        build_base()
+    elif args.cmd == "ingest":
+        ingest_updates()
+    elif args.cmd == "compact":
+        compact()
+
+
+if __name__ == "__main__":
+    main()
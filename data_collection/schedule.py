@@ -0,0 +1,144 @@
+# Week-stride NHL schedule crawler and local schedule table.
+#
+# /v1/schedule/{date} returns the whole gameWeek starting at {date}, so a season
+# needs one request per week, not per day. Week starts are fetched concurrently
+# through the async fetch engine; if a response covers fewer days than the stride
+# (short weeks around breaks), crawling continues from its nextStartDate.
+#
+# Games are upserted into schedule.sqlite, indexed by date, for downstream steps.
+import asyncio
+import sqlite3
+from contextlib import closing
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .fetch_engine import TokenBucket, request_with_retry, DEFAULT_CONCURRENCY, DEFAULT_RATE, DEFAULT_BURST
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+SCHEDULE_DB = PROJECT_ROOT / "schedule.sqlite"
+SCHEDULE_URL = "https://api-web.nhle.com/v1/schedule/{date}"
+WEEK = timedelta(days=7)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id        INTEGER PRIMARY KEY,
+    season         INTEGER,
+    game_date      TEXT NOT NULL,
+    game_type      INTEGER,
+    start_time_utc TEXT,
+    away_team_id   INTEGER,
+    away_team      TEXT,
+    home_team_id   INTEGER,
+    home_team      TEXT,
+    game_state     TEXT
+);
+CREATE INDEX IF NOT EXISTS games_date ON games (game_date);
+CREATE INDEX IF NOT EXISTS games_season_type ON games (season, game_type);
+"""
+COLUMNS = ("game_id", "season", "game_date", "game_type", "start_time_utc",
+           "away_team_id", "away_team", "home_team_id", "home_team", "game_state")
+
+
+def parse_week(data: dict) -> tuple[List[Dict], set, Optional[date]]:
+    """Rows for every game in a schedule response, the dates it covered, and nextStartDate."""
+    rows, covered = [], set()
+    for day in data.get("gameWeek", []):
+        game_date = day.get("date")
+        covered.add(date.fromisoformat(game_date))
+        for game in day.get("games", []):
+            rows.append({
+                "game_id": game["id"],
+                "season": game.get("season"),
+                "game_date": game_date,
+                "game_type": game.get("gameType"),
+                "start_time_utc": game.get("startTimeUTC"),
+                "away_team_id": game.get("awayTeam", {}).get("id"),
+                "away_team": game.get("awayTeam", {}).get("abbrev"),
+                "home_team_id": game.get("homeTeam", {}).get("id"),
+                "home_team": game.get("homeTeam", {}).get("abbrev"),
+                "game_state": game.get("gameState"),
+            })
+    nxt = data.get("nextStartDate")
+    return rows, covered, date.fromisoformat(nxt) if nxt else None
+
+
+async def crawl_schedule_async(start_date: date, end_date: date,
+                               concurrency: int = DEFAULT_CONCURRENCY,
+                               rate: float = DEFAULT_RATE) -> List[Dict]:
+    bucket = TokenBucket(rate, DEFAULT_BURST)
+    sem = asyncio.Semaphore(concurrency)
+    games: Dict[int, Dict] = {}
+    covered: set = set()
+
+    async def fetch_week(start: date):
+        url = SCHEDULE_URL.format(date=start.isoformat())
+        async with sem:
+            r = await request_with_retry(url, bucket)
+        if r is None or r.status_code != 200:
+            print(f"No schedule for week of {start}")
+            return start, None
+        return start, r.json()
+
+    starts = []
+    d = start_date
+    while d <= end_date:
+        starts.append(d)
+        d += WEEK
+
+    attempted = set()
+    while starts:
+        attempted.update(starts)
+        results = await asyncio.gather(*(fetch_week(s) for s in starts))
+        followups = set()
+        for start, data in sorted(results, key=lambda x: x[0]):
+            if data is None:
+                continue
+            rows, days, nxt = parse_week(data)
+            covered |= days
+            for row in rows:
+                games[row["game_id"]] = row
+            print(f"Week of {start}: {len(rows)} games ({len(games)} total so far)")
+            if nxt and nxt <= end_date and nxt not in covered:
+                followups.add(nxt)
+
+        # Only short weeks leave gaps -- continue from their nextStartDate
+        starts = sorted(s for s in followups if s not in attempted)
+
+    return sorted(games.values(), key=lambda r: (r["game_date"], r["game_id"]))
+
+
+def crawl_schedule(start_date: date, end_date: date, **kwargs) -> List[Dict]:
+    """Crawl [start_date, end_date] one gameWeek per request, weeks in parallel."""
+    rows = asyncio.run(crawl_schedule_async(start_date, end_date, **kwargs))
+    return [r for r in rows if start_date.isoformat() <= r["game_date"] <= end_date.isoformat()]
+
+
+def connect(db_path: Path = SCHEDULE_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def save_schedule(rows: Iterable[Dict], db_path: Path = SCHEDULE_DB) -> int:
+    """Upsert schedule rows; game state and start time are refreshed on every crawl."""
+    rows = list(rows)
+    with closing(connect(db_path)) as conn, conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO games ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            [tuple(r[c] for c in COLUMNS) for r in rows],
+        )
+    return len(rows)
+
+
+def games_between(start_date: date, end_date: date, game_type: Optional[int] = 2,
+                  db_path: Path = SCHEDULE_DB) -> List[Dict]:
+    """Scheduled games in a date range (inclusive) from the local table."""
+    sql = "SELECT * FROM games WHERE game_date BETWEEN ? AND ?"
+    params: list = [start_date.isoformat(), end_date.isoformat()]
+    if game_type is not None:
+        sql += " AND game_type = ?"
+        params.append(game_type)
+    with closing(connect(db_path)) as conn, conn:
+        return [dict(r) for r in conn.execute(sql + " ORDER BY game_date, game_id", params)]
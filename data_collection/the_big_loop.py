@@ -1,5 +1,5 @@
 import json, os
-from .generate_cache import get_boxscore_data, get_play_by_play_from_game_id
+from .fetch_engine import fetch_games_sync, DEFAULT_CONCURRENCY, DEFAULT_RATE
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -8,26 +8,21 @@ def load_all_game_ids(filename):
         return json.load(f)
 
 
-def process_all_games():
+def process_all_games(concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE):
     all_game_ids = load_all_game_ids(filename="new_game_ids.json")
     game_ids = all_game_ids["new_game_ids"]
     total_new = 0
  
-    print(f"\nProcessing ({len(game_ids)} games)...")
+    print(f"\nProcessing ({len(game_ids)} games, {concurrency} concurrent, {rate:g} req/s)...")
     
+    # Boxscore + play-by-play for every game are fetched concurrently into update_game_cache
+    status = fetch_games_sync(game_ids, concurrency=concurrency, rate=rate)
 
     for gid in game_ids:
         print(f"Game {gid}")
-        try:
-            stats = get_boxscore_data(gid)
-            pbp = get_play_by_play_from_game_id(gid)
-            if not stats or not pbp:
-                print(f"No data for {gid}, skipping.")
-                continue
-
-
-        except Exception as e:
-            print(f"Error with {gid}: {e}")
+        if not status.get(gid):
+            print(f"No data for {gid}, skipping.")
+            continue
 
         total_new += 1
 
@@ -35,4 +30,4 @@ def process_all_games():
 
 
 if __name__ == "__main__":
-    process_all_games()
\ No newline at end of file
+    process_all_games()
@@ -13,16 +13,22 @@ from pathlib import Path
 import pandas as pd
 from sklearn.preprocessing import OneHotEncoder
 from datetime import datetime
+from typing import Optional
 
-def main() -> None:
-    ROOT = Path(__file__).resolve().parent
-    OUT = ROOT / "parquets"
+from data_collection.player_store import player_games
+from joins import left_join
+from team_games import TEAM_GAME_KEYS, build_team_games, opponent_values
 
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    print(f"[{ts}] Starting categorical encoding process...")
-    
-    # get the data
-    df = pd.read_parquet(OUT / "player_data.parquet")
+ROOT = Path(__file__).resolve().parent
+OUT = ROOT / "parquets"
+OUTPUT_FILE = OUT / "df_encoded_base.parquet"
+
+
+def transform(df: pd.DataFrame, team_games: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Player data -> encoded base frame (stage 1 of the feature build). `team_games`
+    is the build's shared team-game table (built from df if not given).
+    """
     # Convert to proper season format
     df["season"] = df["game_id"].astype(str).str[:4].astype(int)
     # Drop duplicate/redundant columns
@@ -35,49 +41,18 @@ def main() -> None:
     encoded_df = pd.DataFrame(encoded, columns=encoder.get_feature_names_out(["position"]))
     df_encoded = pd.concat([df, encoded_df], axis=1)
 
-    ## Create cumulative wins, losses, and OTL at the time of the game
-    team_games = (
-        df.groupby(["season", "game_id", "team"], as_index=False)
-        [["game_date", "start_time_UTC", "team_win", "team_loss", "team_otl", "opponent"]]
-        .max()
-    )
-
-    team_games["game_date"] = pd.to_datetime(team_games["game_date"], errors="coerce")
-    team_games["start_time_UTC"] = pd.to_datetime(team_games["start_time_UTC"], errors="coerce")
-
-    team_games = team_games.sort_values(["season", "team", "game_id"])
-
-    for col, out in [("team_win", "team_wins_pre"),
-                    ("team_loss", "team_losses_pre"),
-                    ("team_otl", "team_otl_pre")]:
-        team_games[out] = (
-            team_games.groupby(["season", "team"])[col]
-            .apply(lambda s: s.shift(1).cumsum())
-            .reset_index(level=[0,1], drop=True)
-            .fillna(0)
-            .astype(int)
-        )
-
-    opp_pre = team_games[["season", "game_id", "team", "team_wins_pre", "team_losses_pre", "team_otl_pre"]].copy()
-    opp_pre = opp_pre.rename(columns={
-        "team": "opponent",
-        "team_wins_pre": "opp_wins_pre",
-        "team_losses_pre": "opp_losses_pre",
-        "team_otl_pre": "opp_otl_pre",
-    })
-
-    team_games = team_games.merge(
-        opp_pre,
-        on=["season", "game_id", "opponent"],
-        how="left"
-    )
-
-    df_encoded = df_encoded.merge(
-        team_games[["season", "game_id", "team",
-                "team_wins_pre", "team_losses_pre", "team_otl_pre",
-                "opp_wins_pre", "opp_losses_pre", "opp_otl_pre"]],
-        on=["season", "game_id", "team"],
-        how="left"
+    ## Cumulative wins, losses, and OTL at the time of the game -- for the team and its opponent
+    if team_games is None:
+        team_games = build_team_games(df)
+    record = ["team_wins_pre", "team_losses_pre", "team_otl_pre"]
+    opp_record = opponent_values(team_games, record)
+    opp_record.columns = ["opp_wins_pre", "opp_losses_pre", "opp_otl_pre"]
+
+    df_encoded = left_join(
+        df_encoded,
+        pd.concat([team_games[TEAM_GAME_KEYS + record], opp_record], axis=1),
+        on=TEAM_GAME_KEYS,
+        name="team record"
     )
 
     # Encode TOI -- convert xx:xx to total seconds of ice time
@@ -88,7 +63,11 @@ def main() -> None:
         except Exception:
             return pd.NA
 
-    df_encoded["toi_seconds"] = df_encoded["toi"].apply(convert_to_seconds).astype("Int64")
+    # (typed parser outputs already carry toi_seconds -- only convert rows without it)
+    toi_seconds = df_encoded.get("toi_seconds", pd.Series(pd.NA, index=df_encoded.index)).astype("Int64")
+    missing = toi_seconds.isna()
+    toi_seconds[missing] = df_encoded.loc[missing, "toi"].apply(convert_to_seconds).astype("Int64")
+    df_encoded["toi_seconds"] = toi_seconds
 
     # Encode start time -- extract hour
     df_encoded["start_time_UTC"] = pd.to_datetime(df_encoded["start_time_UTC"], errors="coerce", utc=True)
@@ -127,10 +106,19 @@ def main() -> None:
         .transform(lambda x: x / x.max())
     )
 
-    df_encoded.to_parquet(OUT / "df_encoded_base.parquet", index=False)
+    return df_encoded
+
+
+def main() -> None:
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    print(f"[{ts}] Starting categorical encoding process...")
+
+    # get the data
+    df_encoded = transform(player_games())
+    df_encoded.to_parquet(OUTPUT_FILE, index=False)
 
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    print(f"[{ts}] Categorical encoding complete. Data saved to {OUT / 'df_encoded_base.parquet'}")
+    print(f"[{ts}] Categorical encoding complete. Data saved to {OUTPUT_FILE}")
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,95 @@
+# In-memory feature build: player store -> model artifacts.
+#
+# Runs encode_categorical -> feat_eng_player -> team_strength_wins ->
+# team_strength_goals -> misc_feats as DataFrame -> DataFrame stages, handing the
+# frame from one to the next in memory instead of round-tripping it through
+# Parquet. Each stage's usual file (parquets/df_*.parquet) is only written when
+# checkpoints are on, and --resume-from starts at a stage by reading the
+# checkpoint of the stage before it. The team-game table (team_games.py) is built
+# once from the starting frame and shared by every stage. Each stage's output is
+# compacted (frame_schema: small ints, float32, categoricals) before it is handed
+# on, with its before/after memory printed. The per-script main()s still work alone.
+#
+#   python feature_pipeline.py [--checkpoint] [--resume-from "Team Strength - Goals"] [--no-compact]
+import argparse
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+import encode_categorical
+import feat_eng_player
+import misc_feats
+import team_strength_goals
+import team_strength_wins
+from data_collection.player_store import player_games
+from frame_schema import compact_report
+from instrumentation import frame_out, timer
+from team_games import build_team_games
+
+# (name, stage module) in run order; each module has transform(df, team_games), INPUT_FILE (except
+# the first, which reads the player store) and OUTPUT_FILE (except the last)
+STAGES = [
+    ("Categorical Encoding", encode_categorical),
+    ("Feature Engineering - Player", feat_eng_player),
+    ("Team Strength - Wins", team_strength_wins),
+    ("Team Strength - Goals", team_strength_goals),
+    ("Miscellaneous Features", misc_feats),
+]
+
+
+def ts() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def build_features(df: Optional[pd.DataFrame] = None, checkpoint: bool = False,
+                   resume_from: Optional[str] = None, compact: bool = True) -> pd.DataFrame:
+    """
+    Run the feature stages in memory and return the model frame. Starts from `df`
+    (or the player store, or the checkpoint before `resume_from`).
+    With `compact`, each stage's output is stored in compact dtypes (frame_schema).
+    """
+    names = [name for name, _ in STAGES]
+    start = names.index(resume_from) if resume_from else 0
+    if df is None:
+        df = player_games() if start == 0 else pd.read_parquet(STAGES[start][1].INPUT_FILE)
+
+    # One team-game table for every stage's team/opponent features
+    with timer("Team Games") as span:
+        span.frame_in(df)
+        team_games = build_team_games(df)
+        span.frame_out(team_games)
+
+    for name, stage in STAGES[start:]:
+        with timer(name) as span:
+            span.frame_in(df)
+            df = stage.transform(df, team_games)
+            if compact:
+                df, footprint = compact_report("memory", df)
+            span.frame_out(df)
+        print(f"[{ts()}] {name}: {len(df)} rows x {df.shape[1]} cols ({span.wall_s:.2f}s)")
+        if compact:
+            print(f"[{ts()}]   {footprint}")
+        if checkpoint and hasattr(stage, "OUTPUT_FILE"):
+            df.to_parquet(stage.OUTPUT_FILE, index=False)
+            print(f"[{ts()}] Checkpoint → {stage.OUTPUT_FILE}")
+    return df
+
+
+def main(checkpoint: bool = False, resume_from: Optional[str] = None, compact: bool = True) -> None:
+    print(f"[{ts()}] Starting in-memory feature build...")
+    df = build_features(checkpoint=checkpoint, resume_from=resume_from, compact=compact)
+    frame_out(df)
+    misc_feats.save_model_artifacts(df)
+    print(f"[{ts()}] Feature build complete.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Feature build with in-memory stage handoff")
+    parser.add_argument("--checkpoint", action="store_true", help="also write each stage's parquet")
+    parser.add_argument("--resume-from", choices=[name for name, _ in STAGES],
+                        help="start at this stage from the previous stage's checkpoint")
+    parser.add_argument("--no-compact", action="store_true",
+                        help="keep pandas' default dtypes (int64/float64/strings) between stages")
+    args = parser.parse_args()
+    main(checkpoint=args.checkpoint, resume_from=args.resume_from, compact=not args.no_compact)
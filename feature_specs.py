@@ -0,0 +1,231 @@
+# Declarative "previous games" features and the one engine that computes them.
+#
+# Every rolling / season-to-date feature in the feature build is the same shape:
+# take a source column, group by an entity (player-season, team-season, ...),
+# order by date, and aggregate each row's previous N rows (shift(1) + rolling)
+# or all previous rows (shift(1) + expanding) -- optionally again on the home
+# and away subsets, then forward-fill / zero-fill. A FeatureSpec states those
+# choices; REGISTRY lists the specs per feature-build stage, so adding a feature
+# is one line here.
+#
+# add_features() plans a list of specs: specs sharing an entity and order are
+# computed in one pass -- one sort permutation, one set of group boundaries per
+# split, one prefix-sum per (source, split) shared by every window and
+# aggregation -- using rolling_kernels, and all new columns are attached with a
+# single concat. Rows keep the frame's order.
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from rolling_kernels import forward_fill, group_starts, prefix_sums, shifted_expanding, shifted_rolling
+
+# Grouping entity -> key columns (one player's / team's season, or all of its games)
+ENTITIES = {
+    "player": ["player_id", "season"],
+    "player_career": ["player_id"],
+    "team": ["season", "team_id"],
+    "team_career": ["team_id"],
+    "team_venue": ["season", "team_id", "is_home"],
+}
+
+# Split dimension -> (value, column-name suffix) per subset
+SPLITS = {
+    "is_home": [(1, "_home"), (0, "_away")],
+}
+
+# Fill policies (applied after computing, within the entity, in date order):
+#   None     leave NaN where there is no history
+#   "ffill0" split columns carry the last value forward, remaining NaNs -> 0
+#   "zero"   as "ffill0", and the overall columns' NaNs -> 0 as well
+FILLS = (None, "ffill0", "zero")
+
+WINDOWS = (3, 5, 7, 10)
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    source: str
+    roll: Optional[str] = None   # rolling column template, {w} = window, {split} = "" / "_home" / "_away"
+    pre: Optional[str] = None    # season-to-date (expanding) column template, {split} as above
+    entity: str = "player"
+    order_by: str = "game_date"
+    windows: Tuple[int, ...] = WINDOWS
+    agg: str = "mean"            # mean | sum | count
+    min_periods: Optional[int] = 1  # None = full window, like pandas' rolling default
+    over: Optional[float] = None    # aggregate the indicator source >= over instead of the source
+    split: Optional[str] = None     # also compute per subset of SPLITS[split]
+    overall: bool = True            # with a split, whether to also compute on all rows
+    fill: Optional[str] = None
+
+    def __post_init__(self):
+        if self.entity not in ENTITIES:
+            raise ValueError(f"Unknown entity {self.entity!r} for {self.source}")
+        if self.split is not None and self.split not in SPLITS:
+            raise ValueError(f"Unknown split {self.split!r} for {self.source}")
+        if self.fill not in FILLS:
+            raise ValueError(f"Unknown fill policy {self.fill!r} for {self.source}")
+        if self.agg not in ("mean", "sum", "count"):
+            raise ValueError(f"Unknown aggregation {self.agg!r} for {self.source}")
+        for template in (self.roll, self.pre):
+            if template is not None and self.split is not None and "{split}" not in template:
+                raise ValueError(f"{template!r} needs a {{split}} placeholder")
+
+    def variants(self) -> List[Tuple[Optional[int], str]]:
+        """(split value or None for all rows, column suffix) to compute."""
+        out = [(None, "")] if self.overall or self.split is None else []
+        return out + (SPLITS[self.split] if self.split else [])
+
+
+# --- Player shots (feat_eng_player) ---
+PLAYER_SHOTS = [
+    FeatureSpec("shots_on_goal", "plr_roll{w}_shots{split}", "plr_pre_avg_shots{split}",
+                split="is_home", fill="ffill0"),
+    *[FeatureSpec("shots_on_goal", f"plr_roll{{w}}_over{thr}_shots_mean", over=thr) for thr in (2, 3, 4)],
+    *[FeatureSpec("shots_on_goal", f"plr_roll{{w}}_over{thr}_shots{{split}}", f"plr_pre_over{thr}_shots{{split}}",
+                  agg="sum", over=thr, split="is_home", fill="ffill0") for thr in (2, 3, 4)],
+    FeatureSpec("shot_attempts_total", "plr_roll{w}_att{split}", "plr_pre_avg_att{split}",
+                split="is_home", fill="ffill0"),
+    FeatureSpec("pp_shots", "plr_pp_shots_roll{w}{split}", "plr_pp_shots_pre_avg{split}", split="is_home", fill="zero"),
+    FeatureSpec("pp_attempts_total", "plr_pp_att_roll{w}{split}", "plr_pp_att_pre_avg{split}", split="is_home", fill="zero"),
+    FeatureSpec("pk_shots", "plr_pk_shots_roll{w}{split}", "plr_pk_shots_pre_avg{split}", split="is_home", fill="zero"),
+    FeatureSpec("pk_attempts_total", "plr_pk_att_roll{w}{split}", "plr_pk_att_pre_avg{split}", split="is_home", fill="zero"),
+]
+
+# --- Team win form (team_strength_wins); win% denominators are the "count" specs ---
+TEAM_WINS = [
+    FeatureSpec("team_win_game", "team_wins_last_{w}", entity="team", order_by="game_id",
+                windows=(5, 10), agg="sum", fill="zero"),
+]
+TEAM_VENUE_WINS = [
+    FeatureSpec("team_win_game", "wins_last_{w}", entity="team_venue", windows=(5, 10), agg="sum", fill="zero"),
+    FeatureSpec("team_win_game", "games_last_{w}", entity="team_venue", windows=(5, 10), agg="count"),
+]
+
+# --- Team goals (team_strength_goals) ---
+TEAM_GOALS = [
+    *[FeatureSpec(col, col + "{split}_rolling_{w}", col + "{split}_avg", entity="team", windows=(5, 10),
+                  split="is_home") for col in ("team_goals", "team_goals_against", "team_goal_diff")],
+    FeatureSpec("team_goals", pre="team_goals_cumulative_pre", entity="team", agg="sum"),
+    FeatureSpec("team_goals_against", pre="team_goals_against_cumulative_pre", entity="team", agg="sum"),
+]
+
+# --- Miscellaneous v2 features (misc_feats) ---
+PLAYER_CAREER = [
+    FeatureSpec("toi_seconds", "plr_roll{w}_toi", entity="player_career", order_by="game_id",
+                windows=(5, 10), min_periods=None),
+    FeatureSpec("pim", "plr_roll{w}_pim", entity="player_career", order_by="game_id",
+                windows=(5, 10), min_periods=None),
+    FeatureSpec("pim", pre="plr_avg_pim_pre", entity="player_career", order_by="game_id"),
+]
+TEAM_PIM = [
+    FeatureSpec("team_pim_game", "team_roll{w}_pim", entity="team_career", order_by="game_id",
+                windows=(5, 10), min_periods=None),
+    FeatureSpec("team_pim_game", pre="team_season_avg_pre_pim", entity="team", order_by="game_id"),
+]
+TEAM_SHOOTING = [
+    FeatureSpec(col, col + "{split}_rolling_{w}", col + "{split}_avg", entity="team", windows=(5, 10), split="is_home")
+    for col in ("team_shots", "team_attempts", "team_attempts_blocked", "team_attempts_missed", "team_blocks")
+]
+PLAYER_RATES = [
+    FeatureSpec(source, prefix + "_roll{w}{split}", prefix + "_pre_avg{split}", split="is_home", fill="ffill0")
+    for source, prefix in [
+        ("shot_attempts_blocked", "plr_blk_att"),
+        ("shot_attempts_missed", "plr_miss_att"),
+        ("shots_per_toi60", "plr_shots_per_toi60"),
+        ("att_per_toi60", "plr_att_per_toi60"),
+        ("shots_per_shift", "plr_shots_per_shift"),
+        ("att_per_shift", "plr_att_per_shift"),
+    ]
+]
+
+REGISTRY: Dict[str, List[FeatureSpec]] = {
+    "player_shots": PLAYER_SHOTS,
+    "team_wins": TEAM_WINS,
+    "team_venue_wins": TEAM_VENUE_WINS,
+    "team_goals": TEAM_GOALS,
+    "player_career": PLAYER_CAREER,
+    "team_pim": TEAM_PIM,
+    "team_shooting": TEAM_SHOOTING,
+    "player_rates": PLAYER_RATES,
+}
+
+
+def _sort_order(df: pd.DataFrame, by: List[str]) -> Optional[np.ndarray]:
+    """Row positions in (stable) sorted order, or None if the frame is already sorted."""
+    order = df[by].reset_index(drop=True).sort_values(by, kind="mergesort").index.to_numpy()
+    return None if np.array_equal(order, np.arange(len(df))) else order
+
+
+def _compute_batch(df: pd.DataFrame, keys: List[str], specs: Iterable[FeatureSpec]) -> Dict[str, np.ndarray]:
+    """Columns for specs sharing one entity and order; df must already be in that order."""
+    starts = group_starts(df, keys)
+    subsets = {None: (None, starts)}  # split value -> (row mask, group starts within the subset)
+    values, prefixes, cols = {}, {}, {}
+
+    for spec in specs:
+        if (spec.source, spec.over) not in values:
+            v = df[spec.source].to_numpy(dtype=np.float64, na_value=np.nan)
+            values[(spec.source, spec.over)] = v if spec.over is None else (v >= spec.over).astype(np.float64)
+        v = values[(spec.source, spec.over)]
+
+        for value, suffix in spec.variants():
+            key = None if value is None else (spec.split, value)
+            if key not in subsets:
+                mask = (df[spec.split] == value).to_numpy()
+                subsets[key] = (mask, group_starts(df.loc[mask, keys], keys))
+            mask, sub_starts = subsets[key]
+            sub_v = v if mask is None else v[mask]
+            pkey = (spec.source, spec.over, key)
+            if pkey not in prefixes:
+                prefixes[pkey] = prefix_sums(sub_v, sub_starts)
+
+            new = {}
+            if spec.roll:
+                rolls = shifted_rolling(sub_v, sub_starts, spec.windows, spec.agg, spec.min_periods,
+                                        prefix=prefixes[pkey])
+                for w in spec.windows:
+                    new[spec.roll.format(w=w, split=suffix)] = rolls[w]
+            if spec.pre:
+                new[spec.pre.format(split=suffix)] = shifted_expanding(
+                    sub_v, sub_starts, spec.agg, prefix=prefixes[pkey])
+
+            for name, arr in new.items():
+                if mask is not None:
+                    full = np.full(len(df), np.nan)
+                    full[mask] = arr
+                    arr = full
+                if spec.fill is not None:
+                    if value is not None:
+                        arr = np.nan_to_num(forward_fill(arr, starts), nan=0.0)
+                    elif spec.fill == "zero":
+                        arr = np.nan_to_num(arr, nan=0.0)
+                cols[name] = arr
+    return cols
+
+
+def add_features(df: pd.DataFrame, specs: Iterable[FeatureSpec]) -> pd.DataFrame:
+    """
+    Compute `specs` on df and return it with the new columns appended (existing
+    columns of the same name are replaced). Row order is unchanged.
+    """
+    batches = defaultdict(list)
+    for spec in specs:
+        batches[(spec.entity, spec.order_by)].append(spec)
+
+    cols = {}
+    for (entity, order_by), batch in batches.items():
+        keys = ENTITIES[entity]
+        order = _sort_order(df, keys + [order_by])
+        view = df if order is None else df.iloc[order]
+        for name, arr in _compute_batch(view, keys, batch).items():
+            if order is not None:
+                out = np.empty_like(arr)
+                out[order] = arr
+                arr = out
+            cols[name] = arr
+
+    df = df.drop(columns=[c for c in cols if c in df.columns])
+    return pd.concat([df, pd.DataFrame(cols, index=df.index)], axis=1)
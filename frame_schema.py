@@ -0,0 +1,68 @@
+# Compact dtypes for the player-game frames of the feature build.
+#
+# The frame carries int64 for small counts (SOG, hits, PIM, window sums), float64
+# for every engineered feature, and strings -- team/opponent/position/venue and
+# full logo/headshot URLs -- repeated on every row. compact() stores integers in
+# the smallest type that holds their values (int8/int16/...), floats as float32,
+# and strings with few distinct values as categoricals. feature_pipeline applies
+# it at every stage boundary and prints the before/after footprint.
+#
+# Computations are unaffected in kind: the rolling kernels read sources as
+# float64, and every stage's new columns are compacted at the next boundary.
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_float_dtype, is_integer_dtype
+
+# A string column becomes categorical when it has fewer distinct values than
+# this share of its rows (team, position, logo URLs, headshots, ...)
+CATEGORY_RATIO = 0.5
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def _is_text(s: pd.Series) -> bool:
+    return s.dtype == object or isinstance(s.dtype, pd.StringDtype)
+
+
+def compact_dtype(s: pd.Series):
+    """The column's compact dtype, or None if it is already compact."""
+    if is_bool_dtype(s.dtype) or isinstance(s.dtype, pd.CategoricalDtype):
+        return None
+    if is_integer_dtype(s.dtype):
+        nullable = isinstance(s.dtype, pd.api.extensions.ExtensionDtype)
+        lo, hi = (s.min(), s.max()) if s.notna().any() else (0, 0)
+        for candidate in (np.int8, np.int16, np.int32, np.int64):
+            info = np.iinfo(candidate)
+            if info.min <= lo and hi <= info.max:
+                target = pd.api.types.pandas_dtype(candidate.__name__.capitalize() if nullable else candidate)
+                return None if target == s.dtype else target
+        return None
+    if is_float_dtype(s.dtype):
+        if isinstance(s.dtype, pd.Float64Dtype):
+            return pd.Float32Dtype()
+        return np.dtype("float32") if s.dtype == np.float64 else None
+    if _is_text(s) and len(s) and s.nunique(dropna=True) < CATEGORY_RATIO * len(s):
+        return "category"
+    return None
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """df with every column in its compact dtype (columns already compact are not copied)."""
+    targets = {}
+    for col in df.columns:
+        dtype = compact_dtype(df[col])
+        if dtype is not None:
+            targets[col] = dtype
+    return df.astype(targets) if targets else df
+
+
+def compact_report(name: str, df: pd.DataFrame) -> Tuple[pd.DataFrame, str]:
+    """Compact df and return it with a one-line before/after footprint for `name`."""
+    before = memory_mb(df)
+    df = compact(df)
+    after = memory_mb(df)
+    return df, f"{name}: {before:.1f} MB -> {after:.1f} MB ({before / after if after else 0:.1f}x smaller)"
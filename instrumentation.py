@@ -0,0 +1,292 @@
+# Per-step resource instrumentation and the run ledger.
+#
+# timer(name) measures a block: wall and CPU time (own + child processes), peak
+# RSS (high-water mark, reset per top-level step where Linux allows), bytes read/written (psutil if installed, else
+# /proc/self/io) and, when the block reports them (frame_in/frame_out, or
+# count_in/count_out for row counts), rows/columns in and out.
+# Timers nest -- a timer opened inside a pipeline step is recorded under that
+# step's path ("Feature Build/Team Strength - Wins") -- and every finished timer
+# is appended as one JSON line to logs/run_ledger.jsonl.
+#
+#   python instrumentation.py report [--days 14] [--threshold 1.25] [--all]
+#   python instrumentation.py export        # ledger -> logs/run_ledger.parquet
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # optional; /proc/self/io is used instead on Linux
+    psutil = None
+
+ROOT = Path(__file__).resolve().parent
+LEDGER_FILE = ROOT / "logs" / "run_ledger.jsonl"
+RUN_ID_ENV = "PIPELINE_RUN_ID"
+
+
+@dataclass
+class Span:
+    name: str
+    path: str
+    depth: int
+    run_id: str
+    started_at: str
+    status: str = "ok"
+    error: Optional[str] = None
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_mb: Optional[float] = None
+    bytes_read: Optional[int] = None
+    bytes_written: Optional[int] = None
+    rows_in: Optional[int] = None
+    cols_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    cols_out: Optional[int] = None
+
+    def frame_in(self, df) -> None:
+        self.rows_in, self.cols_in = df.shape
+
+    def frame_out(self, df) -> None:
+        self.rows_out, self.cols_out = df.shape
+
+    def count_in(self, rows: int, cols: Optional[int] = None) -> None:
+        self.rows_in, self.cols_in = rows, cols
+
+    def count_out(self, rows: int, cols: Optional[int] = None) -> None:
+        self.rows_out, self.cols_out = rows, cols
+
+
+_stack: List[Span] = []
+
+
+def ts() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def start_run(pipeline: str) -> str:
+    """Tag every span of this run (and of child processes) with one run id."""
+    run_id = f"{pipeline}_{ts()}"
+    os.environ[RUN_ID_ENV] = run_id
+    return run_id
+
+
+def _cpu_seconds() -> float:
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + kids.ru_utime + kids.ru_stime
+
+
+def _reset_peak_rss() -> None:
+    """Restart the RSS high-water mark (Linux) so a step's peak isn't an earlier step's."""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes on macOS, KiB on Linux
+
+
+def _io_bytes():
+    """(bytes read, bytes written) by this process so far, or (None, None)."""
+    if psutil is not None:
+        try:
+            io = psutil.Process().io_counters()
+            # read_chars/write_chars (Linux) include page-cache hits, like rchar/wchar
+            return getattr(io, "read_chars", io.read_bytes), getattr(io, "write_chars", io.write_bytes)
+        except (psutil.Error, AttributeError):
+            pass
+    try:
+        counters = dict(line.split(": ") for line in Path("/proc/self/io").read_text().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def current() -> Optional[Span]:
+    """The innermost open span, if any."""
+    return _stack[-1] if _stack else None
+
+
+def frame_in(df) -> None:
+    """Record rows/cols read by the innermost open span (no-op outside a timer)."""
+    if _stack:
+        _stack[-1].frame_in(df)
+
+
+def frame_out(df) -> None:
+    """Record rows/cols produced by the innermost open span (no-op outside a timer)."""
+    if _stack:
+        _stack[-1].frame_out(df)
+
+
+def count_in(rows: int, cols: Optional[int] = None) -> None:
+    """Like frame_in, for blocks that stream rows instead of holding a frame (parsers)."""
+    if _stack:
+        _stack[-1].count_in(rows, cols)
+
+
+def count_out(rows: int, cols: Optional[int] = None) -> None:
+    """Like frame_out, for blocks that stream rows instead of holding a frame (parsers)."""
+    if _stack:
+        _stack[-1].count_out(rows, cols)
+
+
+def in_run() -> bool:
+    """True inside a pipeline run (start_run() called here or in a parent process) or an open timer."""
+    return bool(_stack) or RUN_ID_ENV in os.environ
+
+
+def append_ledger(span: Span) -> None:
+    LEDGER_FILE.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps(asdict(span)) + "\n"
+    # One write per line with O_APPEND, so parallel steps don't interleave records
+    fd = os.open(LEDGER_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def timer(name: str, ledger: bool = True):
+    """
+    Measure a block and append it to the ledger (unless ledger=False). Yields the
+    Span (frame_in/frame_out).
+    """
+    parent = current()
+    span = Span(
+        name=name,
+        path=f"{parent.path}/{name}" if parent else name,
+        depth=len(_stack),
+        run_id=parent.run_id if parent else os.environ.get(RUN_ID_ENV, f"adhoc_{ts()}"),
+        started_at=datetime.now().isoformat(timespec="seconds"),
+    )
+    if parent is None:
+        _reset_peak_rss()
+    wall0, cpu0 = time.perf_counter(), _cpu_seconds()
+    read0, written0 = _io_bytes()
+    _stack.append(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.status, span.error = "error", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _stack.pop()
+        span.wall_s = round(time.perf_counter() - wall0, 3)
+        span.cpu_s = round(_cpu_seconds() - cpu0, 3)
+        span.peak_rss_mb = _peak_rss_mb()
+        read1, written1 = _io_bytes()
+        if read0 is not None and read1 is not None:
+            span.bytes_read, span.bytes_written = read1 - read0, written1 - written0
+        try:
+            if ledger:
+                append_ledger(span)
+        except OSError as e:
+            print(f"[{ts()}] Could not append to run ledger: {e}")
+
+
+# --- Ledger reporting ---
+def load_ledger():
+    import pandas as pd
+
+    if not LEDGER_FILE.exists():
+        return pd.DataFrame()
+    df = pd.read_json(LEDGER_FILE, lines=True)
+    df["day"] = pd.to_datetime(df["started_at"]).dt.date
+    return df
+
+
+def report(days: int = 14, threshold: float = 1.25, nested: bool = False) -> None:
+    """Per-step daily trend over the last `days` days and steps whose latest run regressed."""
+    import pandas as pd
+
+    df = load_ledger()
+    if df.empty:
+        print(f"No runs recorded in {LEDGER_FILE}")
+        return
+    df = df[df["status"] == "ok"]
+    if not nested:
+        df = df[df["depth"] == 0]
+    df = df[df["day"] >= max(df["day"]) - pd.Timedelta(days=days - 1)]
+
+    daily = (
+        df.groupby(["path", "day"], as_index=False)
+        .agg(wall_s=("wall_s", "median"), cpu_s=("cpu_s", "median"),
+             peak_rss_mb=("peak_rss_mb", "max"), rows_out=("rows_out", "max"))
+        .sort_values(["path", "day"])
+    )
+    pd.set_option("display.width", 200)
+    print("Per-step daily medians:")
+    print(daily.to_string(index=False))
+
+    # Latest day vs the median of the days before it
+    flagged = []
+    for path, g in daily.groupby("path"):
+        if len(g) < 2:
+            continue
+        latest, before = g.iloc[-1], g.iloc[:-1]
+        for metric in ("wall_s", "peak_rss_mb"):
+            baseline = before[metric].median()
+            if pd.notna(baseline) and baseline > 0 and latest[metric] > threshold * baseline:
+                flagged.append((path, metric, baseline, latest[metric]))
+
+    print(f"\nRegressions (latest day > {threshold:g}x prior median):")
+    if not flagged:
+        print("  none")
+    for path, metric, baseline, value in flagged:
+        print(f"  {path}: {metric} {baseline:.2f} -> {value:.2f} ({value / baseline:.2f}x)")
+
+
+def export_parquet() -> Path:
+    df = load_ledger()
+    out = LEDGER_FILE.with_suffix(".parquet")
+    df.to_parquet(out, index=False)
+    print(f"Wrote {len(df)} ledger rows → {out}")
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pipeline run ledger")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rep = sub.add_parser("report", help="per-step trends and regressions across days")
+    rep.add_argument("--days", type=int, default=14, help="days of history to show")
+    rep.add_argument("--threshold", type=float, default=1.25, help="flag latest/baseline ratios above this")
+    rep.add_argument("--all", action="store_true", help="include nested timers, not just steps")
+    sub.add_parser("export", help="write the ledger as Parquet")
+    args = parser.parse_args()
+
+    if args.cmd == "report":
+        report(days=args.days, threshold=args.threshold, nested=args.all)
+    elif args.cmd == "export":
+        export_parquet()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Key-validated joins for the feature stages.
+#
+# The stages attach team-level columns to player rows and opponent columns to
+# team rows. A plain df.merge on keys that are not unique on the right fans rows
+# out silently (the goals stage used to end with a drop_duplicates to undo it).
+# left_join() cannot: the right side is indexed once by its integer id columns
+# (season, game_id, team_id, ...), sorted, and must be unique on them, so each
+# left row gets at most one match and the row count never changes. A duplicate
+# key raises at the join that introduced it. Inside a pipeline run or another
+# timer, each join is recorded as a nested span in the run ledger (rows in/out,
+# time, memory); ad-hoc calls write nothing.
+from typing import Optional, Sequence
+
+import pandas as pd
+from pandas.api.types import is_integer_dtype
+
+from instrumentation import in_run, timer
+
+
+def _check_int_keys(df: pd.DataFrame, keys: Sequence[str], side: str) -> None:
+    bad = [k for k in keys if not is_integer_dtype(df[k])]
+    if bad:
+        raise TypeError(f"{side} join keys must be integer ids, got {', '.join(f'{k} ({df[k].dtype})' for k in bad)}")
+
+
+def _duplicates(df: pd.DataFrame, keys: Sequence[str]) -> int:
+    return int(df.duplicated(subset=list(keys)).sum())
+
+
+def left_join(left: pd.DataFrame, right: pd.DataFrame, on: Sequence[str],
+              right_on: Optional[Sequence[str]] = None, validate: str = "many_to_one",
+              rsuffix: Optional[str] = None, name: Optional[str] = None) -> pd.DataFrame:
+    """
+    left.merge(right, how="left") that asserts the cardinality: right must be
+    unique on its keys (many_to_one), and for one_to_one so must left. `right_on`
+    names right's key columns when they differ from `on` (e.g. opponent_id ->
+    team_id). Right's key columns are not added; other columns that already exist
+    on the left need `rsuffix`. Returns a frame with a fresh RangeIndex, like merge.
+    """
+    if validate not in ("many_to_one", "one_to_one"):
+        raise ValueError(f"validate must be 'many_to_one' or 'one_to_one', got {validate!r}")
+    on, right_on = list(on), list(right_on or on)
+    _check_int_keys(left, on, "left")
+    _check_int_keys(right, right_on, "right")
+
+    label = name or "+".join(right_on)
+    with timer(f"join {label}", ledger=in_run()) as span:
+        span.frame_in(left)
+        dups = _duplicates(right, right_on)
+        if dups:
+            raise ValueError(f"join {label}: {dups} duplicate keys on the right for {right_on}")
+        if validate == "one_to_one":
+            dups = _duplicates(left, on)
+            if dups:
+                raise ValueError(f"join {label}: {dups} duplicate keys on the left for {on}")
+
+        values = right.set_index(right_on).sort_index()
+        if len(on) == 1:
+            keys = pd.Index(left[on[0]], name=right_on[0])
+        else:
+            keys = pd.MultiIndex.from_frame(left[on], names=right_on)
+        found = values.reindex(keys)
+        found.index = left.index
+
+        overlap = [c for c in found.columns if c in left.columns]
+        if overlap:
+            if rsuffix is None:
+                raise ValueError(f"join {label}: columns {overlap} on both sides; pass rsuffix")
+            found = found.rename(columns={c: c + rsuffix for c in overlap})
+
+        out = pd.concat([left, found], axis=1).reset_index(drop=True)
+        span.frame_out(out)
+    return out
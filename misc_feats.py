@@ -17,98 +17,48 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 
-def main() -> None:
-    ROOT = Path(__file__).resolve().parent
-    DATA = ROOT / "parquets"
-    OUT = ROOT / "model_artifacts_v2"
+from feature_specs import REGISTRY, add_features
+from joins import left_join
+from team_games import build_team_games, opponent_values
 
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    print(f"Starting misc features process at {ts}...")
+ROOT = Path(__file__).resolve().parent
+DATA = ROOT / "parquets"
+OUT = ROOT / "model_artifacts_v2"
+INPUT_FILE = DATA / "df_team_strength_goals.parquet"
 
-    # Get the data
-    df = pd.read_parquet(DATA / "df_team_strength_goals.parquet")
-    
-    df = df.sort_values(["player_id", "game_id"])
 
-    df["plr_roll5_toi"] = (
-        df.groupby("player_id")["toi_seconds"]
-        .transform(lambda s: s.shift(1).rolling(5).mean())
-    )
-
-    df["plr_roll10_toi"] = (
-        df.groupby("player_id")["toi_seconds"]
-        .transform(lambda s: s.shift(1).rolling(10).mean())
-    )
-    
+def transform(df: pd.DataFrame, team_games: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Team strength frame -> final model frame (stage 5 of the feature build). Team
+    and opponent PIM/shooting features are computed on the shared team-game table.
+    """
     df = df.sort_values(["player_id", "game_id"])
 
-    df["plr_roll5_pim"] = (
-        df.groupby("player_id")["pim"]
-        .transform(lambda s: s.shift(1).rolling(5).mean())
-    )
-
-    df["plr_roll10_pim"] = (
-        df.groupby("player_id")["pim"]
-        .transform(lambda s: s.shift(1).rolling(10).mean())
-    )
-
-    df["plr_avg_pim_pre"] = (
-        df.groupby("player_id")["pim"]
-        .transform(lambda s: s.shift(1).expanding().mean())
-    )
+    # Player rolling TOI and PIM (full 5/10-game windows) and career-to-date PIM
+    df = add_features(df, REGISTRY["player_career"])
     
-    # Build team-game table
-    team_game = (
-        df.groupby(["team", "season", "game_id"], as_index=False)["pim"]
-        .sum()
-        .rename(columns={"pim": "team_pim_game"})
-        .sort_values(["team", "game_id"])
+    # Team-game PIM from the shared team-game table
+    teams = team_games if team_games is not None else build_team_games(df)
+    team_game = teams[["season", "team_id", "game_id", "opponent_id", "team_pim"]].rename(
+        columns={"team_pim": "team_pim_game"}
     )
 
-    # Rolling + season-to-date (pre-game)
-    team_game["team_roll5_pim"] = (
-        team_game.groupby("team")["team_pim_game"]
-                .transform(lambda s: s.shift(1).rolling(5).mean())
-    )
+    # Rolling (full 5/10-game windows, across seasons) + season-to-date (pre-game)
+    team_game = add_features(team_game, REGISTRY["team_pim"])
+    team_pim_cols = ["team_pim_game", "team_roll5_pim", "team_roll10_pim", "team_season_avg_pre_pim"]
 
-    team_game["team_roll10_pim"] = (
-        team_game.groupby("team")["team_pim_game"]
-                .transform(lambda s: s.shift(1).rolling(10).mean())
-    )
-
-    team_game["team_season_avg_pre_pim"] = (
-        team_game.groupby(["team", "season"])["team_pim_game"]
-                .transform(lambda s: s.shift(1).expanding().mean())
-    )
+    # Opponent's values for the same game
+    opp_game = opponent_values(team_game, team_pim_cols)
+    opp_game.columns = ["opp_pim_game", "opp_roll5_pim", "opp_roll10_pim", "opp_season_avg_pre_pim"]
 
     # Merge back (include team_pim_game too)
-    df = df.merge(
-        team_game[[
-            "team", "season", "game_id",
-            "team_pim_game", "team_roll5_pim", "team_roll10_pim", "team_season_avg_pre_pim"
-        ]],
-        on=["team", "season", "game_id"],
-        how="left"
-    )
-
-    # Map opponent to opponent's team_pim_game for the same date/season
-    opp_game = team_game.rename(columns={
-        "team": "opponent",
-        "team_pim_game": "opp_pim_game",
-        "team_roll5_pim": "opp_roll5_pim",
-        "team_roll10_pim": "opp_roll10_pim",
-        "team_season_avg_pre_pim": "opp_season_avg_pre_pim",
-    })
-
-    df = df.merge(
-        opp_game[[
-            "opponent", "season", "game_id",
-            "opp_pim_game", "opp_roll5_pim", "opp_roll10_pim", "opp_season_avg_pre_pim"
-        ]],
-        on=["opponent", "season", "game_id"],
-        how="left"
+    df = left_join(
+        df,
+        pd.concat([team_game[["season", "team_id", "game_id"] + team_pim_cols], opp_game], axis=1),
+        on=["season", "team_id", "game_id"],
+        name="team/opponent PIM"
     )
     
     ROLL_WINDOWS = (5, 10)
@@ -121,115 +71,19 @@ def main() -> None:
         "team_blocks",
     ]
 
-    # --- Helper to compute rolling + avg (home/away subsets) ---
-    def compute_homeaway_rollings(df_, col):
-        df_ = df_.sort_values(["season", "team_id", "game_date"]).copy()
-        g = df_.groupby(["season", "team_id"])[col]
-
-        out = df_[["season", "team_id", "game_id"]].copy()
-        out[f"{col}_rolling_5"] = g.transform(lambda s: s.shift(1).rolling(5,  min_periods=1).mean())
-        out[f"{col}_rolling_10"] = g.transform(lambda s: s.shift(1).rolling(10, min_periods=1).mean())
-        out[f"{col}_avg"] = g.transform(lambda s: s.shift(1).expanding(min_periods=1).mean())
-        return out
-
-
     # -----------------------------
-    # 1) Build team-game table
+    # 1) Team-game table (shared across the feature build)
     # -----------------------------
-    team_games = (
-        df.groupby(
-            ["season", "team_id", "opponent_id", "game_id", "game_date", "is_home"],
-            as_index=False
-        )
-        .agg({
-            # already team-level -> take first (avoid double counting across players)
-            "team_shots": "first",
-            "team_shots_against": "first",
-
-            # derived from player sums
-            "shot_attempts_total": "sum",
-            "shot_attempts_blocked": "sum",
-            "shot_attempts_missed": "sum",
-            "blocked_shots": "sum",
-        })
-        .rename(columns={
-            "shot_attempts_total": "team_attempts",
-            "shot_attempts_blocked": "team_attempts_blocked",
-            "shot_attempts_missed": "team_attempts_missed",
-            "blocked_shots": "team_blocks",
-        })
-    )
-
-    # ensure clean sort
-    team_games = team_games.sort_values(["season", "team_id", "game_date"]).copy()
-    grouped = team_games.groupby(["season", "team_id"])
+    team_games = teams[["season", "team_id", "opponent_id", "game_id", "game_date", "is_home"] + team_cols]
 
     # -----------------------------
-    # 2) Overall rolling + season avg (pre-game)
+    # 2) Rolling + season avg (pre-game), overall and home/away -- feature_specs.TEAM_SHOOTING
     # -----------------------------
-    for col in team_cols:
-        team_games[f"{col}_rolling_5"] = (
-            grouped[col]
-            .rolling(5, min_periods=1).mean()
-            .reset_index(level=[0,1], drop=True)
-            .groupby([team_games["season"], team_games["team_id"]])
-            .shift(1)
-        )
-
-        team_games[f"{col}_rolling_10"] = (
-            grouped[col]
-            .rolling(10, min_periods=1).mean()
-            .reset_index(level=[0,1], drop=True)
-            .groupby([team_games["season"], team_games["team_id"]])
-            .shift(1)
-        )
-
-        team_games[f"{col}_avg"] = (
-            grouped[col]
-            .expanding().mean()
-            .reset_index(level=[0,1], drop=True)
-            .groupby([team_games["season"], team_games["team_id"]])
-            .shift(1)
-        )
+    team_games = team_games.sort_values(["season", "team_id", "game_date"])
+    team_games = add_features(team_games, REGISTRY["team_shooting"])
 
     # -----------------------------
-    # 3) Home / Away rollings (pre-game)
-    # -----------------------------
-    # NOTE: use == 1 / == 0 to avoid dtype surprises
-    home = team_games.query("is_home == 1").copy()
-    away = team_games.query("is_home == 0").copy()
-
-    for col in team_cols:
-        home_rolls = compute_homeaway_rollings(home, col).rename(columns={
-            f"{col}_rolling_5":  f"{col}_home_rolling_5",
-            f"{col}_rolling_10": f"{col}_home_rolling_10",
-            f"{col}_avg":        f"{col}_home_avg",
-        })
-
-        away_rolls = compute_homeaway_rollings(away, col).rename(columns={
-            f"{col}_rolling_5":  f"{col}_away_rolling_5",
-            f"{col}_rolling_10": f"{col}_away_rolling_10",
-            f"{col}_avg":        f"{col}_away_avg",
-        })
-
-        team_games = (
-            team_games
-            .merge(
-                home_rolls[["season","team_id","game_id",
-                            f"{col}_home_rolling_5", f"{col}_home_rolling_10", f"{col}_home_avg"]],
-                on=["season","team_id","game_id"],
-                how="left"
-            )
-            .merge(
-                away_rolls[["season","team_id","game_id",
-                            f"{col}_away_rolling_5", f"{col}_away_rolling_10", f"{col}_away_avg"]],
-                on=["season","team_id","game_id"],
-                how="left"
-            )
-        )
-
-    # -----------------------------
-    # 4) Opponent features (copy opponent's team-side rollings)
+    # 3) Opponent features (copy opponent's team-side rollings)
     # -----------------------------
     def generated_cols_for_metric(metric: str, windows=ROLL_WINDOWS):
         cols = [f"{metric}_avg"]
@@ -243,88 +97,25 @@ def main() -> None:
     for m in team_cols:
         team_feature_cols += generated_cols_for_metric(m)
 
-    opp_merge = (
-        team_games[["season", "game_id", "team_id"] + team_feature_cols]
-        .rename(columns={"team_id": "opponent_id"})
-        .rename(columns={c: c.replace("team_", "opp_") for c in team_feature_cols})
-    )
-
-    team_games = team_games.merge(
-        opp_merge,
-        on=["season", "game_id", "opponent_id"],
-        how="left"
-    )
-
     opp_feature_cols = [c.replace("team_", "opp_") for c in team_feature_cols]
+    opp_values = opponent_values(team_games, team_feature_cols)
+    opp_values.columns = opp_feature_cols
+    team_games = pd.concat([team_games, opp_values], axis=1)
 
     # -----------------------------
-    # 5) Merge back into player-level df
+    # 4) Merge back into player-level df
     # -----------------------------
-    df = df.merge(
+    df = left_join(
+        df,
         team_games[["season", "team_id", "game_id"] + team_feature_cols + opp_feature_cols],
         on=["season", "team_id", "game_id"],
-        how="left"
+        name="team/opponent shooting"
     )
 
-    WINDOWS = [3, 5, 7, 10] 
-
-    df = df.sort_values(["player_id", "season", "game_date"]).copy()
-
-    def add_roll_and_pre_avgs(df: pd.DataFrame, stat_col: str, prefix: str, windows=WINDOWS) -> pd.DataFrame:
-        """
-        Adds:
-        - {prefix}_roll{w}: overall rolling mean (shifted by 1)
-        - {prefix}_roll{w}_home / _away: home/away rolling mean (shifted by 1), then ffill within player-season
-        - {prefix}_pre_avg: overall season-to-date mean (shifted by 1)
-        - {prefix}_pre_avg_home / _away: home/away season-to-date mean (shifted by 1), then ffill within player-season
-        """
-        # overall rolling means
-        for w in windows:
-            df[f"{prefix}_roll{w}"] = (
-                df.groupby(["player_id", "season"], group_keys=False)[stat_col]
-                .apply(lambda s: s.shift(1).rolling(window=w, min_periods=1).mean())
-            )
-
-            # home/away rolling means (compute only on subset)
-            for loc_flag, loc_name in [(1, "home"), (0, "away")]:
-                col_split = f"{prefix}_roll{w}_{loc_name}"
-                df[col_split] = np.nan
-                mask = df["is_home"] == loc_flag
-                df.loc[mask, col_split] = (
-                    df.loc[mask]
-                    .groupby(["player_id", "season"], group_keys=False)[stat_col]
-                    .apply(lambda s: s.shift(1).rolling(window=w, min_periods=1).mean())
-                )
-
-        # overall season-to-date mean
-        df[f"{prefix}_pre_avg"] = (
-            df.groupby(["player_id", "season"], group_keys=False)[stat_col]
-            .apply(lambda s: s.shift(1).expanding(min_periods=1).mean())
-        )
-
-        # home/away season-to-date mean
-        for loc_flag, loc_name in [(1, "home"), (0, "away")]:
-            col = f"{prefix}_pre_avg_{loc_name}"
-            df[col] = np.nan
-            mask = df["is_home"] == loc_flag
-            df.loc[mask, col] = (
-                df.loc[mask]
-                .groupby(["player_id", "season"], group_keys=False)[stat_col]
-                .apply(lambda s: s.shift(1).expanding(min_periods=1).mean())
-            )
-
-        return df
-
-
-    # ------------------------------------------------------------
-    # 1) Raw-count features
-    # ------------------------------------------------------------
-    # rolling/season avg: attempts blocked, attempts missed
-    df = add_roll_and_pre_avgs(df, "shot_attempts_blocked", "plr_blk_att")
-    df = add_roll_and_pre_avgs(df, "shot_attempts_missed",  "plr_miss_att")
+    df = df.sort_values(["player_id", "season", "game_date"])
 
     # ------------------------------------------------------------
-    # 2) Rate features (per TOI, per shift)
+    # Rate features (per TOI, per shift)
     # ------------------------------------------------------------
     # Guard against divide-by-zero
     toi = df["toi_seconds"].replace(0, np.nan)
@@ -342,22 +133,18 @@ def main() -> None:
     rate_cols = ["shots_per_toi60", "att_per_toi60", "shots_per_shift", "att_per_shift"]
     df[rate_cols] = df[rate_cols].fillna(0)
 
-    # now add rolling + season-to-date (with home/away splits) for these rates
-    df = add_roll_and_pre_avgs(df, "shots_per_toi60", "plr_shots_per_toi60")
-    df = add_roll_and_pre_avgs(df, "att_per_toi60",   "plr_att_per_toi60")
-    df = add_roll_and_pre_avgs(df, "shots_per_shift", "plr_shots_per_shift")
-    df = add_roll_and_pre_avgs(df, "att_per_shift",   "plr_att_per_shift")
-
     # ------------------------------------------------------------
-    # 3) Home/away ffill and fill remaining NaNs with 0
+    # Player rolling + season-to-date averages (with home/away splits, forward-filled
+    # within player-season, then 0) of attempts blocked/missed and the rates above
+    # -- feature_specs.PLAYER_RATES
     # ------------------------------------------------------------
-    split_cols = [c for c in df.columns if c.endswith("_home") or c.endswith("_away")]
-    df[split_cols] = (
-        df.groupby(["player_id", "season"], group_keys=False)[split_cols]
-        .ffill()
-        .fillna(0)
-    )
+    df = add_features(df, REGISTRY["player_rates"])
+
+    return df
+
 
+def save_model_artifacts(df: pd.DataFrame) -> None:
+    """Write the model frame and each player's latest row to model_artifacts_v2."""
     player_latest = (
         df.sort_values(["player_id", "game_id"])
             .groupby("player_id", as_index=False)
@@ -372,6 +159,17 @@ def main() -> None:
     
     print(f"Saving df_model_v2.parquet at {ts}...")
     df.to_parquet(OUT / "df_model_v2.parquet", index=False)
+
+
+def main() -> None:
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     
+    print(f"Starting misc features process at {ts}...")
+
+    # Get the data
+    df = transform(pd.read_parquet(INPUT_FILE))
+    save_model_artifacts(df)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
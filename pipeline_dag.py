@@ -0,0 +1,281 @@
+# Small dependency-aware step runner for the daily pipeline.
+#
+# Each Step declares the artifacts it reads and writes (paths relative to the
+# repo root; globs allowed; {today} expands to YYYYMMDD, {date} to YYYY-MM-DD).
+# A step is skipped when the content hashes of its inputs match those recorded
+# on its last successful run and its outputs are still exactly what that run
+# wrote. Dependencies come from
+# the artifacts: a step depends on every earlier step whose outputs it reads.
+#
+# A step also waits for earlier steps that read what it writes or write the same
+# files, so the serial order's semantics hold when independent steps run
+# concurrently (workers > 1) in a process pool. Each parallel step's output is
+# buffered and printed as one block in declaration order. A failed step cancels
+# the steps downstream of it (transitively, through deps); independent branches
+# still run, and the run raises once everything else is done. A step marked
+# optional (e.g. betting lines) only logs its failure: its readers run on
+# whatever outputs exist and the run does not fail.
+#
+# State (per-step input/output fingerprints, plus a stat -> sha256 memo so
+# unchanged files aren't re-hashed) lives in .pipeline_state.json.
+import contextlib
+import fnmatch
+import hashlib
+import io
+import json
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parent
+STATE_FILE = ROOT / ".pipeline_state.json"
+
+
+@dataclass
+class Step:
+    name: str
+    func: Callable[[], None]
+    inputs: Sequence[str] = ()
+    outputs: Sequence[str] = ()
+    always: bool = False  # no hash-based skipping (e.g. steps with undeclared inputs)
+    optional: bool = False  # a failure is logged but cancels nothing and doesn't fail the run
+    deps: List[str] = field(default_factory=list)   # earlier steps whose outputs this step reads
+    waits: List[str] = field(default_factory=list)  # deps + steps that must finish first to keep serial order
+
+
+def ts() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def expand(patterns: Sequence[str], today: str) -> List[str]:
+    date = f"{today[:4]}-{today[4:6]}-{today[6:]}"
+    return [p.format(today=today, date=date) for p in patterns]
+
+
+def matches(patterns: Sequence[str]) -> List[Path]:
+    """Existing files for a list of (glob) patterns, sorted and de-duplicated."""
+    found = set()
+    for pattern in patterns:
+        if any(ch in pattern for ch in "*?["):
+            found.update(p for p in ROOT.glob(pattern) if p.is_file())
+        elif (ROOT / pattern).is_file():
+            found.add(ROOT / pattern)
+    return sorted(found)
+
+
+def _overlap(a: Sequence[str], b: Sequence[str]) -> bool:
+    return any(fnmatch.fnmatch(x, y) or fnmatch.fnmatch(y, x) for x in a for y in b)
+
+
+def link_dependencies(steps: Sequence[Step], today: str) -> None:
+    """Fill deps (read-after-write) and waits (also write-after-read / write-after-write) from artifacts."""
+    for i, step in enumerate(steps):
+        reads, writes = expand(step.inputs, today), expand(step.outputs, today)
+        step.deps, step.waits = [], []
+        for up in steps[:i]:
+            up_reads, up_writes = expand(up.inputs, today), expand(up.outputs, today)
+            if _overlap(up_writes, reads):
+                step.deps.append(up.name)
+            if _overlap(up_writes, reads) or _overlap(up_reads, writes) or _overlap(up_writes, writes):
+                step.waits.append(up.name)
+
+
+class Fingerprinter:
+    """sha256 per file, memoized on (size, mtime) across runs."""
+
+    def __init__(self, memo: Dict[str, list]):
+        self.memo = memo
+
+    def file(self, path: Path) -> str:
+        rel = path.relative_to(ROOT).as_posix()
+        st = path.stat()
+        cached = self.memo.get(rel)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with path.open("rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                h.update(chunk)
+        self.memo[rel] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def files(self, patterns: Sequence[str]) -> Dict[str, str]:
+        return {p.relative_to(ROOT).as_posix(): self.file(p) for p in matches(patterns)}
+
+
+def load_state() -> dict:
+    try:
+        return json.loads(STATE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict) -> None:
+    tmp = STATE_FILE.with_name(STATE_FILE.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    tmp.replace(STATE_FILE)
+
+
+def is_current(step: Step, record: Optional[dict], inputs: Dict[str, str], fp: Fingerprinter, today: str) -> bool:
+    """Same input hashes as the last run, and every output still exactly as that run left it."""
+    if step.always or not record or record.get("inputs") != inputs:
+        return False
+    outputs = expand(step.outputs, today)
+    return all(matches([o]) for o in outputs) and record.get("outputs") == fp.files(outputs)
+
+
+def _run_captured(run_step: Callable[[str, Callable], None], name: str, func: Callable[[], None]):
+    """Pool worker: run one step with its output buffered. Returns (log, error traceback or None)."""
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+        try:
+            run_step(name, func)
+            return buf.getvalue(), None
+        except BaseException:
+            return buf.getvalue(), traceback.format_exc()
+
+
+def run_dag(steps: Sequence[Step], run_step: Callable[[str, Callable], None],
+            from_step: Optional[str] = None, force: bool = False, workers: int = 1) -> Dict[str, str]:
+    """
+    Run steps, skipping current ones. from_step forces that step and every step
+    downstream of it to rerun. With workers > 1, steps whose predecessors are done
+    run concurrently in a process pool. Returns {step name: 'ran' | 'skipped' |
+    'failed' | 'cancelled'}; raises after the run if a non-optional step failed.
+    """
+    today = datetime.now().strftime("%Y%m%d")
+    link_dependencies(steps, today)
+    names = [s.name for s in steps]
+    if from_step is not None and from_step not in names:
+        raise ValueError(f"Unknown step {from_step!r}; steps are: {', '.join(names)}")
+
+    state = load_state()
+    fp = Fingerprinter(state.setdefault("files", {}))
+    records = state.setdefault("steps", {})
+
+    forced = set(names) if force else set()
+    if from_step is not None:
+        forced.add(from_step)
+    status: Dict[str, str] = {}
+    logs: Dict[str, str] = {}
+    printed = 0
+
+    def flush_logs():
+        # Print finished steps' output blocks in declaration order
+        nonlocal printed
+        while printed < len(steps) and steps[printed].name in logs:
+            text = logs[steps[printed].name]
+            if text:
+                print(text, end="" if text.endswith("\n") else "\n", flush=True)
+            printed += 1
+
+    def prepare(step: Step) -> Optional[Dict[str, str]]:
+        """Input fingerprint if the step must run, None if it is skipped."""
+        # Rerun downstream of anything forced; otherwise rely on input hashes
+        if any(d in forced for d in step.deps):
+            forced.add(step.name)
+        inputs = fp.files(expand(step.inputs, today))
+        if step.name not in forced and is_current(step, records.get(step.name), inputs, fp, today):
+            status[step.name] = "skipped"
+            logs[step.name] = f"[{ts()}] Skipping step: {step.name} (up to date)\n"
+            return None
+        return inputs
+
+    def record(step: Step, inputs: Dict[str, str]):
+        records[step.name] = {
+            "inputs": inputs,
+            "outputs": fp.files(expand(step.outputs, today)),
+            "ran_at": ts(),
+        }
+        save_state(state)
+        status[step.name] = "ran"
+
+    def blocked_by(step: Step) -> Optional[str]:
+        """The failed/cancelled non-optional step this one reads from, if any."""
+        for d in step.deps:
+            if status.get(d) == "cancelled" or (status.get(d) == "failed" and not by_name[d].optional):
+                return d
+        return None
+
+    def cancel(step: Step, upstream: str) -> None:
+        status[step.name] = "cancelled"
+        logs[step.name] = f"[{ts()}] Cancelled step: {step.name} (upstream step failed: {upstream})\n"
+
+    def failed(step: Step, error: str) -> None:
+        status[step.name] = "failed"
+        failures.append(step.name)
+        if step.optional:
+            error += f"[{ts()}] Optional step failed: {step.name} -- continuing\n"
+        logs[step.name] = logs.get(step.name, "") + error
+
+    by_name = {s.name: s for s in steps}
+    failures: List[str] = []
+    first_error: Optional[BaseException] = None
+
+    if workers <= 1:
+        for step in steps:
+            upstream = blocked_by(step)
+            if upstream is not None:
+                cancel(step, upstream)
+                flush_logs()
+                continue
+            inputs = prepare(step)
+            flush_logs()
+            if inputs is None:
+                continue
+            try:
+                run_step(step.name, step.func)
+            except Exception as e:
+                first_error = first_error or e
+                failed(step, "")
+                flush_logs()
+                continue
+            logs[step.name] = ""
+            printed += 1
+            record(step, inputs)
+    else:
+        pending = list(steps)
+        running = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while pending or running:
+                for step in list(pending):
+                    if len(running) >= workers:
+                        break
+                    if not all(w in status for w in step.waits):
+                        continue
+                    pending.remove(step)
+                    upstream = blocked_by(step)
+                    if upstream is not None:
+                        cancel(step, upstream)
+                        continue
+                    inputs = prepare(step)
+                    if inputs is not None:
+                        running[pool.submit(_run_captured, run_step, step.name, step.func)] = (step, inputs)
+                flush_logs()
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    step, inputs = running.pop(fut)
+                    log, error = fut.result()
+                    logs[step.name] = log
+                    if error is None:
+                        record(step, inputs)
+                    else:
+                        failed(step, error)
+                flush_logs()
+
+    fatal = [name for name in failures if not by_name[name].optional]
+    cancelled = [name for name, v in status.items() if v == "cancelled"]
+    ran = sum(v == "ran" for v in status.values())
+    print(f"[{ts()}] Pipeline done: {ran} ran, {sum(v == 'skipped' for v in status.values())} skipped, "
+          f"{len(failures)} failed, {len(cancelled)} cancelled.")
+    if fatal:
+        message = f"Pipeline step(s) failed: {', '.join(fatal)}"
+        if cancelled:
+            message += f" (cancelled downstream: {', '.join(cancelled)})"
+        raise RuntimeError(message) from first_error
+    return status
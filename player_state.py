@@ -0,0 +1,348 @@
+# Incremental per-player rolling state for the player-level shot features.
+#
+# feat_eng_player recomputes every "previous N games" stat over all of history so
+# that misc_feats can keep each player's last row for predict_today. This keeps
+# the same stats as compact per-player arrays instead:
+#   - a ring buffer of the last 10 games per stat, overall and per home/away split
+#   - season sums, non-NaN counts and threshold ("over") counts per split
+#   - the player's latest game, held back one game
+# Features describe the games *before* a row (shift(1)), so the latest game is
+# only pushed into the buffers when the player's next game arrives, and a split
+# keeps its own held-back game (the home/away columns are forward-filled from
+# the last game in that split). Applying a game is O(1) per player; a batch is
+# applied in rounds (k-th new game of every player at once), so building from
+# four seasons and applying yesterday's games share one code path.
+#
+# The state also records every (game_id, player_id) it has applied with a hash of
+# the row. update() applies the store's player-games not in that record; a late
+# game (dated before the player's latest applied game), a changed row (stat
+# correction) or a removed one can't be applied in order, so it rebuilds instead.
+#
+# snapshot() gives each player's feat_eng_player features as of their latest
+# game -- the same values as that player's row in player_latest_v2.parquet.
+#   python player_state.py build     # from the player store (data_collection/player_store)
+#   python player_state.py update    # apply player-games not yet applied
+#   python player_state.py verify    # compare with model_artifacts_v2/player_latest_v2.parquet
+import argparse
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_collection.player_store import player_games
+
+ROOT = Path(__file__).resolve().parent
+STATE_DIR = ROOT / "parquets" / "player_state"
+STATE_FILE = STATE_DIR / "state.npz"
+SNAPSHOT_FILE = STATE_DIR / "player_snapshot.parquet"
+LATEST_FILE = ROOT / "model_artifacts_v2" / "player_latest_v2.parquet"
+
+RING = 10
+WINDOWS = [3, 5, 7, 10]
+THRESHOLDS = [2, 3, 4]
+STREAMS = ["all", "home", "away"]
+# stat column -> (rolling column template, season-average column) as named by feat_eng_player
+STATS = {
+    "shots_on_goal": ("plr_roll{w}_shots", "plr_pre_avg_shots"),
+    "shot_attempts_total": ("plr_roll{w}_att", "plr_pre_avg_att"),
+    "pp_shots": ("plr_pp_shots_roll{w}", "plr_pp_shots_pre_avg"),
+    "pp_attempts_total": ("plr_pp_att_roll{w}", "plr_pp_att_pre_avg"),
+    "pk_shots": ("plr_pk_shots_roll{w}", "plr_pk_shots_pre_avg"),
+    "pk_attempts_total": ("plr_pk_att_roll{w}", "plr_pk_att_pre_avg"),
+}
+SHOTS = 0  # index of shots_on_goal in STATS -- the only stat with threshold features
+GAME_KEY = ["game_id", "player_id"]
+
+
+def ts() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+class PlayerState:
+    """Per-player ring buffers and season running totals, arrays indexed by player slot."""
+
+    def __init__(self, arrays: Optional[Dict[str, np.ndarray]] = None):
+        if arrays is None:
+            arrays = {**self._empty(0), **self._empty_applied()}
+        self.__dict__.update(arrays)
+        self.slot = {int(p): i for i, p in enumerate(self.player_id)}
+
+    @staticmethod
+    def _empty(n: int) -> Dict[str, np.ndarray]:
+        s, k, t = len(STATS), len(STREAMS), len(THRESHOLDS)
+        return {
+            "player_id": np.zeros(n, dtype=np.int64),
+            "season": np.zeros(n, dtype=np.int64),
+            "game_id": np.zeros(n, dtype=np.int64),
+            "game_date": np.zeros(n, dtype="datetime64[s]"),
+            "ring": np.full((s, k, n, RING), np.nan),
+            "pushed": np.zeros((k, n), dtype=np.int64),          # games in the buffer this season
+            "sums": np.zeros((s, k, n)),
+            "counts": np.zeros((s, k, n), dtype=np.int64),       # non-NaN values in the sums
+            "over": np.zeros((t, k, n), dtype=np.int64),         # season games with shots >= threshold
+            "pending": np.full((s, k, n), np.nan),               # held-back latest game per stream
+            "has_pending": np.zeros((k, n), dtype=bool),
+        }
+
+    @staticmethod
+    def _empty_applied() -> Dict[str, np.ndarray]:
+        return {
+            "applied_game_id": np.zeros(0, dtype=np.int64),
+            "applied_player_id": np.zeros(0, dtype=np.int64),
+            "applied_hash": np.zeros(0, dtype=np.uint64),
+        }
+
+    ARRAYS = ["player_id", "season", "game_id", "game_date", "ring", "pushed", "sums", "counts",
+              "over", "pending", "has_pending"]
+    AXIS = {"ring": 2, "pushed": 1, "sums": 2, "counts": 2, "over": 2, "pending": 2, "has_pending": 1}
+    APPLIED = ["applied_game_id", "applied_player_id", "applied_hash"]  # one entry per applied player-game
+
+    # --- persistence ---
+    @classmethod
+    def load(cls, path: Path = STATE_FILE) -> Optional["PlayerState"]:
+        """The saved state, or None if it predates the applied-games record (rebuild it)."""
+        with np.load(path) as data:
+            if not all(name in data for name in cls.APPLIED):
+                return None
+            return cls({name: data[name] for name in cls.ARRAYS + cls.APPLIED})
+
+    def save(self, path: Path = STATE_FILE) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez_compressed(tmp, **{name: getattr(self, name) for name in self.ARRAYS + self.APPLIED})
+        tmp.replace(path)
+
+    def applied(self) -> pd.DataFrame:
+        """(game_id, player_id, row_hash) of every player-game applied so far."""
+        return pd.DataFrame({"game_id": self.applied_game_id, "player_id": self.applied_player_id,
+                             "row_hash": self.applied_hash})
+
+    # --- updates ---
+    def _slots(self, player_ids: np.ndarray) -> np.ndarray:
+        new = [int(p) for p in pd.unique(player_ids) if int(p) not in self.slot]
+        if new:
+            grown = self._empty(len(new))
+            grown["player_id"][:] = new
+            for name in self.ARRAYS:
+                setattr(self, name, np.concatenate([getattr(self, name), grown[name]], axis=self.AXIS.get(name, 0)))
+            self.slot.update({p: len(self.slot) + i for i, p in enumerate(new)})
+        return np.array([self.slot[int(p)] for p in player_ids], dtype=np.int64)
+
+    def _push_pending(self, k: int, slots: np.ndarray) -> None:
+        """Move stream k's held-back game into its buffer and season totals."""
+        slots = slots[self.has_pending[k, slots]]
+        if not len(slots):
+            return
+        value = self.pending[:, k, slots]
+        self.ring[:, k, slots, self.pushed[k, slots] % RING] = value
+        self.sums[:, k, slots] += np.nan_to_num(value)
+        self.counts[:, k, slots] += ~np.isnan(value)
+        for t, thr in enumerate(THRESHOLDS):
+            self.over[t, k, slots] += value[SHOTS] >= thr
+        self.pushed[k, slots] += 1
+
+    def _apply_round(self, rows: pd.DataFrame) -> None:
+        """Apply at most one game per player."""
+        slots = self._slots(rows["player_id"].to_numpy())
+        season = rows["season"].to_numpy(dtype=np.int64)
+
+        # A new season starts every stream from scratch
+        reset = season != self.season[slots]
+        if reset.any():
+            r = slots[reset]
+            self.ring[:, :, r] = np.nan
+            self.pushed[:, r] = 0
+            self.sums[:, :, r] = 0
+            self.counts[:, :, r] = 0
+            self.over[:, :, r] = 0
+            self.pending[:, :, r] = np.nan
+            self.has_pending[:, r] = False
+
+        values = np.stack([rows[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in STATS])
+        is_home = rows["is_home"].to_numpy() == 1
+        for k, stream_rows in ((0, np.ones(len(rows), dtype=bool)), (1, is_home), (2, ~is_home)):
+            s = slots[stream_rows]
+            self._push_pending(k, s)
+            self.pending[:, k, s] = values[:, stream_rows]
+            self.has_pending[k, s] = True
+
+        self.season[slots] = season
+        self.game_id[slots] = rows["game_id"].to_numpy(dtype=np.int64)
+        self.game_date[slots] = rows["game_date"].to_numpy(dtype="datetime64[s]")
+
+    def apply(self, games: pd.DataFrame) -> int:
+        """
+        Apply player-games (from _read_games) in order, in rounds of one game per
+        player, and record them as applied. Returns games applied.
+        """
+        if games.empty:
+            return 0
+        self.applied_game_id = np.concatenate([self.applied_game_id, games["game_id"].to_numpy(dtype=np.int64)])
+        self.applied_player_id = np.concatenate([self.applied_player_id, games["player_id"].to_numpy(dtype=np.int64)])
+        self.applied_hash = np.concatenate([self.applied_hash, games["row_hash"].to_numpy(dtype=np.uint64)])
+        games = games.sort_values(["player_id", "season", "game_date"], kind="stable")
+        rnd = games.groupby("player_id", sort=False).cumcount().to_numpy()
+        order = np.argsort(rnd, kind="stable")
+        games, rnd = games.iloc[order], rnd[order]
+        bounds = np.searchsorted(rnd, np.arange(rnd[-1] + 2))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            self._apply_round(games.iloc[lo:hi])
+        return len(games)
+
+    # --- features ---
+    def snapshot(self) -> pd.DataFrame:
+        """Each player's feat_eng_player features as of their latest game."""
+        out = {"player_id": self.player_id, "season": self.season, "game_id": self.game_id,
+               "game_date": self.game_date}
+        recent = np.arange(RING)
+        for k, stream in enumerate(STREAMS):
+            # Buffer newest-first; slots beyond this season's games are invalid
+            order = (self.pushed[k][:, None] - 1 - recent) % RING
+            valid = recent[None, :] < self.pushed[k][:, None]
+            fill = None if stream == "all" else 0.0
+            for i, (stat, (roll_name, pre_name)) in enumerate(STATS.items()):
+                vals = np.where(valid, np.take_along_axis(self.ring[i, k], order, axis=1), np.nan)
+                suffix = "" if stream == "all" else f"_{stream}"
+                for w in WINDOWS:
+                    out[f"{roll_name.format(w=w)}{suffix}"] = _mean(vals[:, :w], fill)
+                out[f"{pre_name}{suffix}"] = _ratio(self.sums[i, k], self.counts[i, k], fill)
+
+                if i != SHOTS:
+                    continue
+                n_prior = self.pushed[k]
+                for t, thr in enumerate(THRESHOLDS):
+                    over = np.where(valid, vals >= thr, np.nan)  # NaN shots count as "not over", like astype(int)
+                    for w in WINDOWS:
+                        n_w = np.minimum(n_prior, w)
+                        total = np.where(n_w > 0, np.nansum(over[:, :w], axis=1), np.nan)
+                        if stream == "all":
+                            out[f"plr_roll{w}_over{thr}_shots_mean"] = _ratio(total, n_w, None)
+                            out[f"plr_roll{w}_over{thr}_shots"] = total
+                        else:
+                            out[f"plr_roll{w}_over{thr}_shots{suffix}"] = np.nan_to_num(total)
+                    pre_over = np.where(n_prior > 0, self.over[t, k], np.nan)
+                    out[f"plr_pre_over{thr}_shots{suffix}"] = pre_over if stream == "all" else np.nan_to_num(pre_over)
+
+        df = pd.DataFrame(out)
+        # feat_eng_player fills every remaining special-teams NaN with 0
+        special = [c for c in df.columns if c.startswith("plr_pp_") or c.startswith("plr_pk_")]
+        df[special] = df[special].fillna(0)
+        return df
+
+
+def _ratio(total: np.ndarray, count: np.ndarray, fill) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(count > 0, total / count, np.nan)
+    return out if fill is None else np.nan_to_num(out, nan=fill)
+
+
+def _mean(window: np.ndarray, fill) -> np.ndarray:
+    count = (~np.isnan(window)).sum(axis=1)
+    return _ratio(np.nansum(window, axis=1), count, fill)
+
+
+def _read_games() -> pd.DataFrame:
+    """The state's columns of every player-game in the store, with a hash of each row."""
+    columns = ["player_id", "season", "game_id", "game_date", "is_home", *STATS]
+    games = player_games(columns=columns)
+    games["row_hash"] = pd.util.hash_pandas_object(games[columns], index=False).to_numpy()
+    return games
+
+
+def _pending(state: PlayerState, games: pd.DataFrame):
+    """
+    The player-games in `games` the state hasn't applied, or None with the reason
+    when they can't be applied on top of it (the state has to be rebuilt).
+    """
+    both = games[[*GAME_KEY, "row_hash"]].merge(state.applied(), on=GAME_KEY, how="outer",
+                                                suffixes=("", "_applied"), indicator=True)
+    changed = int(((both["_merge"] == "both") & (both["row_hash"] != both["row_hash_applied"])).sum())
+    removed = int((both["_merge"] == "right_only").sum())
+    if changed or removed:
+        return None, f"{changed} applied player-games changed, {removed} removed"
+
+    is_new = (both["_merge"] == "left_only").to_numpy()
+    new = games.merge(both.loc[is_new, GAME_KEY], on=GAME_KEY)
+    known = new["player_id"].map(state.slot)
+    seen = known.notna().to_numpy()
+    latest = state.game_date[known[seen].astype(np.int64).to_numpy()]
+    late = int((new.loc[seen, "game_date"].to_numpy(dtype="datetime64[s]") <= latest).sum())
+    if late:
+        return None, f"{late} new player-games predate their player's latest applied game"
+    return new, None
+
+
+def build(games: Optional[pd.DataFrame] = None) -> PlayerState:
+    """Rebuild the state from every player-game in the player store."""
+    state = PlayerState()
+    n = state.apply(_read_games() if games is None else games)
+    state.save()
+    state.snapshot().to_parquet(SNAPSHOT_FILE, index=False)
+    print(f"[{ts()}] Built player state from {n} player-games ({len(state.player_id)} players) → {STATE_FILE}")
+    return state
+
+
+def update() -> PlayerState:
+    """
+    Apply the store's player-games the state hasn't applied yet. Builds the state
+    if it is missing, and rebuilds it when those games can't be applied in order.
+    """
+    state = PlayerState.load() if STATE_FILE.exists() else None
+    games = _read_games()
+    if state is None:
+        return build(games)
+    new, reason = _pending(state, games)
+    if new is None:
+        print(f"[{ts()}] Rebuilding player state: {reason}")
+        return build(games)
+    n = state.apply(new)
+    state.save()
+    state.snapshot().to_parquet(SNAPSHOT_FILE, index=False)
+    print(f"[{ts()}] Applied {n} new player-games to player state → {SNAPSHOT_FILE}")
+    return state
+
+
+def verify(rtol: float = 1e-6) -> bool:
+    """
+    Compare the snapshot with each player's row in player_latest_v2.parquet (whose
+    features the feature build stores as float32, hence the tolerance).
+    """
+    state = PlayerState.load()
+    if state is None:
+        raise SystemExit(f"{STATE_FILE} predates the applied-games record -- run: python player_state.py build")
+    snap = state.snapshot()
+    latest = pd.read_parquet(LATEST_FILE)
+    cols = [c for c in snap.columns if c in latest.columns and c not in ("player_id", "season", "game_date")]
+    both = snap.merge(latest[["player_id", *cols]], on="player_id", suffixes=("", "_latest"))
+    bad = {}
+    for c in cols:
+        a, b = both[c].to_numpy(dtype=np.float64), both[f"{c}_latest"].to_numpy(dtype=np.float64)
+        n = int((~np.isclose(a, b, rtol=rtol, atol=0, equal_nan=True)).sum())
+        if n:
+            bad[c] = n
+    print(f"[{ts()}] Compared {len(cols)} columns for {len(both)} players: "
+          + ("all match" if not bad else f"mismatches {json.dumps(bad)}"))
+    return not bad
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Incremental per-player rolling state")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build", help="rebuild from the player store")
+    sub.add_parser("update", help="apply player-games not yet applied")
+    sub.add_parser("verify", help="compare the snapshot with player_latest_v2.parquet")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        build()
+    elif args.cmd == "update":
+        update()
+    elif args.cmd == "verify":
+        raise SystemExit(0 if verify() else 1)
+
+
+if __name__ == "__main__":
+    main()
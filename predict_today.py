@@ -5,6 +5,8 @@ import joblib
 from pathlib import Path
 from datetime import datetime
 
+from instrumentation import frame_in, frame_out
+
 def main() -> None:
     ROOT = Path(__file__).resolve().parent
     ART_DIR = Path(ROOT / "model_artifacts_v2") 
@@ -24,6 +26,7 @@ def main() -> None:
     }
 
     player_latest = pd.read_parquet(ART_DIR / "player_latest_v2.parquet")
+    frame_in(player_latest)
 
     # --- Load slate ---
     games_raw = pd.read_csv(SLATE_CSV)
@@ -118,6 +121,7 @@ def main() -> None:
                 "p_ge2","p_ge3","p_ge4","p_ge5"]
     out = tonight[out_cols].copy()
     out.to_csv(out_path, index=False)
+    frame_out(out)
 
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     print(f"[{ts}] Today's prediction process complete. Predictions saved to {out_path}")
@@ -3,6 +3,9 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from data_collection.player_store import player_games
+from instrumentation import frame_in, frame_out
+
 def main() -> None:
     ROOT = Path(__file__).resolve().parent
     PRED_DIR = Path(ROOT / "predictions")
@@ -12,20 +15,12 @@ def main() -> None:
     print(f"[{ts}] Starting tracking of prediction results...")
     
     
-    update_box_df = pd.read_csv(ROOT / "data_collection/update_box.csv")
-    update_pbp_df = pd.read_csv(ROOT / "data_collection/update_pbp.csv")
-
-    # Merge PBP and box
-    df = pd.merge(
-        update_box_df,
-        update_pbp_df,
-        on=["season", "game_id", "team_id", "player_id"],
-        how="inner"
-    )
+    df = player_games(columns=["game_id", "player_id", "player_name", "team", "shots_on_goal"])
 
     pred_files = list(PRED_DIR.glob("preds_*.csv"))
     pred_dfs = [pd.read_csv(f) for f in pred_files]
     predictions = pd.concat(pred_dfs, ignore_index=True)
+    frame_in(predictions)
     
     actuals = (
         df[["game_id", "player_id", "player_name", "team", "shots_on_goal"]]
@@ -33,7 +28,7 @@ def main() -> None:
     )
 
     # Normalize ids/types 
-    actuals["game_id"] = pd.to_numeric(actuals["game_id"], errors="coerce").astype("Int64")
+    actuals["game_id"] = actuals["game_id"].astype("Int64")
     predictions["game_id"] = pd.to_numeric(predictions["game_id"], errors="coerce").astype("Int64")
 
     pred_eval = predictions.merge(
@@ -160,6 +155,7 @@ def main() -> None:
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
     results.to_csv(OUT_PATH, index=False)
+    frame_out(results)
 
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     print(f"[{ts}] Prediction results tracking complete.")
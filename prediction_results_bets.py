@@ -3,6 +3,9 @@ import pandas as pd
 from pathlib import Path
 import numpy as np
 
+from data_collection.player_store import player_games
+from instrumentation import frame_in, frame_out
+
 def main() -> None:
     ROOT = Path(__file__).resolve().parent
     PRED_DIR = Path(ROOT / "predictions")
@@ -12,17 +15,8 @@ def main() -> None:
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     print(f"[{ts}] Starting tracking of betting results...")
     
-    update_box_df = pd.read_csv(ROOT / "data_collection/update_box.csv")
-    update_pbp_df = pd.read_csv(ROOT / "data_collection/update_pbp.csv")
-
-    # Merge PBP and box
-    df = pd.merge(
-        update_box_df,
-        update_pbp_df,
-        on=["season", "game_id", "team_id", "player_id"],
-        how="inner"
-    )
-    
+    df = player_games(columns=["game_id", "player_id", "player_name", "team", "shots_on_goal"])
+
     pred_files = list(PRED_DIR.glob("preds_*.csv"))
     pred_dfs = [pd.read_csv(f) for f in pred_files]
     predictions = pd.concat(pred_dfs, ignore_index=True)
@@ -30,6 +24,7 @@ def main() -> None:
     bet_files = list(BETS_DIR.glob("suggested_bets_full_*.csv"))
     bet_dfs = [pd.read_csv(f) for f in bet_files]
     bets = pd.concat(bet_dfs, ignore_index=True)
+    frame_in(bets)
     
     actuals = (
         df[["game_id", "player_id", "player_name", "team", "shots_on_goal"]]
@@ -264,6 +259,7 @@ def main() -> None:
 
 
     full_bet_eval.to_csv(OUT / "full_bet_eval.csv", index=False)
+    frame_out(full_bet_eval)
     
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     print(f"[{ts}] Betting results tracking complete.")
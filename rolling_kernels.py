@@ -0,0 +1,107 @@
+# Vectorized "previous games" kernels for grouped rolling/expanding features.
+#
+# Replaces groupby(...).transform(lambda s: s.shift(1).rolling(w, min_periods=1).mean())
+# and the matching .expanding() form, which run one Python lambda per group per
+# window. Rows must already be sorted so each group is contiguous (e.g. by
+# player_id, season, game_date). Each row's window over its group's previous
+# rows is then a slice [lo, i) of the frame, and its sum/count come from the
+# difference of two within-group cumulative sums -- every window in one pass, no
+# Python loop over groups.
+#
+# NaNs are skipped like pandas does (min_periods counts non-NaN values). For
+# integer-valued inputs (counts, 0/1 indicators) the cumulative sums are exact,
+# so results are bit-for-bit what pandas returns; for arbitrary floats they can
+# differ from pandas' online algorithm by float rounding.
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def group_starts(df: pd.DataFrame, by: Sequence[str]) -> np.ndarray:
+    """Per row, the position of the first row of its (contiguous) group."""
+    n = len(df)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    new_group = np.zeros(n, dtype=bool)
+    new_group[0] = True
+    for col in by:
+        keys = df[col].to_numpy()
+        new_group[1:] |= keys[1:] != keys[:-1]
+    first = np.flatnonzero(new_group)
+    return np.repeat(first, np.diff(np.append(first, n)))
+
+
+def prefix_sums(values, starts: np.ndarray) -> tuple:
+    """
+    Per row, the sum and non-NaN count of the earlier values in its group. Sums
+    restart at each group, so float rounding stays relative to the group's own
+    totals rather than the whole frame's.
+    """
+    v = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(v)
+    filled = np.where(valid, v, 0.0)
+    running = pd.Series(filled).groupby(starts, sort=False).cumsum().to_numpy()
+    idx = np.arange(len(v))
+    first = idx == starts
+    sums = np.where(first, 0.0, running[idx - 1])
+    counts = np.cumsum(valid) - valid
+    counts = counts - counts[starts]
+    return sums, counts
+
+
+def _finish(total: np.ndarray, count: np.ndarray, stat: str, min_periods: int) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = total / count if stat == "mean" else total.astype(np.float64)
+    return np.where(count >= min_periods, out, np.nan)
+
+
+def shifted_rolling(values, starts: np.ndarray, windows: Iterable[int], stat: str = "mean",
+                    min_periods: Optional[int] = 1, prefix: Optional[tuple] = None) -> Dict[int, np.ndarray]:
+    """
+    Per window w, the stat ('mean' | 'sum' | 'count') of each row's previous w
+    values in its group -- s.shift(1).rolling(w, min_periods).<stat>() per group.
+    min_periods=None means the full window (pandas' default). `prefix` reuses a
+    prefix_sums(values, starts) result across calls on the same values.
+    """
+    sums, counts = prefix if prefix is not None else prefix_sums(values, starts)
+    idx = np.arange(len(starts))
+    out = {}
+    for w in windows:
+        lo = np.maximum(idx - w, starts)
+        count = counts[idx] - counts[lo]
+        if stat == "count":
+            out[w] = count.astype(np.float64)
+        else:
+            out[w] = _finish(sums[idx] - sums[lo], count, stat, w if min_periods is None else min_periods)
+    return out
+
+
+def shifted_expanding(values, starts: np.ndarray, stat: str = "mean", min_periods: int = 1,
+                      prefix: Optional[tuple] = None) -> np.ndarray:
+    """Stat of all previous values in the group -- s.shift(1).expanding(min_periods).<stat>()."""
+    sums, counts = prefix if prefix is not None else prefix_sums(values, starts)
+    if stat == "count":
+        return counts.astype(np.float64)
+    return _finish(sums, counts, stat, min_periods)
+
+
+def grouped_rolling(df: pd.DataFrame, by: Sequence[str], col, windows: Iterable[int],
+                    stat: str = "mean") -> Dict[int, pd.Series]:
+    """shifted_rolling over df's groups, as Series aligned to df.index. `col` is a column name or array."""
+    values = df[col].to_numpy(dtype=np.float64, na_value=np.nan) if isinstance(col, str) else col
+    res = shifted_rolling(values, group_starts(df, by), windows, stat)
+    return {w: pd.Series(arr, index=df.index) for w, arr in res.items()}
+
+
+def grouped_expanding(df: pd.DataFrame, by: Sequence[str], col, stat: str = "mean") -> pd.Series:
+    """shifted_expanding over df's groups, as a Series aligned to df.index."""
+    values = df[col].to_numpy(dtype=np.float64, na_value=np.nan) if isinstance(col, str) else col
+    return pd.Series(shifted_expanding(values, group_starts(df, by), stat), index=df.index)
+
+
+def forward_fill(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """NaNs replaced by the last non-NaN value earlier in the same group -- groupby(...).ffill()."""
+    idx = np.arange(len(values))
+    last = np.maximum.accumulate(np.where(np.isnan(values), -1, idx))
+    return np.where(last >= starts, values[np.maximum(last, 0)], np.nan)
@@ -1,49 +1,88 @@
 from datetime import datetime
+import argparse
 import traceback
-import time
 
 from new_data import main as new_data
-from encode_categorical import main as encode_categorical
-from feat_eng_player import main as feature_engineering_player
-from team_strength_wins import main as team_strength_wins
-from team_strength_goals import main as team_strength_goals
-from misc_feats import main as misc_feats
+from feature_pipeline import main as feature_build
 from predict_today import main as predict_today
 from suggest_bets import main as suggest_bets
 from prediction_results_bets import main as prediction_results_bets
 from prediction_results_all import main as prediction_results_all
 from export_dashboard_parquets import main as export_dashboard_parquets
 from preprocess_data import preprocess_data as preprocess_data
+from pipeline_dag import Step, run_dag
+from instrumentation import start_run, timer
 
 def ts() -> str:
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
 def run_step(name: str, func) -> None:
     print(f"[{ts()}] Starting step: {name}...")
-    start = time.time()
     try:
-        func()
-        duration = time.time() - start
-        print(f"[{ts()}] Completed step: {name} ({duration:.2f}s).")
+        # Wall/CPU time, peak RSS, I/O and frame sizes go to the run ledger
+        with timer(name) as span:
+            func()
+        print(f"[{ts()}] Completed step: {name} ({span.wall_s:.2f}s, cpu {span.cpu_s:.2f}s, "
+              f"peak RSS {span.peak_rss_mb} MB).")
     except Exception:
         print(f"[{ts()}] ERROR in step: {name}")
         traceback.print_exc()
         raise
     
     
-def main() -> None:
-    run_step("New Data Collection", new_data)
-    run_step("Categorical Encoding", encode_categorical)
-    run_step("Feature Engineering - Player", feature_engineering_player)
-    run_step("Team Strength - Wins", team_strength_wins)
-    run_step("Team Strength - Goals", team_strength_goals)
-    run_step("Miscellaneous Features", misc_feats)
-    run_step("Prediction Results - All", prediction_results_all)
-    run_step("Prediction Results - Bets", prediction_results_bets)
-    run_step("Today's Predictions", predict_today)
-    run_step("Suggest Bets", suggest_bets)
-    run_step("Export Dashboard Parquets", export_dashboard_parquets)
-    run_step("Preprocess Data for Dashboard", preprocess_data)
-    
+PARSED = ["data_collection/update_box/*.parquet", "data_collection/update_pbp/*.parquet",
+          "data_collection/2022-2026_box.*", "data_collection/2022-2026_pbp.*"]
+# The player-game table: compacted base plus one delta per ingest (data_collection/player_store)
+PLAYER_STORE = ["parquets/player_store/base.parquet", "parquets/player_store/deltas/*.parquet"]
+EVAL_FILES = ["eval_outputs/prediction_eval_summary.csv", "eval_outputs/betting_eval_summary.csv",
+              "eval_outputs/full_bet_eval.csv"]
+
+# Steps in run order, with the artifacts each reads and writes
+STEPS = [
+    Step("New Data Collection", new_data, PARSED, PLAYER_STORE),
+    # encode_categorical -> feat_eng_player -> team_strength_wins/goals -> misc_feats, in memory
+    Step("Feature Build", feature_build,
+         PLAYER_STORE,
+         ["model_artifacts_v2/player_latest_v2.parquet", "model_artifacts_v2/df_model_v2.parquet"]),
+    Step("Prediction Results - All", prediction_results_all,
+         [*PLAYER_STORE, "predictions/preds_*.csv"],
+         ["eval_outputs/prediction_eval_summary.csv"]),
+    Step("Prediction Results - Bets", prediction_results_bets,
+         [*PLAYER_STORE, "predictions/preds_*.csv", "suggested_bets/suggested_bets_full_*.csv"],
+         ["eval_outputs/advanced_over_results.csv", "eval_outputs/advanced_under_results.csv",
+          "eval_outputs/full_bet_eval.csv", "eval_outputs/betting_eval_summary.csv"]),
+    Step("Today's Predictions", predict_today,
+         ["model_artifacts_v2/player_latest_v2.parquet", "model_artifacts_v2/feature_cols.json",
+          "model_artifacts_v2/cal_lgbm_p_ge_*.joblib", "data_collection/todays_games.csv"],
+         ["predictions/preds_{today}.csv"]),
+    # Optional: without today's lines (odds API outage) only the bet suggestions are missing
+    Step("Suggest Bets", suggest_bets,
+         ["predictions/preds_{today}.csv", "betting_lines/betting_lines_{today}.csv"],
+         ["suggested_bets/suggested_bets_full_{today}.csv"], optional=True),
+    Step("Export Dashboard Parquets", export_dashboard_parquets,
+         ["predictions/*.csv", "suggested_bets/*.csv", *EVAL_FILES],
+         ["dashboard_data/latest/predictions.parquet", "dashboard_data/latest/suggested_bets.parquet",
+          "dashboard_data/history/{date}/predictions.parquet"]),
+    Step("Preprocess Data for Dashboard", preprocess_data,
+         PLAYER_STORE, ["dashboard_data/latest/processed_player_data.parquet"]),
+]
+
+
+DEFAULT_WORKERS = 3
+
+
+def main(from_step: str = None, force: bool = False, workers: int = DEFAULT_WORKERS) -> None:
+    """Run the pipeline, skipping steps whose inputs haven't changed and running independent ones in parallel."""
+    start_run("daily_pipeline")
+    run_dag(STEPS, run_step, from_step=from_step, force=force, workers=workers)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Daily modeling pipeline")
+    parser.add_argument("--from", dest="from_step", choices=[s.name for s in STEPS],
+                        help="rerun this step and everything downstream of it")
+    parser.add_argument("--force", action="store_true", help="rerun every step")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="steps run at the same time (1 = one after another)")
+    args = parser.parse_args()
+    main(from_step=args.from_step, force=args.force, workers=args.workers)
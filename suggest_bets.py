@@ -5,6 +5,8 @@ import numpy as np
 from pathlib import Path
 from datetime import datetime
 
+from instrumentation import frame_in, frame_out
+
 def main() -> None:
     ROOT = Path(__file__).resolve().parent
     
@@ -21,6 +23,7 @@ def main() -> None:
     
     line_file = LINES_DIR/f"betting_lines_{today_str}.csv"
     betting_lines = pd.read_csv(line_file)
+    frame_in(predictions)
 
     predictions = predictions[predictions["player_id"] != 8483678]  # Ignore Elias Pettersson the Defenseman
     merged = predictions.merge(
@@ -262,6 +265,7 @@ def main() -> None:
     today_str = datetime.now().strftime("%Y%m%d")
     out_path = f"{OUT}/suggested_bets_full_{today_str}.csv"
     final.to_csv(out_path, index=False)
+    frame_out(final)
     
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     print(f"Suggest bets process complete at {ts}. Data saved to {out_path}")
@@ -10,89 +10,47 @@
 
 
 import pandas as pd
-import numpy as np
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 
-def main() -> None:
-    ROOT = Path(__file__).resolve().parent
-    OUT = ROOT / "parquets"
+from feature_specs import REGISTRY, add_features
+from joins import left_join
+from team_games import build_team_games
 
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    print(f"Starting team strength goals process at {ts}...")
+ROOT = Path(__file__).resolve().parent
+OUT = ROOT / "parquets"
+INPUT_FILE = OUT / "df_team_strength_wins_rest.parquet"
+OUTPUT_FILE = OUT / "df_team_strength_goals.parquet"
 
-    # Get the data
-    df = pd.read_parquet(OUT / "df_team_strength_wins_rest.parquet")
-    
-    # Rolling and season average goals for and against
 
-    # Collapse to one row per team per game
-    team_games = (
-        df.groupby(["season", "team_id", "opponent_id", "game_id", "game_date", "is_home"], as_index=False)
-        .agg({
-            "team_goals": "first",
-            "team_goals_against": "first",
-        })
-    )
+def transform(df: pd.DataFrame, team_games: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Win/rest features -> team/opponent goal strength (stage 4 of the feature build),
+    computed on the shared team-game table.
+    """
+    # Rolling and season average goals for and against
 
-    # Sort and group for rolling stats
-    team_games = team_games.sort_values(["season", "team_id", "game_date"])
-    grouped = team_games.groupby(["season", "team_id"])
+    # One row per team per game
+    if team_games is None:
+        team_games = build_team_games(df)
+    team_games = team_games[
+        ["season", "team_id", "opponent_id", "game_id", "game_date", "is_home", "team_goals", "team_goals_against"]
+    ].copy()
 
-    # Rolling averages and season averages
-    team_games["team_goals_rolling_5"] = (
-        grouped["team_goals"]
-        .rolling(5, min_periods=1)
-        .mean()
-        .reset_index(level=[0,1], drop=True)
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
-    )
-    team_games["team_goals_rolling_10"] = (
-        grouped["team_goals"]
-        .rolling(10, min_periods=1)
-        .mean()
-        .reset_index(level=[0,1], drop=True)
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
-    )
-    team_games["team_goals_avg"] = (
-        grouped["team_goals"]
-        .expanding()
-        .mean()
-        .reset_index(level=[0,1], drop=True)
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
+    # Per-game differential
+    team_games["team_goal_diff"] = (
+        team_games["team_goals"] - team_games["team_goals_against"]
     )
 
-    team_games["team_goals_against_rolling_5"] = (
-        grouped["team_goals_against"]
-        .rolling(5, min_periods=1)
-        .mean()
-        .reset_index(level=[0,1], drop=True)
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
-    )
-    team_games["team_goals_against_rolling_10"] = (
-        grouped["team_goals_against"]
-        .rolling(10, min_periods=1)
-        .mean()
-        .reset_index(level=[0,1], drop=True)
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
-    )
-    team_games["team_goals_against_avg"] = (
-        grouped["team_goals_against"]
-        .expanding()
-        .mean()
-        .reset_index(level=[0,1], drop=True)
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
-    )
+    # Rolling (5, 10) and season averages of goals for, against and differential, overall
+    # and home/away, plus cumulative goals pre-game -- all shifted by 1 (feature_specs.TEAM_GOALS)
+    team_games = team_games.sort_values(["season", "team_id", "game_date"])
+    team_games = add_features(team_games, REGISTRY["team_goals"])
 
     # Merge back into player-level df
-    df = df.merge(
+    df = left_join(
+        df,
         team_games[
             [
                 "season", "team_id", "game_id",
@@ -101,56 +59,9 @@ def main() -> None:
             ]
         ],
         on=["season", "team_id", "game_id"],
-        how="left"
-    )
-
-
-    # Rolling and season average team goal differential
-    # Compute per-game differential
-    team_games["team_goal_diff"] = (
-        team_games["team_goals"] - team_games["team_goals_against"]
-    )
-
-    # Rolling and season averages (shifted by 1)
-    grouped = team_games.groupby(["season", "team_id"])
-
-    team_games["team_goal_diff_rolling_5"] = (
-        grouped["team_goal_diff"]
-        .rolling(5, min_periods=1)
-        .mean()
-        .reset_index(level=[0,1], drop=True)
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
-    )
-
-    team_games["team_goal_diff_rolling_10"] = (
-        grouped["team_goal_diff"]
-        .rolling(10, min_periods=1)
-        .mean()
-        .reset_index(level=[0,1], drop=True)
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
+        name="team goals"
     )
 
-    team_games["team_goal_diff_avg"] = (
-        grouped["team_goal_diff"]
-        .expanding()
-        .mean()
-        .reset_index(level=[0,1], drop=True)
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
-    )
-
-    team_games["team_goals_cumulative_pre"] = (
-        grouped["team_goals"].cumsum()
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
-    )
-    team_games["team_goals_against_cumulative_pre"] = (
-        grouped["team_goals_against"].cumsum()
-        .groupby([team_games["season"], team_games["team_id"]])
-        .shift(1)
-    )
 
     # Opponent rolling goals and season average
     # Create opponent dataframe
@@ -183,11 +94,13 @@ def main() -> None:
     )
 
     # Merge back to main team_games on opponent_id
-    team_games = team_games.merge(
+    team_games = left_join(
+        team_games,
         opp_merge,
         on=["season", "game_id", "opponent_id"],
-        how="left",
-        suffixes=("", "_opp")
+        validate="one_to_one",
+        rsuffix="_opp",
+        name="opponent goals"
     )
 
     cols_to_merge = [
@@ -200,89 +113,14 @@ def main() -> None:
         "opp_goals_cumulative", "opp_goals_against_cumulative"
     ]
 
-    df = df.merge(
+    df = left_join(
+        df,
         team_games[cols_to_merge],
         on=["season", "team_id", "game_id"],
-        how="left"
+        name="team/opponent goal form"
     )
     
     
-    # Ensure clean sorting
-    team_games = team_games.sort_values(["season", "team_id", "game_date"]).copy()
-
-    # Helper for rolling features
-    def compute_homeaway_rollings(df_, col):
-        df_ = df_.sort_values(["season", "team_id", "game_date"]).copy()
-        g = df_.groupby(["season", "team_id"])[col]
-
-        out = df_[["season", "team_id", "game_id"]].copy()
-        out[f"{col}_rolling_5"]  = g.transform(lambda s: s.shift(1).rolling(5,  min_periods=1).mean())
-        out[f"{col}_rolling_10"] = g.transform(lambda s: s.shift(1).rolling(10, min_periods=1).mean())
-        out[f"{col}_avg"]        = g.transform(lambda s: s.shift(1).expanding(min_periods=1).mean())
-        return out
-
-
-    # Compute for home and away separately
-    home = team_games.query("is_home == 1").copy()
-    away = team_games.query("is_home == 0").copy()
-
-    home_rolls = compute_homeaway_rollings(home, "team_goals")
-    away_rolls = compute_homeaway_rollings(away, "team_goals")
-
-    # Rename columns to indicate context
-    home_rolls = home_rolls.rename(columns={
-        "team_goals_rolling_5": "team_goals_home_rolling_5",
-        "team_goals_rolling_10": "team_goals_home_rolling_10",
-        "team_goals_avg": "team_goals_home_avg",
-    })
-    away_rolls = away_rolls.rename(columns={
-        "team_goals_rolling_5": "team_goals_away_rolling_5",
-        "team_goals_rolling_10": "team_goals_away_rolling_10",
-        "team_goals_avg": "team_goals_away_avg",
-    })
-
-    # Merge back
-    team_games = (
-        team_games
-        .merge(home_rolls[["season", "team_id", "game_id",
-                        "team_goals_home_rolling_5", "team_goals_home_rolling_10", "team_goals_home_avg"]],
-            on=["season", "team_id", "game_id"], how="left")
-        .merge(away_rolls[["season", "team_id", "game_id",
-                        "team_goals_away_rolling_5", "team_goals_away_rolling_10", "team_goals_away_avg"]],
-            on=["season", "team_id", "game_id"], how="left")
-    )
-
-    # --- Ensure correct ordering ---
-    team_games = team_games.sort_values(["season", "team_id", "game_date"]).copy()
-    
-    # --- Master loop over each metric ---
-    for col in ["team_goals_against", "team_goal_diff"]:
-
-        # HOME subset
-        home = team_games.query("is_home == True").copy()
-        home_rolls = compute_homeaway_rollings(home, col)
-        home_rolls = home_rolls.rename(columns={
-            f"{col}_rolling_5":  f"{col}_home_rolling_5",
-            f"{col}_rolling_10": f"{col}_home_rolling_10",
-            f"{col}_avg":        f"{col}_home_avg",
-        })
-
-        # AWAY subset
-        away = team_games.query("is_home == False").copy()
-        away_rolls = compute_homeaway_rollings(away, col)
-        away_rolls = away_rolls.rename(columns={
-            f"{col}_rolling_5":  f"{col}_away_rolling_5",
-            f"{col}_rolling_10": f"{col}_away_rolling_10",
-            f"{col}_avg":        f"{col}_away_avg",
-        })
-
-        # --- Merge both back safely ---
-        team_games = (
-            team_games
-            .merge(home_rolls, on=["season", "team_id", "game_id"], how="left")
-            .merge(away_rolls, on=["season", "team_id", "game_id"], how="left")
-        )
-
     opp_merge = (
         team_games[
             [
@@ -320,10 +158,12 @@ def main() -> None:
             }
         )
     )
-    team_games = team_games.merge(
+    team_games = left_join(
+        team_games,
         opp_merge,
         on=["season","game_id","opponent_id"],
-        how="left",
+        validate="one_to_one",
+        name="opponent home/away goals"
     )
     
     # --- Columns that already exist in df ---
@@ -337,21 +177,28 @@ def main() -> None:
         if c not in already_in_df  # exclude duplicates
     ]
 
-    # --- Perform merge ---
-    df = df.merge(
+    # --- Perform merge (many-to-one, so no duplicate player rows) ---
+    df = left_join(
+        df,
         team_games[cols_to_merge],
         on=["season", "team_id", "game_id"],
-        how="left"
+        name="team/opponent home/away goals"
     )
+    return df
+
+
+def main() -> None:
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    
-    # Make sure no duplicate rows
-    df = df.drop_duplicates(subset=["season", "game_id", "team_id", "player_id"])
+    print(f"Starting team strength goals process at {ts}...")
+
+    # Get the data
+    df = transform(pd.read_parquet(INPUT_FILE))
     
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    print(f"Team strength goals process complete at {ts}. Data saved to {OUT / 'df_team_strength_goals.parquet'}")
+    print(f"Team strength goals process complete at {ts}. Data saved to {OUTPUT_FILE}")
     
-    df.to_parquet(OUT / "df_team_strength_goals.parquet", index=False)
+    df.to_parquet(OUTPUT_FILE, index=False)
     
 if __name__ == "__main__":
     main()
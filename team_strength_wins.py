@@ -14,18 +14,23 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 
-def main() -> None:
-    ROOT = Path(__file__).resolve().parent
-    OUT = ROOT / "parquets"
+from feature_specs import REGISTRY, add_features
+from joins import left_join
+from team_games import build_team_games, opponent_values
 
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    print(f"Starting team strength wins process at {ts}...")
+ROOT = Path(__file__).resolve().parent
+OUT = ROOT / "parquets"
+INPUT_FILE = OUT / "df_feature_engineering.parquet"
+OUTPUT_FILE = OUT / "df_team_strength_wins_rest.parquet"
 
-    # Get the data
-    df = pd.read_parquet(OUT / "df_feature_engineering.parquet")
-    
+
+def transform(df: pd.DataFrame, team_games: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Player features -> team/opponent win form and rest days (stage 3 of the feature
+    build). Team-level form is computed on the shared team-game table.
+    """
     # Normalize team column names
     df = df.rename(columns={
         "opp_wins_pre": "opponent_wins_pre",
@@ -97,22 +102,18 @@ def main() -> None:
     default="UNK"
 )
     
-    # collapse to one record per team per game
-    team_games = (
-        df.groupby(["season", "team_id", "game_id"], as_index=False)
-        .agg({"game_outcome": "first", "team_games_pre": "first"})
+    # One record per team per game (the build's shared team-game table)
+    teams = team_games if team_games is not None else build_team_games(df)
+    team_games = teams[["season", "team_id", "game_id", "game_outcome"]].assign(
+        team_games_pre=teams["team_wins_pre"] + teams["team_losses_pre"] + teams["team_otl_pre"]
     ).sort_values(["season", "team_id", "game_id"])
     
     
     # Mark wins
     team_games["team_win_game"] = (team_games["game_outcome"] == "W").astype(int)
 
-    # Rolling window of previous 5 (exclude current)
-    team_games["team_wins_last_5"] = (
-        team_games.groupby(["season", "team_id"])["team_win_game"]
-        .transform(lambda s: s.rolling(5, min_periods=1).sum().shift(1))
-        .fillna(0)
-    )
+    # Wins over the previous 5 and 10 games (exclude current) -- feature_specs.TEAM_WINS
+    team_games = add_features(team_games, REGISTRY["team_wins"])
 
     # Denominator = min(prior games, 5)
     denom = team_games["team_games_pre"].clip(upper=5)
@@ -122,19 +123,13 @@ def main() -> None:
     ).round(3)
 
     # Merge back to original df
-    df = df.merge(
+    df = left_join(
+        df,
         team_games[["season","team_id","game_id","team_win_game","team_wins_last_5","team_win_pct_last_5"]],
         on=["season","team_id","game_id"],
-        how="left"
+        name="team wins last 5"
     )
     
-    # Rolling window of previous 10 (exclude current)
-    team_games["team_wins_last_10"] = (
-        team_games.groupby(["season", "team_id"])["team_win_game"]
-        .transform(lambda s: s.rolling(10, min_periods=1).sum().shift(1))
-        .fillna(0)
-    )
-
     # Denominator = min(prior games, 10)
     denom10 = team_games["team_games_pre"].clip(upper=10)
 
@@ -144,13 +139,14 @@ def main() -> None:
         team_games["team_wins_last_10"] / denom10
     ).round(3)
     
-    df = df.merge(
+    df = left_join(
+        df,
         team_games[[
             "season","team_id","game_id",
             "team_wins_last_10","team_win_pct_last_10"
         ]],
         on=["season","team_id","game_id"],
-        how="left"
+        name="team wins last 10"
     )
     
     # Rename team_games columns to opponent versions for merge
@@ -167,10 +163,11 @@ def main() -> None:
     })
 
     # Merge opponent stats back into df
-    df = df.merge(
+    df = left_join(
+        df,
         opp_stats,
         on=["season", "opponent_id", "game_id"],
-        how="left"
+        name="opponent wins"
     )
     
     # Momentum differentials - positive = heating up, negative = slumping
@@ -203,36 +200,29 @@ def main() -> None:
     
     
     # Compute rolling home/away form features (wins + win%) for each team.
-        # Assumes df has columns: ['season', 'team_id', 'is_home', 'game_date', 'game_outcome'].
+        # Uses the team-game table's ['season', 'team_id', 'game_id', 'is_home', 'game_date', 'game_outcome'].
         # Returns a DataFrame with new columns merged in:
         # team_home_wins_last_5, team_home_win_pct_last_5, ...
         # team_away_wins_last_5, team_away_win_pct_last_5, etc.
-    def add_home_away_form_features(df):
+    def add_home_away_form_features(df, team_games):
 
         # Prepare base (one row per team per home/away game)
         team_games_homeaway = (
-            df.groupby(["season", "team_id", "is_home", "game_date"], as_index=False)
-            .agg({"game_outcome": "first"})
+            team_games[["season", "team_id", "game_id", "is_home", "game_date", "game_outcome"]]
             .sort_values(["season", "team_id", "is_home", "game_date"])
         )
 
         # mark wins
         team_games_homeaway["team_win_game"] = (team_games_homeaway["game_outcome"] == "W").astype(int)
 
-        # Rolling windows (5 and 10)
+        # Rolling windows (5 and 10): wins and games played -- feature_specs.TEAM_VENUE_WINS
+        team_games_homeaway = add_features(team_games_homeaway, REGISTRY["team_venue_wins"])
         for window in [5, 10]:
             col_wins = f"wins_last_{window}"
             col_win_pct = f"win_pct_last_{window}"
 
-            team_games_homeaway[col_wins] = (
-                team_games_homeaway.groupby(["season","team_id","is_home"])["team_win_game"]
-                .transform(lambda s: s.rolling(window, min_periods=1).sum().shift(1))
-                .fillna(0)
-            )
-
-            denom = (
-                team_games_homeaway.groupby(["season","team_id","is_home"]).cumcount().clip(upper=window)
-            )
+            # Denominator = min(prior home/away games, window)
+            denom = team_games_homeaway[f"games_last_{window}"]
             team_games_homeaway[col_win_pct] = np.where(
                 denom.eq(0),
                 0,
@@ -242,7 +232,7 @@ def main() -> None:
         # Pivot out home vs away into separate columns
         home = (
             team_games_homeaway.query("is_home == 1")[[
-                "season","team_id","game_date","wins_last_5","win_pct_last_5","wins_last_10","win_pct_last_10"
+                "season","team_id","game_id","wins_last_5","win_pct_last_5","wins_last_10","win_pct_last_10"
             ]]
             .rename(columns={
                 "wins_last_5":"team_home_wins_last_5",
@@ -254,7 +244,7 @@ def main() -> None:
 
         away = (
             team_games_homeaway.query("is_home == 0")[[
-                "season","team_id","game_date","wins_last_5","win_pct_last_5","wins_last_10","win_pct_last_10"
+                "season","team_id","game_id","wins_last_5","win_pct_last_5","wins_last_10","win_pct_last_10"
             ]]
             .rename(columns={
                 "wins_last_5":"team_away_wins_last_5",
@@ -264,9 +254,9 @@ def main() -> None:
             })
         )
 
-        # Merge both home/away splits back to main df on team/date
-        df = df.merge(home, on=["season","team_id","game_date"], how="left")
-        df = df.merge(away, on=["season","team_id","game_date"], how="left")
+        # Merge both home/away splits back to main df on team/game
+        df = left_join(df, home, on=["season","team_id","game_id"], name="team home form")
+        df = left_join(df, away, on=["season","team_id","game_id"], name="team away form")
 
 
 
@@ -275,14 +265,14 @@ def main() -> None:
         df["opp_is_home"] = 1 - df["is_home"]
 
         # Merge opponent home/away form using the same team_games_homeaway table
+        # (the opponent's row of the same game, whose is_home is opp_is_home)
         opp_merge = (
             team_games_homeaway[[
-                "season","team_id","is_home","game_date",
+                "season","team_id","game_id",
                 "wins_last_5","win_pct_last_5","wins_last_10","win_pct_last_10"
             ]]
             .rename(columns={
                 "team_id":"opponent_id",
-                "is_home":"opp_is_home",
                 "wins_last_5":"opp_wins_last_5_homeaway",
                 "win_pct_last_5":"opp_win_pct_last_5_homeaway",
                 "wins_last_10":"opp_wins_last_10_homeaway",
@@ -290,70 +280,58 @@ def main() -> None:
             })
         )
 
-        df = df.merge(
+        df = left_join(
+            df,
             opp_merge,
-            on=["season","opponent_id","opp_is_home","game_date"],
-            how="left"
+            on=["season","opponent_id","game_id"],
+            name="opponent home/away form"
         )
 
         return df
 
-    df = add_home_away_form_features(df)
+    df = add_home_away_form_features(df, teams)
     
     
-    # rest days
-    # collapse to one row per team per game
-    team_games = (
-        df.groupby(["season","team_id","game_date"], as_index=False)
-        .agg({"game_outcome":"first"})
-        .sort_values(["season","team_id","game_date"])
+    # rest days (per team-game, in date order)
+    rest = teams[["season", "team_id", "game_id", "game_date", "opponent_id"]].sort_values(
+        ["season", "team_id", "game_date"]
     )
-
-    # compute rest safely
-    team_games["team_days_rest"] = (
-        team_games.groupby(["season","team_id"])["game_date"]
+    rest["team_days_rest"] = (
+        rest.groupby(["season","team_id"])["game_date"]
             .diff()
             .dt.days
             .fillna(0)
             .astype(int)
     )
 
-    # same for opponents
-    opp_games = (
-        df.groupby(["season","opponent_id","game_date"], as_index=False)
-        .agg({"game_outcome":"first"})
-        .rename(columns={"opponent_id":"team_id"})  # reuse same logic
-        .sort_values(["season","team_id","game_date"])
-    )
-    opp_games["opp_days_rest"] = (
-        opp_games.groupby(["season","team_id"])["game_date"]
-            .diff()
-            .dt.days
-            .fillna(0)
-            .astype(int)
-    )
+    # same for opponents -- the opponent's own rest before this game
+    rest["opp_days_rest"] = opponent_values(rest, ["team_days_rest"])["team_days_rest"]
 
     # merge both back to df
-    df = df.merge(
-        team_games[["season","team_id","game_date","team_days_rest"]],
-        on=["season","team_id","game_date"],
-        how="left"
+    df = left_join(
+        df,
+        rest[["season","team_id","game_id","team_days_rest","opp_days_rest"]],
+        on=["season","team_id","game_id"],
+        name="rest days"
     )
-    df = df.merge(
-        opp_games[["season","team_id","game_date","opp_days_rest"]],
-        left_on=["season","opponent_id","game_date"],
-        right_on=["season","team_id","game_date"],
-        suffixes=("","_drop"),
-        how="left"
-    ).drop(columns="team_id_drop")
 
     # final differential
     df["rest_diff"] = df["team_days_rest"] - df["opp_days_rest"]
 
-    df.to_parquet(OUT / "df_team_strength_wins_rest.parquet", index=False)
+    return df
+
+
+def main() -> None:
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    print(f"Starting team strength wins process at {ts}...")
+
+    # Get the data
+    df = transform(pd.read_parquet(INPUT_FILE))
+    df.to_parquet(OUTPUT_FILE, index=False)
     
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    print(f"Team strength wins process complete at {ts}. Data saved to {OUT / 'df_team_strength_wins_rest.parquet'}")
+    print(f"Team strength wins process complete at {ts}. Data saved to {OUTPUT_FILE}")
     
     
 if __name__ == "__main__":